@@ -6,20 +6,19 @@ Based on anasty17/mirror-leech-telegram-bot
 """
 
 from signal import signal, SIGINT
-from sys import executable
-from time import time
-from asyncio import run
 
 def exit_clean_up(signal, frame):
     print("Shutting down bot gracefully...")
     exit(0)
 
-async def main():
-    from bot import bot_loop
+def main():
+    from config import setup_logging
     from bot.__main__ import main as bot_main
     
+    setup_logging()
     try:
-        await bot_main()
+        # run_polling() owns the event loop, so this must not run inside one
+        bot_main()
     except KeyboardInterrupt:
         print("Bot stopped by user")
     except Exception as e:
@@ -28,4 +27,4 @@ async def main():
 if __name__ == "__main__":
     signal(SIGINT, exit_clean_up)
     print("🚀 Starting Terabox Leech Bot...")
-    run(main())
+    main()
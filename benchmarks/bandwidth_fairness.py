@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Per-job download rates with and without the bandwidth shaper
+
+Serves files from a local HTTP server where each "CDN" sends at its own
+speed, runs the real download_file_with_retry for several jobs at once,
+and reports each job's achieved rate and the total ingress, first
+unshaped and then through the shaper at --cap Mbit/s. Usage:
+
+    python benchmarks/bandwidth_fairness.py [--cap 80] [--seconds 4]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK = 64 * 1024
+# (label, source speed in Mbit/s, weight)
+JOBS = (('fast-cdn', 400, 1), ('slow-cdn-a', 60, 1), ('slow-cdn-b', 60, 1), ('heavy', 400, 2))
+
+
+async def serve(port):
+    from aiohttp import web
+
+    async def send(request):
+        speed = float(request.query['mbps']) * 1_000_000 / 8
+        response = web.StreamResponse(headers={'Content-Length': str(1 << 40)})
+        await response.prepare(request)
+        block = b'\0' * CHUNK
+        started = time.monotonic()
+        sent = 0
+        try:
+            while True:
+                await response.write(block)
+                sent += CHUNK
+                ahead = sent / speed - (time.monotonic() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        return response
+
+    app = web.Application()
+    app.router.add_get('/file', send)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner
+
+
+async def run_jobs(args, shaped, scratch):
+    from bot.handlers.processor import download_file_with_retry
+    from bot.utils.bandwidth import bandwidth_shaper, MBPS
+
+    bandwidth_shaper.configure(ingress_bps=args.cap * MBPS if shaped else 0)
+    results = {}
+
+    async def job(label, mbps, weight):
+        url = f"http://127.0.0.1:{args.port}/file?mbps={mbps}"
+        with bandwidth_shaper.flow(label, weight if shaped else 1) as flow:
+            task = asyncio.create_task(download_file_with_retry(
+                url, label, file_path=Path(scratch) / label, flow=flow
+            ))
+            await asyncio.sleep(args.seconds)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            results[label] = flow.bytes / args.seconds
+
+    await asyncio.gather(*(job(*spec) for spec in JOBS))
+    print(f"{'shaped at %g Mbit/s' % args.cap if shaped else 'unshaped'}:")
+    for label, mbps, weight in JOBS:
+        print(f"  {label:11} source {mbps:4} Mbit/s  weight {weight}  achieved {results[label] / MBPS:7.1f} Mbit/s")
+    print(f"  total ingress {sum(results.values()) / MBPS:7.1f} Mbit/s")
+
+
+async def run(args):
+    runner = await serve(args.port)
+    scratch = tempfile.mkdtemp(prefix='bandwidth_')
+    try:
+        await run_jobs(args, False, scratch)
+        await run_jobs(args, True, scratch)
+    finally:
+        from bot.utils.http_client import http_client
+        await http_client.close()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cap', type=float, default=80)
+    parser.add_argument('--seconds', type=float, default=4)
+    parser.add_argument('--port', type=int, default=8791)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bandwidth_logs_'))
+    sys.path.insert(0, ROOT)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Offline check of the extractor backends against the recorded fixtures
+
+Replays bot/utils/fixtures/terabox through FixtureTransport (share page,
+share/list for the root and a subfolder, dlink redirects) to drive
+TeraboxResolver.open_share/list_dir/resolve and the folder walk, then runs
+LocalFixtureBackend over bot/utils/fixtures/wdzone_responses.json on its
+own and behind the registry: failover past a dead backend, a hedge past a
+slow one, and a bad link that must not fail over. No network access is
+needed; exits non-zero if any check fails. Usage:
+
+    python benchmarks/fixture_check.py
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JS_TOKEN = 'A1B2C3D4E5F60718293A4B5C6D7E8F90'
+FOLDER_URL = 'https://www.terabox.com/s/1sampleFolder'
+
+
+class Checks:
+    def __init__(self):
+        self.failed = 0
+
+    def check(self, name, ok, detail=''):
+        if not ok:
+            self.failed += 1
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}{f' ({detail})' if detail else ''}")
+
+
+async def check_resolver(checks):
+    from bot.utils.terabox_resolver import TeraboxResolver, FixtureTransport
+    from bot.utils.folder_walker import walk_share
+
+    print("native resolver (FixtureTransport):")
+    resolver = TeraboxResolver(FixtureTransport())
+    share = await resolver.open_share('sampleFolder')
+    checks.check("open_share reads the jsToken and logid", share.js_token == JS_TOKEN and share.logid == '1000000000',
+                 f"{share.js_token}, {share.logid}")
+
+    entries, has_more = await resolver.list_dir(share)
+    folders = [entry['path'] for entry in entries if entry['is_dir']]
+    files = [entry['filename'] for entry in entries if not entry['is_dir']]
+    checks.check("list_dir lists the root", folders == ['/Sample Folder/Season 1'] and 'trailer.mp4' in files and not has_more,
+                 f"{len(folders)} folder, {len(files)} files")
+
+    entries, _ = await resolver.list_dir(share, '/Sample Folder/Season 1')
+    checks.check("list_dir lists a subfolder", entries and all(entry['dlink'] for entry in entries),
+                 ', '.join(entry['filename'] for entry in entries))
+
+    walked = [entry['filename'] async for entry in walk_share(resolver, share)]
+    checks.check("walk_share reaches every file", len(walked) == len(files) + len(entries), f"{len(walked)} files")
+
+    file_info = await resolver.resolve(FOLDER_URL)
+    checks.check("resolve follows the dlink redirect",
+                 file_info['filename'] == 'trailer.mp4' and file_info['download_url'].startswith('https://data.terabox.com/'),
+                 file_info['download_url'])
+    checks.check("resolve counts the share entries", file_info['share_entries'] == len(folders) + len(files),
+                 f"{file_info['share_entries']} entries")
+
+
+async def check_local_backend(checks):
+    from bot.utils.extractor_registry import ExtractorRegistry, LocalFixtureBackend, ShareLinkError
+
+    print("local fixture backend:")
+    local = LocalFixtureBackend()
+    for surl in ('sampleVideo1', 'samplePlain2'):
+        file_info = await local.extract(f"https://www.terabox.com/s/1{surl}")
+        checks.check(f"{surl} parses", file_info['download_url'] and file_info['size'] > 0,
+                     f"{file_info['filename']}, {file_info['size']} bytes")
+    try:
+        await local.extract('https://www.terabox.com/s/1sampleExpired3')
+        checks.check("sampleExpired3 is a bad link", False, "no error raised")
+    except ShareLinkError as e:
+        checks.check("sampleExpired3 is a bad link", True, str(e))
+
+    print("registry:")
+    registry = ExtractorRegistry(hedge_default=0.05, timeout=5)
+    registry.register(LocalFixtureBackend(fail=True, name='down'))
+    registry.register(LocalFixtureBackend(name='local'))
+    file_info = await registry.extract('https://www.terabox.com/s/1sampleVideo1')
+    checks.check("fails over past a dead backend", file_info['backend'] == 'local' and registry.health['down'].failures == 1,
+                 f"answered by {file_info['backend']}")
+
+    registry = ExtractorRegistry(hedge_default=0.05, timeout=5)
+    registry.register(LocalFixtureBackend(delay=1.0, name='slow'))
+    registry.register(LocalFixtureBackend(name='local'))
+    file_info = await registry.extract('https://www.terabox.com/s/1sampleVideo1')
+    checks.check("hedges past a slow backend", file_info['backend'] == 'local' and registry.hedged_calls == 1,
+                 f"answered by {file_info['backend']}, {registry.hedged_calls} hedged")
+
+    registry = ExtractorRegistry(hedge_default=0.05, timeout=5)
+    down = LocalFixtureBackend(fail=True, name='down')
+    registry.register(LocalFixtureBackend(name='local'))
+    registry.register(down)
+    try:
+        await registry.extract('https://www.terabox.com/s/1sampleExpired3')
+        checks.check("a bad link does not fail over", False, "no error raised")
+    except ShareLinkError as e:
+        checks.check("a bad link does not fail over", registry.health['down'].calls == 0, str(e))
+
+
+async def run():
+    checks = Checks()
+    await check_resolver(checks)
+    await check_local_backend(checks)
+    print(f"{checks.failed} check{'s' if checks.failed != 1 else ''} failed")
+    return 1 if checks.failed else 0
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[1]).parse_args()
+
+    # Journal and logs go to a scratch directory
+    os.environ.setdefault('DOWNLOAD_DIR', tempfile.mkdtemp(prefix='fixture_check_'))
+    sys.path.insert(0, ROOT)
+    return asyncio.run(run())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
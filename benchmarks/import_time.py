@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for cold starts
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+reports the slowest imports plus whether any heavy dependency was pulled in
+at import time. Usage:
+
+    python benchmarks/import_time.py [module] [--top N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies that must only load on first use
+HEAVY_MODULES = ('telegram.ext', 'aiohttp', 'aiofiles', 'requests', 'PIL', 'pyrogram', 'pymongo')
+
+
+def measure(module):
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return wall, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('module', nargs='?', default='bot.__main__')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    wall, rows = measure(args.module)
+    loaded = {name for _, _, name in rows}
+    root = next((cum for cum, _, name in rows if name == args.module), 0)
+
+    print(f"import {args.module}: {root / 1000:.1f} ms cumulative, {wall * 1000:.0f} ms wall (incl. interpreter start)")
+    print(f"\nTop {args.top} imports by cumulative time:")
+    for cumulative, self_time, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  (self {self_time / 1000:6.1f} ms)  {name}")
+
+    eager = [name for name in HEAVY_MODULES if name in loaded]
+    print(f"\nHeavy modules loaded eagerly: {', '.join(eager) if eager else 'none'}")
+    return 1 if eager else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
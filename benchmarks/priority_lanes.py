@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Delivery times per priority class, driven through the Telegram handlers
+
+Builds the real Application (every handler registered) against a local
+fake Bot API server that also serves the files at --mbps each. Free users
+send their links first and verified users --head-start seconds later; the
+updates go through the application's update queue like polled ones. The
+run is repeated with every job forced into the free lane, so the two
+tables compare priority lanes with first come, first served. Usage:
+
+    python benchmarks/priority_lanes.py [--free 6] [--verified 3] [--size-mb 4] [--mbps 32]
+
+Set CONCURRENT_UPDATES=1 to see what a one-update-at-a-time bot does.
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNK = 64 * 1024
+TOKEN = '123456:BENCH'
+
+
+class FakeTelegram:
+    """Bot API methods the handlers call, answered locally, plus the file host"""
+
+    def __init__(self, args):
+        self.args = args
+        self.message_ids = itertools.count(1000)
+        self.delivered = {}  # chat id -> monotonic time the file arrived
+        self.edits = []      # (chat id, message id, text)
+        self.runner = None
+
+    def message(self, chat_id, text='', message_id=None):
+        return {
+            'message_id': message_id or next(self.message_ids), 'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'}, 'text': text,
+        }
+
+    async def bot_api(self, request):
+        from aiohttp import web
+        method = request.match_info['method']
+        form = await request.post()
+        chat_id = int(form.get('chat_id', 0))
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        elif method == 'sendMessage':
+            result = self.message(chat_id, form.get('text', ''))
+        elif method == 'editMessageText':
+            self.edits.append((chat_id, int(form['message_id']), form.get('text', '')))
+            result = self.message(chat_id, form.get('text', ''), int(form['message_id']))
+        elif method in ('sendDocument', 'sendVideo', 'sendPhoto'):
+            self.delivered[chat_id] = time.monotonic()
+            result = {**self.message(chat_id), 'document': {'file_id': 'f', 'file_unique_id': 'f'}}
+        else:
+            result = True  # deleteMessage, answerCallbackQuery, ...
+        return web.json_response({'ok': True, 'result': result})
+
+    async def send_file(self, request):
+        from aiohttp import web
+        size = int(request.query['size'])
+        speed = float(request.query['mbps']) * 1_000_000 / 8
+        response = web.StreamResponse(headers={'Content-Length': str(size)})
+        await response.prepare(request)
+        block = b'\0' * CHUNK
+        started = time.monotonic()
+        sent = 0
+        try:
+            while sent < size:
+                await response.write(block[:size - sent])
+                sent += min(CHUNK, size - sent)
+                ahead = sent / speed - (time.monotonic() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        return response
+
+    async def start(self, port):
+        from aiohttp import web
+        app = web.Application(client_max_size=1 << 30)
+        app.router.add_get('/file/{name}', self.send_file)
+        app.router.add_post('/{bot}/{method}', self.bot_api)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', port).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def start_application(args, fake):
+    """The bot's real Application on a Bot that talks to `fake`"""
+    from telegram import Bot
+    from bot.__main__ import build_application
+    from bot.utils.extractor_registry import extractor_registry, make_file_info
+
+    size = int(args.size_mb * 1024 * 1024)
+
+    async def extract(url):
+        name = url.rsplit('/', 1)[-1]
+        download_url = f"http://127.0.0.1:{args.port}/file/{name}?size={size}&mbps={args.mbps}"
+        return make_file_info(f"{name}.zip", size, download_url, 'bench')
+
+    extractor_registry.extract = extract
+    bot = Bot(TOKEN, base_url=f"http://127.0.0.1:{args.port}/bot")
+    application = build_application(bot=bot)
+    await application.initialize()
+    await application.start()
+    return application
+
+
+def message_update(application, update_id, user_id, text):
+    from telegram import Update
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}"},
+        },
+    }, application.bot)
+
+
+async def run_mode(args, application, fake, lanes, first_user):
+    import bot.handlers.processor as processor
+    from bot.utils.job_scheduler import job_scheduler, priority_class, FREE, VERIFIED
+    from bot.utils.metrics import LatencyStats
+    from bot.utils.user_state import user_state
+
+    free = [first_user + n for n in range(args.free)]
+    verified = [first_user + 500 + n for n in range(args.verified)]
+    for user_id in verified:
+        user_state.set(user_id, verified_until=int(time.time()) + 3600)
+    processor.priority_class = priority_class if lanes else (lambda user_id: FREE)
+    job_scheduler.queue_wait = LatencyStats()
+
+    submitted = {}
+
+    async def send(users):
+        for user_id in users:
+            submitted[user_id] = time.monotonic()
+            text = f"https://www.terabox.com/s/1bench{user_id}"
+            await application.update_queue.put(message_update(application, user_id, user_id, text))
+
+    await send(free)
+    await asyncio.sleep(args.head_start)
+    await send(verified)
+    deadline = time.monotonic() + args.timeout
+    while not all(user_id in fake.delivered for user_id in submitted) and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+
+    print(f"{'priority lanes' if lanes else 'first come, first served'}:")
+    for job_class, users in ((FREE, free), (VERIFIED, verified)):
+        times = [fake.delivered[user_id] - submitted[user_id] for user_id in users if user_id in fake.delivered]
+        if len(times) < len(users):
+            print(f"  {job_class:9} {len(users) - len(times)} of {len(users)} never delivered")
+            continue
+        print(f"  {job_class:9} delivered in {statistics.median(times):6.2f}s median, {max(times):6.2f}s max")
+    for job_class, wait in job_scheduler.queue_wait.stats().items():
+        print(f"  {job_class:9} queue wait {wait['p50_seconds']:6.2f}s p50, {wait['max_seconds']:6.2f}s max")
+
+
+async def run(args):
+    from bot.utils.http_client import http_client
+
+    fake = FakeTelegram(args)
+    await fake.start(args.port)
+    application = await start_application(args, fake)
+    try:
+        await run_mode(args, application, fake, lanes=False, first_user=10_000)
+        await run_mode(args, application, fake, lanes=True, first_user=20_000)
+    finally:
+        await application.stop()
+        await application.shutdown()
+        await http_client.close()
+        await fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--free', type=int, default=6)
+    parser.add_argument('--verified', type=int, default=3)
+    parser.add_argument('--size-mb', type=float, default=4)
+    parser.add_argument('--mbps', type=float, default=32)
+    parser.add_argument('--head-start', type=float, default=0.3)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--port', type=int, default=8792)
+    args = parser.parse_args()
+
+    # Journal, cache and logs go to a scratch directory; free users get one link each
+    scratch = tempfile.mkdtemp(prefix='priority_lanes_')
+    os.environ.setdefault('DOWNLOAD_DIR', scratch)
+    os.environ['VERIFY'] = 'True'
+    os.environ['PREFLIGHT_PROBE'] = 'False'
+    os.environ.setdefault('UPLOAD_STREAMING', 'True')
+    os.chdir(scratch)
+    sys.path.insert(0, ROOT)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
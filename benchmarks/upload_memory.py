@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Peak-memory benchmark for Telegram uploads
+
+Serves a fake Bot API on localhost and uploads files of several sizes
+with sendDocument, once through the streaming path and once through
+python-telegram-bot's buffered InputFile. Each upload runs in a fresh
+interpreter and reports how far its peak RSS rose above the pre-upload
+baseline. Usage:
+
+    python benchmarks/upload_memory.py [--sizes 16,64,256] [--chunk-kb 256]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = '123456:benchmark'
+MB = 1024 * 1024
+
+FAKE_MESSAGE = {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}}
+FAKE_BOT = {'id': 123456, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+
+
+def peak_rss():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def serve(ready):
+    """Fake Bot API: drains the request body without keeping it"""
+    from aiohttp import web
+
+    async def handle(request):
+        received = 0
+        while True:
+            chunk = await request.content.readany()
+            if not chunk:
+                break
+            received += len(chunk)
+        result = FAKE_BOT if request.path.endswith('/getMe') else FAKE_MESSAGE
+        return web.json_response({'ok': True, 'result': result})
+
+    async def main():
+        app = web.Application(client_max_size=0)
+        app.router.add_route('POST', '/{tail:.*}', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        ready.append(site._server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+async def child(mode, path, port):
+    from telegram import Bot
+    from bot.utils.streaming_upload import send_file
+    from bot.utils.http_client import http_client
+
+    async with Bot(TOKEN, base_url=f"http://127.0.0.1:{port}/bot") as bot:
+        http_client.session()  # Pool and imports are part of the baseline, not the upload
+        baseline = peak_rss()
+        if mode == 'streaming':
+            await send_file(bot, 'sendDocument', 'document', path, os.path.basename(path), chat_id=1)
+        else:
+            with open(path, 'rb') as file:
+                await bot.send_document(chat_id=1, document=file, read_timeout=300, write_timeout=300)
+        await http_client.close()
+    print(json.dumps({'baseline': baseline, 'peak': peak_rss()}))
+
+
+def measure(mode, path, port, chunk_kb):
+    env = dict(os.environ, PYTHONPATH=ROOT, UPLOAD_CHUNK_KB=str(chunk_kb))
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, path, str(port)],
+        cwd=os.path.dirname(path), env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"{mode} upload of {path} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result['peak'] - result['baseline']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='16,64,256', help='file sizes in MB')
+    parser.add_argument('--chunk-kb', type=int, default=256)
+    parser.add_argument('--child', nargs=3, metavar=('MODE', 'PATH', 'PORT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, path, port = args.child
+        asyncio.run(child(mode, path, int(port)))
+        return 0
+
+    ready = []
+    threading.Thread(target=serve, args=(ready,), daemon=True).start()
+    while not ready:
+        threading.Event().wait(0.05)
+    port = ready[0]
+
+    print(f"{'size':>8}  {'streaming':>12}  {'buffered':>12}")
+    growth = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in (int(size) for size in args.sizes.split(',')):
+            path = os.path.join(tmp, f"bench_{size_mb}mb.bin")
+            with open(path, 'wb') as file:
+                block = os.urandom(MB)
+                for _ in range(size_mb):
+                    file.write(block)
+            streamed = measure('streaming', path, port, args.chunk_kb)
+            buffered = measure('buffered', path, port, args.chunk_kb)
+            growth.append(streamed)
+            print(f"{size_mb:>6}MB  {streamed / MB:>10.1f}MB  {buffered / MB:>10.1f}MB")
+            os.unlink(path)
+
+    # Bounded means the streaming peak doesn't follow the file size
+    spread = max(growth) - min(growth)
+    print(f"\nStreaming peak growth spread across sizes: {spread / MB:.1f}MB")
+    return 0 if spread < 16 * MB else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
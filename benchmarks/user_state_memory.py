@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Bytes-per-user benchmark for per-user state
+
+Fills N users of verified + quota state in a fresh interpreter, once in
+the previous layout (a set of verified ids, a dict of verification times
+and a dict of packed quota records) and once in the user state table, and
+reports the memory tracemalloc attributes to it. Usage:
+
+    python benchmarks/user_state_memory.py [--users N]
+"""
+
+import argparse
+import functools
+import json
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEGACY_RECORD = struct.Struct('<ffI')
+
+
+def user_ids(count):
+    # Real Telegram ids are 10-digit: too big for the small-int cache
+    rng = random.Random(42)
+    return (rng.randrange(1_000_000_000, 8_000_000_000) for _ in range(count))
+
+
+def fill_legacy(count):
+    verified_users = set()
+    verification_times = {}
+    quota_records = {}
+    now = time.time()
+    for user_id in user_ids(count):
+        verified_users.add(user_id)
+        verification_times[user_id] = now
+        quota_records[user_id] = LEGACY_RECORD.pack(2.0, 0.0, int(now))
+    return verified_users, verification_times, quota_records
+
+
+def fill_table(count, table_class):
+    table = table_class(idle_seconds=86400)
+    now = int(time.time())
+    for user_id in user_ids(count):
+        table.set(
+            user_id, verified_until=now + 86400, last_seen=now,
+            quota_downloads=2.0, quota_bytes=0.0, quota_stamp=now
+        )
+    return table
+
+
+def child(layout, count):
+    fill = fill_legacy
+    if layout == 'table':
+        from bot.utils.user_state import UserStateTable  # Imported before tracing: not per-user memory
+        fill = functools.partial(fill_table, table_class=UserStateTable)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    state = fill(count)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    print(json.dumps({'bytes': used, 'users': count}))
+    return state
+
+
+def measure(layout, count):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', layout, '--users', str(count)],
+        cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"{layout} run failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])['bytes']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--child', choices=('legacy', 'table'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.users)
+        return 0
+
+    legacy = measure('legacy', args.users)
+    table = measure('table', args.users)
+    print(f"{args.users} users")
+    print(f"  before (set + dicts):   {legacy / args.users:7.1f} bytes/user  {legacy / 1024 / 1024:8.1f} MB")
+    print(f"  after (user state table): {table / args.users:5.1f} bytes/user  {table / 1024 / 1024:8.1f} MB")
+    print(f"  saved: {(1 - table / legacy) * 100:.0f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
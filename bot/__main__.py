@@ -14,9 +14,17 @@ import socketserver
 import threading
 import json
 from urllib.parse import urlparse
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
-from telegram import BotCommand, BotCommandScopeDefault
-from config import BOT_TOKEN, LOGGER, OWNER_ID
+from config import CONFIG, ConfigError, LOGGER, BOT_MODE, CONCURRENT_UPDATES, setup_logging
+from bot.utils.url_classifier import extract_share_links
+from bot.utils.startup_timer import startup_timer
+
+# telegram.ext and the handler modules are imported inside main() so that the
+# health server is already answering while the heavy imports run
+commands = None
+messages = None
+commands_available = False
+messages_available = False
+_health_ready = threading.Event()
 
 # ✅ HEALTH SERVER CLASS
 class HealthHandler(http.server.BaseHTTPRequestHandler):
@@ -41,6 +49,13 @@ class HealthHandler(http.server.BaseHTTPRequestHandler):
                 "port": 8000
             }
             self.wfile.write(json.dumps(response, indent=2).encode())
+        elif parsed_path.path == '/metrics':
+            # Runtime metrics from every registered subsystem
+            from bot.utils.metrics import collect_metrics
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(collect_metrics(), indent=2, default=str).encode())
         else:
             # 404 for other paths
             self.send_error(404, "Endpoint not found")
@@ -54,6 +69,7 @@ def start_health_server():
     try:
         with socketserver.TCPServer(("0.0.0.0", 8000), HealthHandler) as httpd:
             LOGGER.info("✅ Health server started on port 8000 (HTTP)")
+            _health_ready.set()
             httpd.serve_forever()
     except Exception as e:
         LOGGER.error(f"❌ Health server failed: {e}")
@@ -65,29 +81,32 @@ def start_health_background():
         health_thread.start()
         LOGGER.info("✅ Health server thread started")
         
-        # Give it time to start
-        time.sleep(2)
-        return True
+        # Wait until the socket is bound (not a fixed sleep) so cold starts stay fast
+        return _health_ready.wait(timeout=2)
     except Exception as e:
         LOGGER.error(f"❌ Health server thread failed: {e}")
         return False
 
-# ✅ IMPORT HANDLERS SAFELY
-try:
-    import bot.handlers.commands as commands
-    commands_available = True
-    LOGGER.info("✅ Enhanced commands imported successfully")
-except ImportError as e:
-    LOGGER.error(f"Enhanced commands not available: {e}")
-    commands_available = False
-
-try:
-    import bot.handlers.messages as messages
-    messages_available = True
-    LOGGER.info("✅ Enhanced messages imported successfully")
-except ImportError as e:
-    LOGGER.error(f"Enhanced messages not available: {e}")
-    messages_available = False
+# ✅ IMPORT HANDLERS SAFELY (lazily, from main())
+def load_handler_modules():
+    """Import the enhanced handler modules, falling back to the simple handlers"""
+    global commands, messages, commands_available, messages_available
+    
+    try:
+        import bot.handlers.commands as commands
+        commands_available = True
+        LOGGER.info("✅ Enhanced commands imported successfully")
+    except ImportError as e:
+        LOGGER.error(f"Enhanced commands not available: {e}")
+        commands_available = False
+    
+    try:
+        import bot.handlers.messages as messages
+        messages_available = True
+        LOGGER.info("✅ Enhanced messages imported successfully")
+    except ImportError as e:
+        LOGGER.error(f"Enhanced messages not available: {e}")
+        messages_available = False
 
 # ✅ FALLBACK HANDLERS (if enhanced ones fail)
 async def simple_start(update, context):
@@ -109,7 +128,7 @@ async def simple_test(update, context):
     await update.message.reply_text(
         "✅ **Bot Status: WORKING PERFECTLY**\n\n"
         f"🆔 **Your ID:** `{update.effective_user.id}`\n"
-        f"👤 **Owner ID:** `{OWNER_ID}`\n"
+        f"👤 **Owner ID:** `{CONFIG.OWNER_ID}`\n"
         f"🤖 **All Systems:** Operational\n"
         f"🏥 **Health Server:** Running on port 8000\n"
         f"🔧 **Version:** 2.0\n\n"
@@ -207,14 +226,8 @@ async def handle_text_messages(update, context):
     
     LOGGER.info(f"📨 Message from {user_id}: {text[:50]}...")
     
-    # Enhanced Terabox domain detection
-    terabox_domains = [
-        'terabox.com', '1024tera.com', 'nephobox.com', 'mirrobox.com', 
-        'momerybox.com', 'teraboxapp.com', 'terasharelink.com', 'terabox.app',
-        '4funbox.com', 'teraboxlink.com', 'teraboxurl.com', 'tibibox.com'
-    ]
-    
-    is_terabox_url = any(domain in text.lower() for domain in terabox_domains)
+    # Shared Terabox link classifier (parsed once, reused by downstream handlers)
+    is_terabox_url = bool(extract_share_links(text))
     
     if is_terabox_url:
         LOGGER.info(f"🎯 Terabox URL detected from user {user_id}")
@@ -251,6 +264,8 @@ async def handle_text_messages(update, context):
 
 async def setup_bot_commands(application):
     """Setup bot menu commands"""
+    from telegram import BotCommand, BotCommandScopeDefault
+    
     try:
         commands_list = [
             BotCommand("start", "🏠 Start the bot"),
@@ -258,7 +273,9 @@ async def setup_bot_commands(application):
             BotCommand("contact", "📞 Contact developer"),
             BotCommand("about", "ℹ️ About this bot"),
             BotCommand("status", "📊 Check bot status"),
-            BotCommand("test", "🧪 Test bot functionality")
+            BotCommand("test", "🧪 Test bot functionality"),
+            BotCommand("leech", "📦 Leech one or many Terabox links"),
+            BotCommand("cancel", "🛑 Stop your running downloads")
         ]
         
         await application.bot.set_my_commands(commands_list, scope=BotCommandScopeDefault())
@@ -268,11 +285,185 @@ async def setup_bot_commands(application):
         LOGGER.error(f"❌ Failed to set bot commands: {e}")
         return False
 
+async def post_init(application):
+    """Start background maintenance once the event loop is running"""
+    from bot.utils.disk_manager import disk_manager
+    from bot.utils.memory_governor import memory_governor
+    from bot.utils.metrics import register_metrics_source, request_latency
+    from bot.utils.extractor_registry import extractor_registry
+    from bot.utils.http_client import http_client
+    from bot.utils.integrity import integrity_stats
+    from bot.utils.streaming_upload import upload_stats
+    from bot.utils.preflight import preflight_stats
+    from bot.utils.bandwidth import bandwidth_shaper
+    from bot.utils.job_scheduler import job_scheduler
+    from bot.utils.cancellation import cancel_registry
+    from bot.utils.log_forwarder import log_forwarder
+    from bot.utils.user_state import user_state
+    from bot.utils.quota import quota_engine
+    from bot.utils.cpu_executor import cpu_executor
+    from bot.utils.file_cache import file_cache
+    from bot.utils.job_journal import job_journal
+    from bot.handlers.processor import resume_journaled_jobs
+    
+    # The cache and the journal survive restarts; everything else left in DOWNLOAD_DIR is an orphan
+    disk_manager.protect(file_cache.root.name)
+    disk_manager.protect(job_journal.root.name)
+    file_cache.load()
+    removed = disk_manager.sweep(max_age=0)
+    LOGGER.info(f"🧹 Startup sweep removed {removed} orphaned downloads")
+    application.create_task(disk_manager.sweep_task())
+    application.create_task(memory_governor.sample_task())
+    application.create_task(user_state.compact_task())
+    if BOT_MODE == 'all':
+        application.create_task(resume_journaled_jobs(application.bot))
+    else:
+        job_journal.cleanup()  # Interrupted jobs are re-claimed by workers once their lease runs out
+    log_forwarder.start(application.bot)
+    # Pay DNS + TCP + TLS for the extractor/CDN hosts before the first job does
+    application.create_task(http_client.warm_up())
+    
+    register_metrics_source('disk', disk_manager.stats)
+    register_metrics_source('file_cache', file_cache.stats)
+    register_metrics_source('jobs', job_journal.stats)
+    register_metrics_source('memory', memory_governor.stats)
+    register_metrics_source('startup', startup_timer.stats)
+    register_metrics_source('extractors', extractor_registry.stats)
+    register_metrics_source('http', http_client.stats)
+    register_metrics_source('integrity', lambda: dict(integrity_stats))
+    register_metrics_source('upload', lambda: dict(upload_stats))
+    register_metrics_source('preflight', lambda: dict(preflight_stats))
+    register_metrics_source('bandwidth', bandwidth_shaper.stats)
+    register_metrics_source('scheduler', job_scheduler.stats)
+    register_metrics_source('cancel', cancel_registry.stats)
+    register_metrics_source('log_forward', log_forwarder.stats)
+    register_metrics_source('quota', quota_engine.stats)
+    register_metrics_source('users', user_state.stats)
+    register_metrics_source('latency', request_latency.stats)
+    register_metrics_source('cpu', cpu_executor.stats)
+    startup_timer.mark('ready')
+
+async def post_shutdown(application):
+    """Close the shared HTTP pool so no connection is left half-open"""
+    from bot.utils.http_client import http_client
+    from bot.utils.job_journal import job_journal
+    from bot.utils.cpu_executor import cpu_executor
+    from bot.utils.log_forwarder import log_forwarder
+    await log_forwarder.close()
+    await http_client.close()
+    job_journal.close()
+    cpu_executor.shutdown()
+
+async def track_first_update(update, context):
+    """Record time-to-first-update-processed (runs after the real handlers)"""
+    startup_timer.mark('first_update')
+
+def build_application(bot=None):
+    """The Telegram application with every handler registered; `bot`
+    replaces the token-built Bot (benchmarks drive it with a fake one)"""
+    # ✅ STEP 2: Create Telegram Application (heavy imports happen here)
+    LOGGER.info("🤖 Creating Telegram application...")
+    from telegram.ext import (
+        Application, CommandHandler, MessageHandler, TypeHandler, filters, CallbackQueryHandler
+    )
+    from telegram import Update
+    load_handler_modules()
+    builder = Application.builder().bot(bot) if bot is not None else Application.builder().token(CONFIG.BOT_TOKEN)
+    # Job handlers (links, /leech, /fast) are registered with block=False so a
+    # running job never holds one of these slots; /cancel, the Cancel button and
+    # /start only ever wait behind short handlers
+    application = (
+        builder.post_init(post_init).post_shutdown(post_shutdown)
+        .concurrent_updates(CONCURRENT_UPDATES).build()
+    )
+    startup_timer.mark('imports')
+    
+    # Group 1 runs once the group 0 handlers have finished with the update
+    # (job handlers don't block, so for those it runs as soon as the job starts)
+    application.add_handler(TypeHandler(Update, track_first_update), group=1)
+    
+    # Store start time for uptime calculation
+    application.start_time = time.time()
+    
+    # ✅ STEP 3: Setup Bot Commands Menu
+    LOGGER.info("📱 Setting up bot menu commands...")
+    # Note: We'll set commands after handlers are added
+    
+    # ✅ STEP 4: Add Enhanced Command Handlers
+    LOGGER.info("🔧 Adding command handlers...")
+    
+    if commands_available:
+        try:
+            # Enhanced commands
+            application.add_handler(CommandHandler("start", commands.start))
+            LOGGER.info("✅ Enhanced /start command added")
+        except AttributeError:
+            application.add_handler(CommandHandler("start", simple_start))
+            LOGGER.info("🔧 Fallback /start command added")
+        
+        # Add other enhanced commands with fallbacks
+        enhanced_commands = [
+            ("help", commands.help_command, simple_help),
+            ("contact", commands.contact_command, simple_contact),
+            ("about", commands.about_command, simple_about),
+            ("status", commands.status_command, simple_status),
+            ("test", commands.test_handler, simple_test),
+            ("bandwidth", commands.bandwidth_command, simple_help),
+            ("cancel", commands.cancel_command, simple_help),
+            ("leech", commands.leech_command, simple_help),
+            ("fast", commands.fast_leech_command, simple_help)
+        ]
+        
+        job_commands = {"leech", "fast"}
+        for cmd_name, enhanced_func, fallback_func in enhanced_commands:
+            try:
+                application.add_handler(CommandHandler(cmd_name, enhanced_func, block=cmd_name not in job_commands))
+                LOGGER.info(f"✅ Enhanced /{cmd_name} command added")
+            except AttributeError:
+                application.add_handler(CommandHandler(cmd_name, fallback_func))
+                LOGGER.info(f"🔧 Fallback /{cmd_name} command added")
+    else:
+        # Use all fallback commands
+        LOGGER.info("🔧 Using fallback command handlers")
+        application.add_handler(CommandHandler("start", simple_start))
+        application.add_handler(CommandHandler("help", simple_help))
+        application.add_handler(CommandHandler("contact", simple_contact))
+        application.add_handler(CommandHandler("about", simple_about))
+        application.add_handler(CommandHandler("status", simple_status))
+        application.add_handler(CommandHandler("test", simple_test))
+    
+    # ✅ STEP 5: Add Message Handler
+    LOGGER.info("📨 Adding message handler...")
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_messages, block=False))
+    
+    # Cancel buttons on job status messages
+    from bot.handlers.callbacks import handle_cancel_callback
+    from bot.utils.cancellation import CANCEL_DATA
+    application.add_handler(CallbackQueryHandler(handle_cancel_callback, pattern=f"^{CANCEL_DATA}$"))
+    
+    # ✅ STEP 6: Add Verification Callbacks (if available)
+    try:
+        from bot.modules.token_verification import handle_verification_callbacks
+        application.add_handler(CallbackQueryHandler(handle_verification_callbacks))
+        LOGGER.info("✅ Verification callback system enabled")
+    except ImportError:
+        LOGGER.info("ℹ️ Verification system not available (optional)")
+    except Exception as e:
+        LOGGER.warning(f"⚠️ Verification system setup failed: {e}")
+    
+    return application
+
 def main():
     """COMPLETE ENHANCED MAIN FUNCTION - ALL FEATURES WORKING"""
     try:
         LOGGER.info("🚀 Starting Ultra Terabox Bot v2.0 (Complete Enhanced Edition)")
         
+        try:
+            CONFIG.validate()
+        except ConfigError as e:
+            LOGGER.error(f"❌ {e}")
+            raise SystemExit(1)
+        
         # ✅ STEP 1: Start Health Server for Koyeb
         LOGGER.info("🏥 Initializing health server for Koyeb...")
         if start_health_background():
@@ -280,68 +471,8 @@ def main():
         else:
             LOGGER.warning("⚠️ Health server failed - bot will still work")
         
-        # ✅ STEP 2: Create Telegram Application
-        LOGGER.info("🤖 Creating Telegram application...")
-        application = Application.builder().token(BOT_TOKEN).build()
-        
-        # Store start time for uptime calculation
-        application.start_time = time.time()
-        
-        # ✅ STEP 3: Setup Bot Commands Menu
-        LOGGER.info("📱 Setting up bot menu commands...")
-        # Note: We'll set commands after handlers are added
-        
-        # ✅ STEP 4: Add Enhanced Command Handlers
-        LOGGER.info("🔧 Adding command handlers...")
-        
-        if commands_available:
-            try:
-                # Enhanced commands
-                application.add_handler(CommandHandler("start", commands.start))
-                LOGGER.info("✅ Enhanced /start command added")
-            except AttributeError:
-                application.add_handler(CommandHandler("start", simple_start))
-                LOGGER.info("🔧 Fallback /start command added")
-            
-            # Add other enhanced commands with fallbacks
-            enhanced_commands = [
-                ("help", commands.help_command, simple_help),
-                ("contact", commands.contact_command, simple_contact),
-                ("about", commands.about_command, simple_about),
-                ("status", commands.status_command, simple_status),
-                ("test", commands.test_handler, simple_test)
-            ]
-            
-            for cmd_name, enhanced_func, fallback_func in enhanced_commands:
-                try:
-                    application.add_handler(CommandHandler(cmd_name, enhanced_func))
-                    LOGGER.info(f"✅ Enhanced /{cmd_name} command added")
-                except AttributeError:
-                    application.add_handler(CommandHandler(cmd_name, fallback_func))
-                    LOGGER.info(f"🔧 Fallback /{cmd_name} command added")
-        else:
-            # Use all fallback commands
-            LOGGER.info("🔧 Using fallback command handlers")
-            application.add_handler(CommandHandler("start", simple_start))
-            application.add_handler(CommandHandler("help", simple_help))
-            application.add_handler(CommandHandler("contact", simple_contact))
-            application.add_handler(CommandHandler("about", simple_about))
-            application.add_handler(CommandHandler("status", simple_status))
-            application.add_handler(CommandHandler("test", simple_test))
-        
-        # ✅ STEP 5: Add Message Handler
-        LOGGER.info("📨 Adding message handler...")
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_messages))
-        
-        # ✅ STEP 6: Add Verification Callbacks (if available)
-        try:
-            from bot.modules.token_verification import handle_verification_callbacks
-            application.add_handler(CallbackQueryHandler(handle_verification_callbacks))
-            LOGGER.info("✅ Verification callback system enabled")
-        except ImportError:
-            LOGGER.info("ℹ️ Verification system not available (optional)")
-        except Exception as e:
-            LOGGER.warning(f"⚠️ Verification system setup failed: {e}")
+        # ✅ STEP 2-6: Create Telegram Application and add handlers (heavy imports happen here)
+        application = build_application()
         
         # ✅ STEP 7: Setup Bot Menu Commands (after handlers)
         async def setup_commands_async():
@@ -351,8 +482,8 @@ def main():
         LOGGER.info("="*60)
         LOGGER.info("✅ ULTRA TERABOX BOT v2.0 - STARTUP COMPLETE")
         LOGGER.info("="*60)
-        LOGGER.info(f"🤖 Bot Token: {BOT_TOKEN[:20]}...")
-        LOGGER.info(f"👤 Owner ID: {OWNER_ID}")
+        LOGGER.info(f"🤖 Bot Token: {CONFIG.BOT_TOKEN[:20]}...")
+        LOGGER.info(f"👤 Owner ID: {CONFIG.OWNER_ID}")
         LOGGER.info(f"🏥 Health Server: Running on port 8000")
         LOGGER.info(f"🔧 Enhanced Commands: {'Available' if commands_available else 'Fallback Mode'}")
         LOGGER.info(f"📨 Enhanced Messages: {'Available' if messages_available else 'Fallback Mode'}")
@@ -372,7 +503,7 @@ def main():
             write_timeout=30,
             connect_timeout=30,
             pool_timeout=30,
-            drop_pending_updates=True,
+            drop_pending_updates=False,  # Redelivered job messages are deduplicated by the journal
             allowed_updates=["message", "callback_query"]
         )
         
@@ -385,6 +516,7 @@ def main():
 
 if __name__ == "__main__":
     # ✅ FINAL STARTUP
+    setup_logging()
     LOGGER.info("🎊 Ultra Terabox Bot v2.0 - Complete Enhanced Edition")
     LOGGER.info("🚀 Initializing all systems...")
     main()
@@ -0,0 +1,277 @@
+"""
+Batch Leech - many share links processed as one job
+Bounded-concurrency extraction feeding the download/upload pipeline,
+with a single consolidated progress message
+"""
+
+import asyncio
+import time
+from config import (
+    LOGGER, MAX_BATCH_LINKS, EXTRACT_CONCURRENCY,
+    MAX_CONCURRENT_DOWNLOADS, STATUS_UPDATE_INTERVAL, BOT_MODE
+)
+from bot.handlers.processor import (
+    extract_file_info, deliver_file, format_size, clean_filename, JobError, require_quota, finish_cancelled
+)
+from bot.utils.cancellation import cancel_registry, cancel_markup
+from bot.utils.disk_manager import InsufficientDiskSpace
+from bot.utils.extractor_registry import extractor_registry, make_file_info
+from bot.utils.folder_walker import walk_share
+from bot.utils import job_journal as journal
+from bot.utils.job_journal import job_journal
+from bot.utils.job_scheduler import priority_class, RANK
+from bot.utils.quota import quota_engine
+from bot.utils.terabox_resolver import FolderShareError, get_native_resolver
+
+PENDING = "⏳"
+WORKING = "🔄"
+DONE = "✅"
+FAILED = "❌"
+
+FOLDER = object()  # Extraction marker: the link is a folder share
+
+
+class BatchProgress:
+    """One status message for the whole batch, edited at most every STATUS_UPDATE_INTERVAL"""
+    
+    def __init__(self, status_msg, links):
+        self.status_msg = status_msg
+        self.items = [[PENDING, link.surl] for link in links]
+        self._last_edit = 0
+        self._lock = asyncio.Lock()
+    
+    def set(self, index, state, text):
+        self.items[index] = [state, text]
+    
+    def add(self, state, text):
+        """Append a line discovered mid-batch (e.g. a file inside a folder share)"""
+        self.items.append([state, text])
+        return len(self.items) - 1
+    
+    def render(self, title="📦 Batch Leech"):
+        counts = {state: 0 for state in (PENDING, WORKING, DONE, FAILED)}
+        lines = []
+        for number, (state, text) in enumerate(self.items, 1):
+            counts[state] += 1
+            lines.append(f"{state} {number}. {text[:60]}")
+        return (
+            f"{title}\n"
+            f"✅ {counts[DONE]}  ❌ {counts[FAILED]}  🔄 {counts[WORKING]}  ⏳ {counts[PENDING]}\n\n"
+            + "\n".join(lines)
+        )
+    
+    async def refresh(self, force=False, title="📦 Batch Leech", final=False):
+        async with self._lock:
+            if not force and time.monotonic() - self._last_edit < STATUS_UPDATE_INTERVAL:
+                return
+            self._last_edit = time.monotonic()
+            try:
+                # Plain text: filenames would break Markdown parsing; the final edit drops the Cancel button
+                await self.status_msg.edit_text(self.render(title), **({'reply_markup': None} if final else {}))
+            except Exception as e:
+                LOGGER.debug(f"Batch status edit skipped: {e}")  # Not modified / rate limited
+
+
+class BatchRun:
+    """Shared state of one batch: the consolidated progress and the download slots"""
+    
+    def __init__(self, message, progress):
+        self.message = message
+        self.user_id = message.from_user.id
+        self.progress = progress
+        self.download_slots = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        self.delivered = 0
+        self.total = len(progress.items)
+    
+    async def deliver(self, index, file_info, job_id=None):
+        """Download + upload one file, reporting into its progress line"""
+        progress = self.progress
+        filename = file_info['filename']
+        progress.set(index, PENDING, f"{filename}: queued")
+        
+        async def on_progress(downloaded, total, strategy_num):
+            percent = f"{downloaded / total * 100:.0f}%" if total else format_size(downloaded)
+            progress.set(index, WORKING, f"{filename}: {percent}")
+            await progress.refresh()
+        
+        async with self.download_slots:
+            progress.set(index, WORKING, f"{filename}: downloading")
+            await progress.refresh()
+            try:
+                await deliver_file(self.message, file_info, progress_callback=on_progress, job_id=job_id)
+            except JobError as e:
+                progress.set(index, FAILED, f"{filename}: {e.reason}")
+                job_journal.finish(job_id, journal.FAILED, e.reason)
+                return False
+            except InsufficientDiskSpace:
+                progress.set(index, FAILED, f"{filename}: server storage full")
+                job_journal.finish(job_id, journal.FAILED, "Server storage full")
+                return False
+            except Exception as e:
+                LOGGER.error(f"Batch item {filename} failed: {e}")
+                progress.set(index, FAILED, f"{filename}: {e}")
+                job_journal.finish(job_id, journal.FAILED, str(e))
+                return False
+            finally:
+                await progress.refresh()
+        
+        progress.set(index, DONE, filename)
+        job_journal.finish(job_id, journal.DONE)
+        self.delivered += 1
+        return True
+    
+    async def expand_entries(self, index, link, entries):
+        """Deliver the files an extractor listed for a multi-file share, each
+        through its own direct link"""
+        self.total += len(entries) - 1  # The share line itself is not a deliverable file
+        files = []
+        for entry in entries:
+            filename = clean_filename(entry['filename'])
+            files.append((self.progress.add(PENDING, f"{filename}: queued"), {
+                **entry, 'filename': filename, 'source': link.cache_key
+            }))
+        self.progress.set(index, DONE, f"📂 {link.surl}: {len(files)} files")
+        await self.progress.refresh()
+        results = await asyncio.gather(*(self.deliver(entry_index, file_info) for entry_index, file_info in files))
+        await self.progress.refresh()
+        return any(results)
+    
+    async def expand_folder(self, index, link, folder_filter=None, entries=None):
+        """Walk a folder share; each file becomes its own line and starts
+        downloading as soon as it is discovered. Walking needs the native
+        backend (and its cookie); without it the `entries` the extractor
+        already returned are delivered instead."""
+        if entries and 'native' not in extractor_registry.backends:
+            return await self.expand_entries(index, link, entries)
+        resolver = get_native_resolver()
+        self.progress.set(index, WORKING, f"{link.surl}: scanning folder")
+        await self.progress.refresh()
+        
+        async def deliver_entry(entry_index, entry):
+            try:
+                download_url = await resolver.resolve_dlink(entry['dlink'])
+            except Exception as e:
+                self.progress.set(entry_index, FAILED, f"{entry['filename']}: {e}")
+                return False
+            file_info = make_file_info(
+                clean_filename(entry['filename']), entry['size'], download_url, 'native',
+                md5=entry['md5'], fs_id=entry['fs_id'], source=f"{link.cache_key}:{entry['fs_id']}"
+            )
+            return await self.deliver(entry_index, file_info)
+        
+        deliveries = []
+        try:
+            share = await resolver.open_share(link.surl)
+            async for entry in walk_share(resolver, share, folder_filter):
+                entry_index = self.progress.add(PENDING, f"{entry['filename']}: queued")
+                self.total += 1
+                deliveries.append(asyncio.create_task(deliver_entry(entry_index, entry)))
+                await self.progress.refresh()
+        except Exception as e:
+            LOGGER.warning(f"📂 Folder {link.surl} failed: {e}")
+            self.progress.set(index, FAILED, f"{link.surl}: {e}")
+        except BaseException:
+            for delivery in deliveries:
+                delivery.cancel()  # Cancelled mid-walk: no delivery may outlive the job
+            raise
+        else:
+            self.progress.set(index, DONE, f"📂 {link.surl}: {len(deliveries)} files")
+        
+        self.total -= 1  # The folder line itself is not a deliverable file
+        results = await asyncio.gather(*deliveries)
+        await self.progress.refresh()
+        return any(results)
+
+
+async def process_terabox_links(message, links, status_msg=None, job_ids=None):
+    """Extract and deliver every link in `links` as one batch job.
+    
+    Each link is journaled as its own job (`job_ids` reuses existing ones)
+    so a restart resumes the links that were still in flight.
+    """
+    user_id = message.from_user.id
+    
+    # A redelivered message was journaled (and charged) the first time
+    if job_ids is None and job_journal.seen(message.chat_id, message.message_id):
+        LOGGER.info(f"♻️ Message {message.message_id} already journaled, skipping redelivery")
+        return
+    
+    if len(links) > MAX_BATCH_LINKS:
+        await message.reply_text(
+            f"⚠️ **Only the first {MAX_BATCH_LINKS} of {len(links)} links will be processed**",
+            parse_mode='Markdown'
+        )
+        links = links[:MAX_BATCH_LINKS]
+    
+    # One download token per link, taken for the whole batch up front
+    if job_ids is None and not await require_quota(message, count=len(links)):
+        return
+    
+    LOGGER.info(f"📦 Batch of {len(links)} links from user {user_id}")
+    if status_msg is None:
+        status_msg = await message.reply_text(f"🔍 Processing {len(links)} Terabox links...")
+    if job_ids is None:
+        priority = RANK[priority_class(user_id)]
+        job_ids = [job_journal.create(user_id, message.chat_id, message.message_id, link.url, priority) for link in links]
+        if BOT_MODE == 'front':
+            # Workers run each link as its own job and reply to this message;
+            # its Cancel button stops every link of the batch
+            for job_id in job_ids:
+                job_journal.update(job_id, batch_message_id=status_msg.message_id)
+            await status_msg.edit_text(
+                f"🕒 {len(links)} Terabox links queued for download", reply_markup=cancel_markup()
+            )
+            return
+    async with cancel_registry.track(status_msg, user_id) as (status_msg, cancel):
+        run = BatchRun(message, BatchProgress(status_msg, links))
+        progress = run.progress
+        extract_slots = asyncio.Semaphore(EXTRACT_CONCURRENCY)
+    
+        async def extract(index, link):
+            async with extract_slots:
+                progress.set(index, WORKING, f"{link.surl}: extracting")
+                try:
+                    return await extract_file_info(link.url)
+                except FolderShareError:
+                    return FOLDER
+                except Exception as e:
+                    progress.set(index, FAILED, f"{link.surl}: {e}")
+                    job_journal.finish(job_ids[index], journal.FAILED, str(e))
+                    return None
+                finally:
+                    await progress.refresh()
+    
+        async def deliver(index, link, extraction):
+            # Downloads start as soon as their own extraction finishes
+            file_info = await extraction
+            job_id = job_ids[index]
+            if file_info is FOLDER or (file_info and file_info.get('share_entries', 1) > 1):
+                job_journal.update(job_id, kind='folder')
+                delivered = await run.expand_folder(
+                    index, link, entries=None if file_info is FOLDER else file_info.get('entries')
+                )
+                job_journal.finish(job_id, journal.DONE if delivered else journal.FAILED)
+            else:
+                delivered = bool(file_info) and await run.deliver(index, file_info, job_id)
+            if not delivered:
+                quota_engine.refund(user_id, downloads=1)  # The link's token buys nothing
+            return delivered
+    
+        extractions = [asyncio.create_task(extract(i, link)) for i, link in enumerate(links)]
+        try:
+            await asyncio.gather(*(deliver(i, link, task) for i, (link, task) in enumerate(zip(links, extractions))))
+        finally:
+            for task in extractions:
+                task.cancel()  # Only still running when the batch was cancelled
+    
+        LOGGER.info(f"📦 Batch finished for user {user_id}: {run.delivered}/{run.total} delivered")
+        await progress.refresh(force=True, title=f"📦 Batch complete: {run.delivered}/{run.total} delivered", final=True)
+    if cancel.requested:
+        await finish_cancelled(status_msg, user_id, job_ids)
+
+
+async def process_terabox_folder(message, link, status_msg=None, job_id=None):
+    """A single folder share: same pipeline, one progress message"""
+    await process_terabox_links(
+        message, [link], status_msg=status_msg, job_ids=None if job_id is None else [job_id]
+    )
@@ -6,11 +6,11 @@ Full file with all callback functions + automatic link generation
 import os
 import time
 import logging
-import requests
 import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackQueryHandler, ContextTypes
 from config import *
+from bot.utils.http_client import http_client
 
 LOGGER = logging.getLogger(__name__)
 
@@ -36,10 +36,13 @@ async def generate_arolinks_api_link(user_id: int, destination_url: str = None):
         }
         
         # ✅ MAKE API CALL
-        response = requests.post(AROLINKS_API_URL, data=api_payload, timeout=10)
+        async with http_client.session().post(
+            AROLINKS_API_URL, data=api_payload, timeout=http_client.timeout(total=10)
+        ) as response:
+            status = response.status
+            result = await response.json(content_type=None) if status == 200 else None
         
-        if response.status_code == 200:
-            result = response.json()
+        if status == 200:
             if result.get('status') == 'success':
                 short_url = result.get('short_url')
                 LOGGER.info(f"✅ Arolinks API generated: {short_url} for user {user_id}")
@@ -48,7 +51,7 @@ async def generate_arolinks_api_link(user_id: int, destination_url: str = None):
                 LOGGER.error(f"❌ Arolinks API error: {result.get('message')}")
                 return f"https://arolinks.com/fallback?user={user_id}"
         else:
-            LOGGER.error(f"❌ Arolinks API HTTP error: {response.status_code}")
+            LOGGER.error(f"❌ Arolinks API HTTP error: {status}")
             return f"https://arolinks.com/fallback?user={user_id}"
             
     except Exception as e:
@@ -117,13 +120,11 @@ async def handle_status_callback(query, context):
     """Handle status callback"""
     user_id = query.from_user.id
     
-    # Get user stats (implement with your database)
-    try:
-        user_downloads = 2  # Replace with actual database call
-        is_verified = False  # Replace with actual verification check
-    except:
-        user_downloads = 0
-        is_verified = False
+    # Get user stats
+    from bot.utils.quota import quota_engine
+    from bot.utils.token_verification import check_verification
+    user_downloads = quota_engine.usage(user_id)['downloads_used']
+    is_verified = check_verification(user_id)
     
     keyboard = [
         [InlineKeyboardButton("🔙 Back to Menu", callback_data="help")]
@@ -374,6 +375,24 @@ async def handle_help_callback(query, context):
         parse_mode='Markdown'
     )
 
+# ✅ CANCEL BUTTON ON JOB STATUS MESSAGES
+async def handle_cancel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Stop the job whose status message carries the pressed Cancel button"""
+    from bot.handlers.processor import cancel_jobs
+    
+    query = update.callback_query
+    message = query.message
+    stopped = await cancel_jobs(query.from_user.id, message.chat_id, message.message_id)
+    if not stopped:
+        await query.answer("Nothing to cancel here", show_alert=False)
+        return
+    await query.answer("🛑 Cancelling...")
+    if BOT_MODE == 'front':
+        # The job runs in a worker; there is no local unwinding to report it
+        await query.edit_message_text(
+            "🛑 **Cancelled**\n\n🗑️ **Partial download removed**", parse_mode='Markdown'
+        )
+
 # ✅ EXPORT THE MAIN HANDLER FUNCTION
 def get_callback_handler():
     """Get the callback query handler"""
@@ -9,6 +9,8 @@ import logging
 
 LOGGER = logging.getLogger(__name__)
 
+MAX_LINK_FILE_BYTES = 256 * 1024  # Replied-to link lists larger than this are refused
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Enhanced start command with contact buttons"""
     user_name = update.effective_user.first_name
@@ -74,7 +76,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "• `/about` - About this bot\n"
         "• `/status` - Bot status\n"
         "• `/leech` - Standard download\n"
-        "• `/fast` - Enhanced download\n\n"
+        "• `/fast` - Enhanced download\n"
+        "• `/cancel` - Stop your running downloads\n\n"
         "**How to use:**\n"
         "1. Send any Terabox link\n"
         "2. Complete verification if required\n"
@@ -141,11 +144,103 @@ async def test_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Test handler - keep your existing implementation"""
     await update.message.reply_text("🧪 **Bot Test**\n\nBot is working correctly!")
 
+async def collect_leech_links(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Share links from the command arguments, a replied-to message or a replied-to .txt file;
+    None when the user has already been told why nothing can be read"""
+    from bot.utils.url_classifier import extract_share_links
+    
+    message = update.message
+    sources = [" ".join(context.args or [])]
+    
+    replied = message.reply_to_message
+    if replied:
+        sources.append(replied.text or replied.caption or "")
+        document = replied.document
+        if document and (document.mime_type == 'text/plain' or (document.file_name or '').lower().endswith('.txt')):
+            if document.file_size and document.file_size > MAX_LINK_FILE_BYTES:
+                await message.reply_text("❌ **Link file too large** (max 256 KB)", parse_mode='Markdown')
+                return None
+            link_file = await document.get_file()
+            content = await link_file.download_as_bytearray()
+            sources.append(content.decode('utf-8', errors='ignore'))
+    
+    # Deduplicate across sources by canonical key, keeping order
+    links = {}
+    for text in sources:
+        for link in extract_share_links(text):
+            links.setdefault(link.cache_key, link)
+    return list(links.values())
+
 async def leech_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Keep your existing leech_command implementation here"""
-    await update.message.reply_text("🔧 **Leech Command**\n\nSend a Terabox URL to start downloading!")
+    """Leech every share link in the command, or in the replied-to message / .txt file"""
+    links = await collect_leech_links(update, context)
+    if links is None:
+        return
+    if not links:
+        await update.message.reply_text(
+            "🔧 **Leech Command**\n\n"
+            "Send `/leech <links...>`, or reply with /leech to a message or .txt file of Terabox links!",
+            parse_mode='Markdown'
+        )
+        return
+    
+    from bot.handlers.batch import process_terabox_links
+    await process_terabox_links(update.message, links)
 
 async def fast_leech_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Keep your existing fast_leech_command implementation here"""
-    await update.message.reply_text("⚡ **Fast Leech Command**\n\nSend a Terabox URL for enhanced downloading!")
+    """Same pipeline as /leech - kept as an alias for existing users"""
+    await leech_command(update, context)
+
+async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Cancel all of your running jobs, or only the one whose status message you reply to"""
+    from bot.handlers.processor import cancel_jobs
     
+    message = update.message
+    replied = message.reply_to_message
+    if replied:
+        stopped = await cancel_jobs(update.effective_user.id, replied.chat_id, replied.message_id)
+    else:
+        stopped = await cancel_jobs(update.effective_user.id)
+    
+    if stopped:
+        await message.reply_text(f"🛑 **Cancelling {stopped} job{'s' if stopped > 1 else ''}**", parse_mode='Markdown')
+    else:
+        await message.reply_text("ℹ️ **Nothing to cancel**", parse_mode='Markdown')
+
+async def bandwidth_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Owner only: show or set the download cap - `/bandwidth [ingress_mbps] [upload_reserve_mbps]`"""
+    from bot.utils.bandwidth import bandwidth_shaper, MBPS
+    
+    if update.effective_user.id != OWNER_ID:
+        await update.message.reply_text("❌ **Owner only command**", parse_mode='Markdown')
+        return
+    
+    if context.args:
+        try:
+            values = [float(arg) for arg in context.args[:2]]
+        except ValueError:
+            await update.message.reply_text(
+                "❌ Usage: `/bandwidth <ingress_mbps> [upload_reserve_mbps]` (0 = unlimited)",
+                parse_mode='Markdown'
+            )
+            return
+        bandwidth_shaper.configure(
+            ingress_bps=values[0] * MBPS,
+            upload_reserve_bps=values[1] * MBPS if len(values) > 1 else None
+        )
+        if BOT_MODE != 'all':
+            # Workers pick the new limits up from the journal
+            from bot.utils.job_journal import job_journal
+            job_journal.set_bandwidth_limits(bandwidth_shaper.ingress_bps, bandwidth_shaper.upload_reserve_bps)
+    
+    stats = bandwidth_shaper.stats()
+    lines = [
+        "🚦 **Bandwidth**\n",
+        f"⬇️ **Ingress cap:** {stats['ingress_bps'] / MBPS:.1f} Mbit/s" + (" (unlimited)" if not stats['ingress_bps'] else ""),
+        f"⬆️ **Upload reserve:** {stats['upload_reserve_bps'] / MBPS:.1f} Mbit/s",
+        f"📥 **Active downloads:** {len(stats['flows'])}",
+    ]
+    for flow in stats['flows']:
+        allocated = f"{flow['allocated_bps'] / MBPS:.1f}" if flow['allocated_bps'] is not None else "∞"
+        lines.append(f"• `{flow['label']}` {flow['achieved_bps'] / MBPS:.1f} / {allocated} Mbit/s")
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
@@ -8,13 +8,12 @@ from telegram.ext import ContextTypes
 from config import *
 from bot.utils.token_verification import (
     generate_verification_link, 
-    check_verification, 
     verify_user_token,
-    get_user_download_count,
-    increment_user_downloads,
     get_verification_info,
     VALIDITY_TIME_TEXT
 )
+from bot.utils.url_classifier import extract_share_links
+from bot.utils.quota import quota_engine
 
 LOGGER = logging.getLogger(__name__)
 
@@ -28,7 +27,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     LOGGER.info(f"Message from user {user_id}: {text[:50]}...")
     
     # Check if it's a Terabox URL
-    if any(domain in text.lower() for domain in ['terabox.com', '1024tera.com', 'teraboxapp.com', 'nephobox.com', 'mirrobox.com', 'terabox.app']):
+    if extract_share_links(text):
         await handle_terabox_url(update, context)
     else:
         await message.reply_text(
@@ -47,19 +46,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_terabox_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle Terabox URL with verification check"""
     message = update.message
-    user_id = message.from_user.id
     terabox_url = message.text.strip()
     
-    # Check user verification status
-    if VERIFY:
-        user_downloads = get_user_download_count(user_id)
-        is_verified = check_verification(user_id)
-        
-        if user_downloads >= FREE_DOWNLOAD_LIMIT and not is_verified:
-            await send_verification_required_message(message, user_id, user_downloads)
-            return
-    
-    # Process the Terabox URL
+    # Process the Terabox URL (the processor applies the user's quota)
     try:
         from bot.handlers.processor import process_terabox_url
         await process_terabox_url(update, context)
@@ -71,7 +60,7 @@ async def send_verification_required_message(message, user_id, download_count):
     """Send VJ-style verification message with validity time info"""
     try:
         # Generate verification link
-        verify_link = generate_verification_link(user_id)
+        verify_link = await generate_verification_link(user_id)
         
         if verify_link:
             keyboard = [
@@ -141,7 +130,7 @@ async def handle_start_command(update: Update, context: ContextTypes.DEFAULT_TYP
                 return
     
     # Regular start message with verification info
-    user_downloads = get_user_download_count(user_id)
+    user_downloads = quota_engine.usage(user_id)['downloads_used']
     verification_info = get_verification_info(user_id)
     
     if verification_info['verified']:
@@ -4,17 +4,52 @@ Enhanced with bulletproof download retry logic
 """
 
 import os
-import requests
 import aiohttp
 import aiofiles
 import asyncio
+import time
 from pathlib import Path
-from urllib.parse import quote
+from types import SimpleNamespace
 from telegram import Update
 from telegram.ext import ContextTypes
-from config import LOGGER, DOWNLOAD_DIR, FREE_DOWNLOAD_LIMIT
+from config import (
+    LOGGER, DOWNLOAD_DIR, VERIFY, JOURNAL_CHECKPOINT_MB, JOURNAL_MAX_RESUMES, BOT_MODE,
+    UPLOAD_STREAMING, PREFLIGHT_PROBE
+)
+from bot.utils.url_classifier import extract_share_links, classify_url
+from bot.utils.disk_manager import disk_manager, InsufficientDiskSpace
+from bot.utils.memory_governor import memory_governor
+from bot.utils.file_cache import file_cache, fingerprint
+from bot.utils.image_stage import prepare_image, IMAGE_EXTENSIONS, PHOTO
+from bot.utils import job_journal as journal
+from bot.utils.job_journal import job_journal
+from bot.utils.extractor_registry import extractor_registry
+from bot.utils.http_client import http_client
+from bot.utils.bandwidth import bandwidth_shaper
+from bot.utils.cancellation import cancel_registry, cancel_markup
+from bot.utils.job_scheduler import job_scheduler, priority_class, BANDWIDTH_WEIGHT, RANK, CLASS_OF_RANK
+from bot.utils.preflight import probe, kind_of_name, preflight_stats, VIDEO
+from bot.utils.streaming_upload import send_file
+from bot.utils.log_forwarder import log_forwarder
+from bot.utils.quota import quota_engine, DOWNLOADS
+from bot.utils.user_state import user_state
+from bot.utils.token_verification import check_verification, format_time_remaining
+from bot.utils.metrics import request_latency
+from bot.utils.integrity import StreamVerifier, IntegrityError, parse_content_range, integrity_stats
+from bot.utils.terabox_resolver import FolderShareError
 import re
 
+# Working memory of one in-flight download (socket buffers + write queue)
+DOWNLOAD_MEMORY_ESTIMATE = 4 * 1024 * 1024
+MAX_FILE_SIZE = 2 * 1024 * 1024 * 1024  # 2GB limit
+
+DOWNLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': '*/*',
+    'Accept-Encoding': 'identity',  # Byte counts and MD5 must match the stored file
+    'Connection': 'keep-alive'
+}
+
 def speed_string_to_bytes(size_str):
     """Convert size string to bytes"""
     size_str = size_str.replace(" ", "").upper()
@@ -62,7 +97,7 @@ def clean_filename(filename):
                 cleaned = cleaned[:100]
         
         # Add extension if missing
-        extensions = ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.jpg', '.png', '.pdf', '.zip']
+        extensions = ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.pdf', '.zip', *IMAGE_EXTENSIONS]
         if not any(cleaned.lower().endswith(ext) for ext in extensions):
             if any(word in cleaned.lower() for word in ['video', 'movie', 'mp4', 'vid']):
                 cleaned += '.mp4'
@@ -73,69 +108,63 @@ def clean_filename(filename):
     except:
         return 'terabox_file.mp4'
 
-def extract_terabox_info(url):
-    """Extract file info using wdzone-terabox-api - PROVEN WORKING"""
-    try:
-        LOGGER.info(f"Processing URL: {url}")
-        
-        apiurl = f"https://wdzone-terabox-api.vercel.app/api?url={quote(url)}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:122.0) Gecko/20100101 Firefox/122.0'
-        }
-        
-        LOGGER.info(f"Making API request to: {apiurl}")
-        
-        response = requests.get(apiurl, headers=headers, timeout=30)
-        if response.status_code != 200:
-            raise Exception(f"API request failed with status: {response.status_code}")
-        
-        req = response.json()
-        LOGGER.info(f"API response: {req}")
-        
-        extracted_info = None
-        if "✅ Status" in req and req["✅ Status"] == "Success":
-            extracted_info = req.get("📜 Extracted Info", [])
-        elif "Status" in req and req["Status"] == "Success":
-            extracted_info = req.get("Extracted Info", [])
-        else:
-            if "❌ Status" in req:
-                error_msg = req.get("📜 Message", "Unknown error")
-                raise Exception(f"API Error: {error_msg}")
-            else:
-                raise Exception("Invalid API response format")
-        
-        if not extracted_info:
-            raise Exception("No files found")
-        
-        data = extracted_info[0]
-        raw_filename = data.get("📂 Title") or data.get("Title", "Unknown")
-        size_str = data.get("📏 Size") or data.get("Size", "0 B")
-        download_url = data.get("🔽 Direct Download Link") or data.get("Direct Download Link", "")
-        
-        # ENHANCED: Clean the filename
-        filename = clean_filename(raw_filename)
-        
-        result = {
-            'filename': filename,
-            'size': speed_string_to_bytes(size_str.replace(" ", "")),
-            'download_url': download_url,
-            'type': 'file'
-        }
-        
-        LOGGER.info(f"File extracted: {result}")
-        return result
-        
-    except Exception as e:
-        LOGGER.error(f"Terabox extraction error: {e}")
-        raise Exception(f"Failed to process Terabox link: {str(e)}")
+async def extract_file_info(url):
+    """Extract file info through the extractor registry (failover + hedging)"""
+    LOGGER.info(f"Processing URL: {url}")
+    file_info = await extractor_registry.extract(url)
+    link = classify_url(url)
+    file_info['source'] = link.cache_key if link else url
+    
+    # ENHANCED: Clean the filename
+    file_info['filename'] = clean_filename(file_info['filename'])
+    LOGGER.info(f"File extracted via {file_info['backend']}: {file_info['filename']} ({format_size(file_info['size'])})")
+    return file_info
 
-async def download_file_with_retry(download_url, filename, status_msg=None):
-    """ENHANCED download with multiple retry strategies"""
+async def preflight(file_info):
+    """Probe the download URL before anything is downloaded and correct
+    `file_info` in place: the exact size, whether the server resumes
+    ('ranges') and the media kind read from the file's first bytes. A name
+    whose extension contradicts the content (e.g. the '.mp4' default on a
+    ZIP) gets the real one."""
+    if not PREFLIGHT_PROBE or not file_info.get('download_url'):
+        return file_info
+    result = await probe(file_info['download_url'], DOWNLOAD_HEADERS)
+    if result is None:
+        return file_info  # Extractor's info it is
+    
+    if result['size'] and result['size'] != file_info['size']:
+        preflight_stats['size_corrected'] += 1
+        LOGGER.info(f"📏 {file_info['filename']} is exactly {result['size']} bytes (extractor said {format_size(file_info['size'])})")
+        file_info['size'] = result['size']
+    file_info['ranges'] = result['ranges']
+    
+    kind = result['kind']
+    if kind:
+        file_info['media_kind'] = kind
+        filename = file_info['filename']
+        stem, extension = os.path.splitext(filename)
+        if result['extension'] and kind_of_name(filename) != kind and extension.lower() != result['extension']:
+            file_info['filename'] = stem + result['extension']
+            preflight_stats['renamed'] += 1
+            LOGGER.info(f"🏷️ {filename} is really {kind} content, renamed to {file_info['filename']}")
+    return file_info
+
+async def download_file_with_retry(download_url, filename, status_msg=None, file_path=None, progress_callback=None,
+                                   expected_md5=None, resume_offset=0, checkpoint=None, flow=None):
+    """ENHANCED download with multiple retry strategies.
+    
+    Every attempt is verified while it streams (byte count, MD5 when known);
+    a truncated attempt is resumed with a Range request from the last byte
+    written instead of starting over. `resume_offset` continues a partial
+    file left by a previous run; `checkpoint(offset)` is called as bytes land.
+    A bandwidth shaper `flow` paces the reader chunk by chunk.
+    """
     if not download_url:
         return None
     
-    file_path = Path(DOWNLOAD_DIR) / filename
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    if file_path is None:
+        file_path = Path(DOWNLOAD_DIR) / filename
+        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
     
     # Multiple download strategies
     strategies = [
@@ -144,61 +173,80 @@ async def download_file_with_retry(download_url, filename, status_msg=None):
         {"chunk_size": 4096, "timeout": 180},     # Medium chunks, longer timeout
     ]
     
+    verifier = StreamVerifier(expected_md5)
+    if resume_offset and file_path.exists():
+        await verifier.resume_from(file_path, resume_offset)
+        LOGGER.info(f"♻️ Resuming {filename} from byte {verifier.received}")
+    last_checkpoint = verifier.received
+    
     for strategy_num, strategy in enumerate(strategies, 1):
         try:
             LOGGER.info(f"🔄 Download strategy {strategy_num}: chunk_size={strategy['chunk_size']}, timeout={strategy['timeout']}")
             
-            timeout = aiohttp.ClientTimeout(
+            timeout = http_client.timeout(
                 total=strategy["timeout"],
                 connect=30,
                 sock_read=strategy["timeout"]//2
             )
             
-            connector = aiohttp.TCPConnector(
-                limit=5,
-                limit_per_host=2,
-                ttl_dns_cache=300,
-                keepalive_timeout=60,
-                enable_cleanup_closed=True
-            )
+            headers = DOWNLOAD_HEADERS
+            if verifier.received:
+                # Only the missing tail is fetched again
+                headers = {**DOWNLOAD_HEADERS, 'Range': f"bytes={verifier.received}-"}
             
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': '*/*',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive'
-            }
+            # Pooled session: retries reuse the warm connection and DNS cache
+            session = http_client.session()
+            LOGGER.info(f"📥 Starting download with strategy {strategy_num}")
             
-            async with aiohttp.ClientSession(
-                connector=connector, 
-                timeout=timeout,
-                headers=headers
-            ) as session:
+            async with session.get(download_url, headers=headers, timeout=timeout, allow_redirects=True) as response:
+                content_length = int(response.headers.get('content-length', 0))
+                content_range = parse_content_range(response.headers.get('content-range'))
+                
+                if response.status == 206 and content_range and content_range[0] == verifier.received:
+                    integrity_stats['range_resumes'] += 1
+                    LOGGER.info(f"⏩ Resuming {filename} at byte {verifier.received}")
+                    verifier.expected_size = content_range[1] or verifier.received + content_length
+                elif response.status == 200:
+                    if verifier.received:
+                        LOGGER.warning(f"Server ignored Range for {filename}, restarting from byte 0")
+                    verifier.reset()
+                    last_checkpoint = 0
+                    if checkpoint:
+                        checkpoint(0)
+                    verifier.expected_size = content_length
+                else:
+                    LOGGER.warning(f"Strategy {strategy_num} failed: HTTP {response.status}")
+                    continue
+                
+                total_size = verifier.expected_size
+                last_update = verifier.received
                 
-                LOGGER.info(f"📥 Starting download with strategy {strategy_num}")
+                LOGGER.info(f"📊 Total size: {total_size}, using {strategy['chunk_size']} byte chunks")
                 
-                async with session.get(download_url, allow_redirects=True) as response:
-                    if response.status != 200:
-                        LOGGER.warning(f"Strategy {strategy_num} failed: HTTP {response.status}")
-                        continue
-                    
-                    total_size = int(response.headers.get('content-length', 0))
-                    downloaded = 0
-                    last_update = 0
-                    
-                    LOGGER.info(f"📊 Total size: {total_size}, using {strategy['chunk_size']} byte chunks")
-                    
-                    async with aiofiles.open(file_path, 'wb') as f:
-                        async for chunk in response.content.iter_chunked(strategy["chunk_size"]):
+                # Write into the preallocated file (if any) instead of truncating it
+                async with aiofiles.open(file_path, 'r+b' if file_path.exists() else 'wb') as f:
+                    await f.seek(verifier.received)
+                    chunk_size = memory_governor.chunk_size(strategy["chunk_size"])
+                    try:
+                        async for chunk in response.content.iter_chunked(chunk_size):
                             if chunk:
+                                if flow:
+                                    await flow.consume(len(chunk))
                                 await f.write(chunk)
-                                downloaded += len(chunk)
+                                await verifier.update(chunk)
+                                downloaded = verifier.received
+                                
+                                if checkpoint and downloaded - last_checkpoint >= JOURNAL_CHECKPOINT_MB * 1024 * 1024:
+                                    checkpoint(downloaded)
+                                    last_checkpoint = downloaded
                                 
                                 # Update progress every 1MB or every 10 seconds
                                 if downloaded - last_update >= 1024 * 1024:
                                     progress = (downloaded / total_size) * 100 if total_size > 0 else 0
                                     try:
-                                        if status_msg:
+                                        if progress_callback:
+                                            await progress_callback(downloaded, total_size, strategy_num)
+                                        elif status_msg:
                                             await status_msg.edit_text(
                                                 f"📁 **Downloading**\n⬇️ **Progress:** {progress:.1f}%\n📊 **{format_size(downloaded)} / {format_size(total_size)}**\n🔄 **Strategy:** {strategy_num}/3",
                                                 parse_mode='Markdown'
@@ -206,10 +254,22 @@ async def download_file_with_retry(download_url, filename, status_msg=None):
                                     except:
                                         pass  # Ignore rate limits
                                     last_update = downloaded
-                    
-                    LOGGER.info(f"✅ Download completed with strategy {strategy_num}: {filename}")
-                    return file_path
-                    
+                    finally:
+                        # Drop any preallocated tail beyond what was actually received
+                        await f.truncate(verifier.received)
+            
+            await verifier.flush()
+            verifier.verify()
+            LOGGER.info(f"✅ Download completed and verified with strategy {strategy_num}: {filename}")
+            return file_path
+                
+        except IntegrityError as e:
+            LOGGER.warning(f"🧩 Strategy {strategy_num} integrity check failed: {e}")
+            if not e.short:
+                verifier.reset()  # Corruption can't be located: fetch everything again
+                last_checkpoint = 0
+                if checkpoint:
+                    checkpoint(0)
         except asyncio.TimeoutError:
             LOGGER.warning(f"⏰ Strategy {strategy_num} timeout")
         except aiohttp.ClientPayloadError as e:
@@ -234,101 +294,269 @@ def format_size(bytes_size):
         bytes_size /= 1024
     return f"{bytes_size:.1f} TB"
 
-async def process_terabox_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Process Terabox URL - ENHANCED WITH BULLETPROOF DOWNLOAD"""
-    message = update.message
+class JobError(Exception):
+    """One file failed; `reason` is short, `details` is the full Markdown message"""
+    
+    def __init__(self, reason, details=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.details = details or f"❌ **{reason}**"
+
+async def send_media(message, kind, file_path, filename, streaming, thumbnail=None, **params):
+    """Send a file as a reply with sendVideo/sendPhoto/sendDocument.
+
+    `streaming` posts the multipart body straight from disk; otherwise
+    python-telegram-bot builds it, holding the whole file in memory.
+    """
+    if streaming:
+        return await send_file(
+            message.get_bot(), f"send{kind.capitalize()}", kind, file_path, filename,
+            thumbnail=thumbnail, chat_id=message.chat_id, reply_to_message_id=message.message_id,
+            allow_sending_without_reply=True, **params
+        )
+    with open(file_path, 'rb') as file:
+        thumb = open(thumbnail, 'rb') if thumbnail else None
+        try:
+            return await getattr(message, f"reply_{kind}")(
+                file, filename=filename, **({'thumbnail': thumb} if thumb else {}), **params
+            )
+        finally:
+            if thumb:
+                thumb.close()
+
+async def upload_image(message, file_path, filename, caption, cache_key, streaming):
+    """Images go through the image stage: photo if Telegram will take it
+    (recompressed when oversized), otherwise a document with a thumbnail"""
+    # Derived files are pinned so they can't be evicted mid-upload
+    with file_cache.pin(f"{cache_key}-photo", lookup=False), file_cache.pin(f"{cache_key}-thumb", lookup=False):
+        media = await prepare_image(file_path, cache_key)
+        try:
+            if media['kind'] == PHOTO:
+                return await send_media(
+                    message, 'photo', media['path'], filename, streaming,
+                    caption=caption, parse_mode='Markdown'
+                )
+            return await send_media(
+                message, 'document', media['path'], filename, streaming,
+                thumbnail=media['thumbnail'], caption=caption, parse_mode='Markdown'
+            )
+        finally:
+            for scratch in media['scratch']:
+                scratch.unlink(missing_ok=True)
+
+async def upload_file(message, file_path, filename, file_size, cache_key=None, streaming=True, kind=None):
+    """Upload a downloaded file as a reply as video/photo/document: `kind`
+    from the pre-flight probe when known, otherwise by extension"""
+    caption = f"📁 **{filename}**\n📊 **Size:** {format_size(file_size)}\n🔗 **Source:** Terabox\n✅ **Downloaded with enhanced retry system**"
+    kind = kind or kind_of_name(filename)
+    
+    if kind == PHOTO:
+        return await upload_image(message, file_path, filename, caption, cache_key or f"path-{file_path.name}", streaming)
+    
+    if kind == VIDEO:
+        return await send_media(
+            message, 'video', file_path, filename, streaming,
+            caption=caption,
+            width=640,
+            height=480,
+            duration=0,
+            supports_streaming=True,
+            parse_mode='Markdown'
+        )
+    return await send_media(
+        message, 'document', file_path, filename, streaming,
+        caption=caption,
+        parse_mode='Markdown'
+    )
+
+async def deliver_file(message, file_info, status_msg=None, progress_callback=None, job_id=None):
+    """Download one extracted file and upload it as a reply to `message`.
+    
+    With a journal `job_id` the partial download lives in the job's journal
+    directory and its offset is checkpointed, so a restart can resume it.
+    Raises JobError with a user-facing explanation on failure and
+    InsufficientDiskSpace when the disk manager refuses the job.
+    """
+    # Exact size, resumability and real type before any quota, disk or bytes are spent
+    await preflight(file_info)
+    filename = file_info['filename']
+    file_size = file_info['size']
+    download_url = file_info['download_url']
+    
+    resume_offset = 0
     user_id = message.from_user.id
-    url = message.text.strip()
+    job_class = priority_class(user_id)
+    if job_id is not None:
+        job = job_journal.get(job_id)
+        job_class = CLASS_OF_RANK.get(job['priority'], job_class)  # As accepted by the front process
+        same_file = (job['filename'], job['size'], job['md5'] or '') == (filename, file_size, file_info.get('md5') or '')
+        resume_offset = job['byte_offset'] if same_file and file_info.get('ranges', True) else 0
+        job_journal.update(
+            job_id, state=journal.DOWNLOADING, filename=filename, size=file_size,
+            md5=file_info.get('md5'), download_url=download_url, byte_offset=resume_offset
+        )
     
-    LOGGER.info(f"Starting Terabox processing: {url}")
+    if not download_url:
+        raise JobError("No download URL found")
     
-    # Check user limits
-    user_downloads = get_user_download_count(user_id)
-    if user_downloads >= FREE_DOWNLOAD_LIMIT and not is_user_verified(user_id):
-        await send_verification_required_message(message, user_id, user_downloads)
-        return
+    # Size check
+    if file_size > MAX_FILE_SIZE:
+        preflight_stats['rejected'] += 1
+        raise JobError(
+            "File too large",
+            f"❌ **File too large!**\n\n📊 **Size:** {format_size(file_size)}\n\n**Max allowed:** 2GB"
+        )
+    
+    async def upload(memory_ticket, file_path):
+        # Upload to Telegram - streamed from disk; the buffered fallback holds
+        # the whole file, so the job's memory estimate grows to the file size first
+        job_journal.update(job_id, state=journal.UPLOADING, byte_offset=file_size)
+        if status_msg:
+            await status_msg.edit_text("📤 **Uploading to Telegram...**", parse_mode='Markdown')
+        upload_size = file_path.stat().st_size
+        streaming = UPLOAD_STREAMING or memory_governor.force_disk_backed(upload_size)
+        if not streaming:
+            await memory_ticket.grow(upload_size)
+        
+        try:
+            async with bandwidth_shaper.uploading():
+                sent = await upload_file(message, file_path, filename, file_size, cache_key, streaming, file_info.get('media_kind'))
+        except Exception as upload_error:
+            raise JobError(f"Upload failed: {upload_error}", f"❌ **Upload failed:** {str(upload_error)}")
+        # The log channel copy goes out later by file_id, never on the user's path
+        log_forwarder.enqueue(sent, message.from_user, filename)
+        return sent
+    
+    cache_key = fingerprint(file_info)
+    
+    # Data quota: taken before any bytes move, refunded if nothing is delivered
+    decision = quota_engine.take(user_id, nbytes=file_size)
+    if not decision.allowed:
+        raise JobError(
+            "Data quota reached",
+            f"📊 **Data quota reached**\n\n**File:** {format_size(file_size)}\n"
+            f"🕐 **Enough refills in:** {format_time_remaining(time.time() + decision.retry_after)}"
+        )
+    
+    with quota_engine.refund_on_error(user_id, nbytes=file_size):
+        # A download slot in the user's priority lane, then memory headroom for the job
+        async with job_scheduler.slot(job_class, label=filename), \
+                memory_governor.admission(DOWNLOAD_MEMORY_ESTIMATE, label=filename) as memory_ticket:
+            # Pinned: the cached copy can't be evicted while this job uses it
+            with file_cache.pin(cache_key) as cached_path:
+                if cached_path:
+                    LOGGER.info(f"🗃️ Serving {filename} from the local cache")
+                    return await upload(memory_ticket, cached_path)
+            
+                # Cached files are the first thing to give up when the disk is tight
+                if not disk_manager.can_admit(file_size):
+                    file_cache.make_room(lambda: disk_manager.can_admit(file_size))
+            
+                # Reserve disk space up front (fails fast when it won't fit);
+                # the job directory is removed on every exit path except shutdown
+                job_dir = job_journal.partial_dir(job_id) if job_id is not None else None
+                async with disk_manager.job_file(filename, file_size, job_dir=job_dir) as job_path:
+                    LOGGER.info(f"⬇️ Starting enhanced download with retry...")
+                    with bandwidth_shaper.flow(filename, BANDWIDTH_WEIGHT[job_class]) as flow:
+                        file_path = await download_file_with_retry(
+                            download_url, filename, status_msg, file_path=job_path, progress_callback=progress_callback,
+                            expected_md5=file_info.get('md5'), resume_offset=resume_offset,
+                            checkpoint=(lambda offset: job_journal.checkpoint(job_id, offset)) if job_id is not None else None,
+                            flow=flow
+                        )
+                
+                    if not file_path:
+                        raise JobError(
+                            "All download strategies failed",
+                            f"❌ **Download Failed**\n\n**File:** `{filename}`\n**Issue:** All download strategies failed\n\n**This can happen due to:**\n• Network connectivity issues\n• Terabox server problems\n• File temporarily unavailable\n\n🔄 **Try again in a few minutes**"
+                        )
+                
+                    # Keep the bytes: a failed upload or a repeat request won't download again
+                    file_path = file_cache.admit(cache_key, file_path) or file_path
+                    return await upload(memory_ticket, file_path)
+
+class ReplyTarget:
+    """Stands in for the original Message when a journaled job resumes after a restart"""
+    
+    def __init__(self, bot, job):
+        self._bot = bot
+        self.chat_id = job['chat_id']
+        self.message_id = job['message_id']
+        self.from_user = SimpleNamespace(id=job['user_id'])
+    
+    def get_bot(self):
+        return self._bot
+    
+    async def _reply(self, method, **kwargs):
+        return await getattr(self._bot, method)(
+            chat_id=self.chat_id, reply_to_message_id=self.message_id,
+            allow_sending_without_reply=True, **kwargs
+        )
     
-    status_msg = await message.reply_text("🔍 **Processing Terabox URL...**", parse_mode='Markdown')
+    async def reply_text(self, text, **kwargs):
+        return await self._reply('send_message', text=text, **kwargs)
     
+    async def reply_video(self, video, **kwargs):
+        return await self._reply('send_video', video=video, **kwargs)
+    
+    async def reply_photo(self, photo, **kwargs):
+        return await self._reply('send_photo', photo=photo, **kwargs)
+    
+    async def reply_document(self, document, **kwargs):
+        return await self._reply('send_document', document=document, **kwargs)
+
+class StatusMessage:
+    """An existing status message edited through the Bot API (worker processes)"""
+    
+    def __init__(self, bot, chat_id, message_id):
+        self._bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+    
+    async def edit_text(self, text, **kwargs):
+        return await self._bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id, **kwargs)
+    
+    async def delete(self):
+        return await self._bot.delete_message(chat_id=self.chat_id, message_id=self.message_id)
+
+async def run_single_job(message, url, status_msg, job_id, link=None, extraction=None, started_at=None):
+    """Extract + deliver one share link, keeping its journal entry current.
+    
+    `extraction` is an already running extract_file_info task (started
+    speculatively by the handler); `started_at` is when the handler got the
+    message, for the time-to-first-useful-status metric.
+    """
+    user_id = message.from_user.id
     try:
-        # Step 1: Extract file info using WORKING API
-        await status_msg.edit_text("📋 **Using wdzone-terabox-api...**", parse_mode='Markdown')
+        # Step 1: Extract file info (best healthy backend, hedged when slow)
+        if extraction is None:
+            await status_msg.edit_text("📋 **Extracting file info...**", parse_mode='Markdown')
+            extraction = extract_file_info(url)
         
-        file_info = extract_terabox_info(url)
-        filename = file_info['filename']
-        file_size = file_info['size']
-        download_url = file_info['download_url']
-        
-        if not download_url:
-            await status_msg.edit_text("❌ **No download URL found**", parse_mode='Markdown')
-            return
-        
-        # Step 2: Size check
-        if file_size > 2 * 1024 * 1024 * 1024:  # 2GB limit
-            await status_msg.edit_text(
-                f"❌ **File too large!**\n\n📊 **Size:** {format_size(file_size)}\n\n**Max allowed:** 2GB",
-                parse_mode='Markdown'
-            )
+        try:
+            file_info = await extraction
+        except FolderShareError:
+            if not link:
+                raise
+            file_info = None
+        if link and (file_info is None or file_info.get('share_entries', 1) > 1):
+            # Folder share: walk it and stream every file through the batch pipeline
+            from bot.handlers.batch import process_terabox_folder
+            job_journal.update(job_id, kind='folder')
+            await process_terabox_folder(message, link, status_msg, job_id=job_id)
             return
+        filename = file_info['filename']
         
         await status_msg.edit_text(
-            f"📁 **File Found**\n📊 **{format_size(file_size)}**\n✅ **API Success**\n⬇️ **Starting download...**",
+            f"📁 **File Found**\n📊 **{format_size(file_info['size'])}**\n✅ **API Success**\n⬇️ **Starting download...**",
             parse_mode='Markdown'
         )
+        if started_at is not None:
+            request_latency.record('first_useful_status', time.monotonic() - started_at)
         
-        # Step 3: ENHANCED Download with retry
-        LOGGER.info(f"⬇️ Starting enhanced download with retry...")
-        file_path = await download_file_with_retry(download_url, filename, status_msg)
-        
-        if not file_path:
-            await status_msg.edit_text(
-                f"❌ **Download Failed**\n\n**File:** `{filename}`\n**Issue:** All download strategies failed\n\n**This can happen due to:**\n• Network connectivity issues\n• Terabox server problems\n• File temporarily unavailable\n\n🔄 **Try again in a few minutes**",
-                parse_mode='Markdown'
-            )
-            return
-        
-        # Step 4: Upload to Telegram
-        await status_msg.edit_text("📤 **Uploading to Telegram...**", parse_mode='Markdown')
-        
-        try:
-            caption = f"📁 **{filename}**\n📊 **Size:** {format_size(file_size)}\n🔗 **Source:** Terabox\n✅ **Downloaded with enhanced retry system**"
-            
-            with open(file_path, 'rb') as file:
-                if filename.lower().endswith(('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.webm', '.m4v', '.3gp')):
-                    await message.reply_video(
-                        video=file,
-                        caption=caption,
-                        width=640,
-                        height=480,
-                        duration=0,
-                        supports_streaming=True,
-                        parse_mode='Markdown'
-                    )
-                elif filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')):
-                    await message.reply_photo(
-                        photo=file,
-                        caption=caption,
-                        parse_mode='Markdown'
-                    )
-                else:
-                    await message.reply_document(
-                        document=file,
-                        caption=caption,
-                        parse_mode='Markdown'
-                    )
-        
-        except Exception as upload_error:
-            await status_msg.edit_text(f"❌ **Upload failed:** {str(upload_error)}", parse_mode='Markdown')
-            return
-        
-        # Step 5: Cleanup
-        try:
-            file_path.unlink(missing_ok=True)
-        except:
-            pass
-        
-        # Update user stats
-        increment_user_downloads(user_id)
+        # Steps 2-4: size check, download with retry, upload
+        await deliver_file(message, file_info, status_msg, job_id=job_id)
+        job_journal.finish(job_id, journal.DONE)
         
         # Delete status message
         try:
@@ -338,35 +566,172 @@ async def process_terabox_url(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         LOGGER.info(f"Successfully processed: {filename}")
         
+    except JobError as e:
+        LOGGER.warning(f"Job failed: {e.reason}")
+        quota_engine.refund(user_id, downloads=1)
+        job_journal.finish(job_id, journal.FAILED, e.reason)
+        await status_msg.edit_text(e.details, parse_mode='Markdown', reply_markup=None)
+    except InsufficientDiskSpace as e:
+        LOGGER.warning(f"💾 Disk admission refused: {e}")
+        quota_engine.refund(user_id, downloads=1)
+        job_journal.finish(job_id, journal.FAILED, str(e))
+        await status_msg.edit_text(
+            "💾 **Server storage is full right now**\n\n🔄 **Try again in a few minutes**",
+            parse_mode='Markdown', reply_markup=None
+        )
     except Exception as e:
         error_msg = str(e)
         LOGGER.error(f"Process error: {error_msg}")
-        await status_msg.edit_text(f"❌ **Error:** {error_msg}", parse_mode='Markdown')
+        quota_engine.refund(user_id, downloads=1)
+        job_journal.finish(job_id, journal.FAILED, error_msg)
+        await status_msg.edit_text(f"❌ **Error:** {error_msg}", parse_mode='Markdown', reply_markup=None)
+
+async def process_terabox_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Process Terabox URL - ENHANCED WITH BULLETPROOF DOWNLOAD"""
+    message = update.message
+    
+    # Telegram redelivers updates that were in flight when we crashed;
+    # those jobs are already journaled and resumed at startup
+    if job_journal.seen(message.chat_id, message.message_id):
+        LOGGER.info(f"♻️ Message {message.message_id} already journaled, skipping redelivery")
+        return
+    
+    links = extract_share_links(message.text)
+    
+    # Several links in one message become one batch job
+    if len(links) > 1:
+        from bot.handlers.batch import process_terabox_links
+        await process_terabox_links(message, links)
+        return
+    
+    started_at = time.monotonic()
+    user_id = message.from_user.id
+    url = links[0].url if links else message.text.strip()
+    
+    LOGGER.info(f"Starting Terabox processing: {url}")
+    
+    # Speculative: extraction runs while the quota is checked and the first
+    # status message goes out; it is thrown away if the user can't proceed
+    extraction = asyncio.create_task(extract_file_info(url)) if BOT_MODE != 'front' else None
+    try:
+        # Check user limits
+        if not await require_quota(message):
+            if extraction:
+                extraction.cancel()
+            return
+        
+        job_id = job_journal.create(user_id, message.chat_id, message.message_id, url, RANK[priority_class(user_id)])
+        if BOT_MODE == 'front':
+            # A worker process picks it up and edits this message as it goes
+            status_msg = await message.reply_text(
+                "🕒 **Queued for download...**", parse_mode='Markdown', reply_markup=cancel_markup()
+            )
+            job_journal.update(job_id, status_message_id=status_msg.message_id)
+            return
+        status_msg = await message.reply_text("🔍 **Extracting file info...**", parse_mode='Markdown')
+        request_latency.record('first_status', time.monotonic() - started_at)
+    except BaseException:
+        if extraction:
+            extraction.cancel()
+        raise
+    async with cancel_registry.track(status_msg, user_id) as (status_msg, cancel):
+        await run_single_job(
+            message, url, status_msg, job_id, link=links[0] if links else None,
+            extraction=extraction, started_at=started_at
+        )
+    if cancel.requested:
+        await finish_cancelled(status_msg, user_id, [job_id])
 
-# Database helper functions (implement as needed)
-def get_user_download_count(user_id):
-    return 0
+async def run_journaled_job(bot, job, resumes):
+    """Run a job from the journal outside its original update (startup resume
+    or a worker); `resumes` is how many runs were interrupted before this one"""
+    target = ReplyTarget(bot, job)
+    try:
+        if resumes and (job['kind'] == 'folder' or resumes > JOURNAL_MAX_RESUMES):
+            # Folder walks aren't resumable; repeat offenders may be what crashed us
+            job_journal.finish(job['id'], journal.FAILED, "Interrupted by a restart")
+            await target.reply_text(
+                "⚠️ **This job was interrupted by a restart**\n\n🔄 **Please send the link again**",
+                parse_mode='Markdown'
+            )
+            return
+        if job.get('status_message_id') and not resumes:
+            status_msg = StatusMessage(bot, job['chat_id'], job['status_message_id'])
+        else:
+            text = "♻️ **Resuming after a restart...**" if resumes else "🔍 **Processing Terabox URL...**"
+            status_msg = await target.reply_text(text, parse_mode='Markdown')
+        async with cancel_registry.track(status_msg, job['user_id']) as (status_msg, cancel):
+            await run_single_job(target, job['url'], status_msg, job['id'], link=classify_url(job['url']))
+        if cancel.requested:
+            await finish_cancelled(status_msg, job['user_id'], [job['id']])
+    except Exception as e:
+        LOGGER.error(f"Journaled job {job['id']} failed: {e}")
+        job_journal.finish(job['id'], journal.FAILED, str(e))
 
-def is_user_verified(user_id):
-    return False
+async def finish_cancelled(status_msg, user_id, job_ids):
+    """After a user cancel has unwound the job: journal entries are failed
+    (partial files deleted) and their unspent download tokens refunded"""
+    cancelled = sum(job_journal.cancel(job_id) for job_id in job_ids)
+    if cancelled:
+        quota_engine.refund(user_id, downloads=cancelled)
+    try:
+        await status_msg.edit_text(
+            "🛑 **Cancelled**\n\n🗑️ **Partial download removed**", parse_mode='Markdown', reply_markup=None
+        )
+    except Exception as e:
+        LOGGER.debug(f"Cancel status edit skipped: {e}")
 
-def increment_user_downloads(user_id):
-    pass
+async def cancel_jobs(user_id, chat_id=None, status_message_id=None):
+    """Cancel the user's job on a status message, or all of their jobs;
+    returns how many were stopped. Jobs running here are cancelled in place;
+    in split mode the journal entry is failed and the worker gives up at its
+    next heartbeat."""
+    if status_message_id is not None:
+        stopped = int(cancel_registry.cancel(chat_id, status_message_id, user_id))
+    else:
+        stopped = cancel_registry.cancel_user(user_id)
+    if BOT_MODE == 'front':
+        job_ids = job_journal.unfinished_ids(user_id, chat_id, status_message_id)
+        cancelled = sum(job_journal.cancel(job_id) for job_id in job_ids)
+        if cancelled:
+            quota_engine.refund(user_id, downloads=cancelled)
+        stopped += cancelled
+    return stopped
 
-async def send_verification_required_message(message, user_id, download_count):
-    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+async def resume_journaled_jobs(bot):
+    """Startup: resume every job a restart interrupted, or fail it with a message"""
+    jobs = job_journal.unfinished()
+    job_journal.cleanup()
+    if not jobs:
+        return
+    LOGGER.info(f"♻️ Found {len(jobs)} interrupted jobs in the journal")
     
-    keyboard = [
-        [InlineKeyboardButton("🔓 Start Verification", callback_data="start_verification")],
-        [InlineKeyboardButton("📊 My Status", callback_data="status")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    async def resume(job):
+        job_journal.update(job['id'], attempts=job['attempts'] + 1)
+        await run_journaled_job(bot, job, resumes=job['attempts'] + 1)
     
+    await asyncio.gather(*(resume(job) for job in jobs))
+
+async def require_quota(message, count=1):
+    """The quota gate every handler goes through before accepting links:
+    takes `count` download tokens, or explains the refusal and returns False"""
+    user_id = message.from_user.id
+    user_state.touch(user_id)
+    verified = not VERIFY or check_verification(user_id)
+    decision = quota_engine.take(user_id, downloads=count, verified=verified)
+    if not decision.allowed:
+        await send_quota_message(message, user_id, decision)
+    return decision.allowed
+
+async def send_quota_message(message, user_id, decision):
+    if decision.reason == DOWNLOADS:
+        from bot.handlers.messages import send_verification_required_message
+        await send_verification_required_message(message, user_id, quota_engine.usage(user_id)['downloads_used'])
+        return
+    usage = quota_engine.usage(user_id)
     await message.reply_text(
-        f"🔐 **Verification Required**\n\n"
-        f"Free downloads used: **{download_count}/{FREE_DOWNLOAD_LIMIT}**\n\n"
-        f"Complete verification for unlimited downloads:",
-        reply_markup=reply_markup,
+        f"📊 **Data quota reached**\n\n"
+        f"Used **{format_size(usage['bytes_used'])}** of {format_size(usage['bytes_limit'])}\n"
+        f"🕐 **Enough refills in:** {format_time_remaining(time.time() + decision.retry_after)}",
         parse_mode='Markdown'
-        )
-                   
+    )
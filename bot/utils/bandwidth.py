@@ -0,0 +1,219 @@
+"""
+Bandwidth Shaper - global ingress cap with weighted fair sharing between downloads
+Every download reader asks for its chunk's bytes before reading the next
+one. Requests are granted in self-clocked fair queueing order (virtual
+finish tag = start + bytes / weight) at the ingress rate, so a fast CDN
+connection can't starve the others and an idle job's share goes to the
+busy ones. While uploads run, their reserved headroom is taken off the
+ingress rate. Limits can be changed at runtime. In split mode the cap is
+shared by all workers: each publishes its download weight in the journal
+and paces itself at its weighted share, and the limits set with
+/bandwidth reach every worker through the journal.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from config import LOGGER, BANDWIDTH_INGRESS_MBPS, BANDWIDTH_UPLOAD_RESERVE_MBPS, BANDWIDTH_SYNC_SECONDS
+
+MBPS = 1_000_000 / 8  # Bytes per second in one megabit per second
+BURST_SECONDS = 0.25  # Grants may run this far ahead of the rate
+RATE_WINDOW = 5.0     # Seconds of history behind a flow's achieved rate
+MAX_LAG = 1024 * 1024  # Virtual bytes a flow may fall behind and still catch up
+
+
+class Flow:
+    """One job's share of the shaper; `consume(nbytes)` paces its reader"""
+
+    def __init__(self, shaper, label, weight):
+        self.shaper = shaper
+        self.label = label
+        self.weight = max(weight, 0.01)
+        self.finish = 0.0  # Virtual finish tag of the last request
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._window = deque()  # (monotonic, bytes) samples inside RATE_WINDOW
+
+    async def consume(self, nbytes):
+        await self.shaper._grant(self, nbytes)
+        now = time.monotonic()
+        self.bytes += nbytes
+        self._window.append((now, nbytes))
+        while self._window and self._window[0][0] < now - RATE_WINDOW:
+            self._window.popleft()
+
+    def achieved(self):
+        """Bytes per second over the last few seconds"""
+        now = time.monotonic()
+        span = min(now - self.started, RATE_WINDOW)
+        recent = sum(n for at, n in self._window if at >= now - span)
+        return recent / span if span > 0 else 0.0
+
+
+class BandwidthShaper:
+    def __init__(self, ingress_bps=0, upload_reserve_bps=0):
+        self.ingress_bps = ingress_bps            # 0 = no cap
+        self.upload_reserve_bps = upload_reserve_bps
+        self._flows = {}                          # id -> Flow
+        self._ids = itertools.count(1)
+        self._queue = []                          # (finish tag, seq, Flow, nbytes, future)
+        self._seq = itertools.count()
+        self._virtual = 0.0                       # Tag of the last granted request
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+        self._uploads = 0
+        self._peer_weight = 0.0                   # Download weight of the other workers
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+        self._stats = {'granted_bytes': 0, 'delayed': 0, 'flows_total': 0}
+
+    def _weight(self):
+        return sum(flow.weight for flow in self._flows.values())
+
+    def share(self):
+        """This process's fraction of the cap, by download weight against the other workers'"""
+        weight = self._weight()
+        return weight / (weight + self._peer_weight) if weight else 1.0
+
+    def rate(self):
+        """Current ingress rate in bytes/s (0 = unlimited)"""
+        if not self.ingress_bps:
+            return 0
+        ingress = self.ingress_bps * self.share()
+        if self._uploads:
+            # Never starve downloads entirely: keep at least a tenth of the cap
+            return max(ingress - self.upload_reserve_bps * self.share(), ingress / 10)
+        return ingress
+
+    def configure(self, ingress_bps=None, upload_reserve_bps=None):
+        """Change the limits at runtime; queued requests continue at the new rate"""
+        if ingress_bps is not None:
+            self.ingress_bps = max(int(ingress_bps), 0)
+        if upload_reserve_bps is not None:
+            self.upload_reserve_bps = max(int(upload_reserve_bps), 0)
+        LOGGER.info(
+            f"🚦 Bandwidth: ingress {self.ingress_bps / MBPS:.1f} Mbit/s (0 = unlimited), "
+            f"upload reserve {self.upload_reserve_bps / MBPS:.1f} Mbit/s"
+        )
+        self._wakeup.set()
+
+    @contextmanager
+    def flow(self, label, weight=1.0):
+        """Register a job for the duration of its download"""
+        flow_id = next(self._ids)
+        flow = Flow(self, label, weight)
+        flow.finish = self._virtual
+        self._flows[flow_id] = flow
+        self._stats['flows_total'] += 1
+        try:
+            yield flow
+        finally:
+            del self._flows[flow_id]
+
+    @asynccontextmanager
+    async def uploading(self):
+        """Hold the upload reserve while an upload runs"""
+        self._uploads += 1
+        self._wakeup.set()
+        try:
+            yield
+        finally:
+            self._uploads -= 1
+            self._wakeup.set()
+
+    async def _grant(self, flow, nbytes):
+        self._stats['granted_bytes'] += nbytes
+        if not self.rate():
+            return
+        # A reader has one request out at a time, so it briefly leaves the queue
+        # after every grant; it keeps its place unless it has fallen well behind
+        flow.finish = max(self._virtual - MAX_LAG, flow.finish) + nbytes / flow.weight
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (flow.finish, next(self._seq), flow, nbytes, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+        await future
+
+    def _refill(self, rate):
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._refilled) * rate, rate * BURST_SECONDS)
+        self._refilled = now
+
+    async def _dispatch(self):
+        """Grant queued requests in tag order at the current rate"""
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            rate = self.rate()
+            if rate:
+                self._refill(rate)
+                if self._tokens <= 0:
+                    # Sleep off the debt, or until the limits change
+                    self._wakeup.clear()
+                    self._stats['delayed'] += 1
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), -self._tokens / rate + 0.001)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+            tag, _, flow, nbytes, future = heapq.heappop(self._queue)
+            if future.done():  # Reader was cancelled
+                continue
+            self._virtual = tag
+            self._tokens -= nbytes if rate else 0
+            future.set_result(None)
+
+    async def sync_task(self, process_id):
+        """Split mode: publish this worker's weight, learn the others' and
+        pick up limits set with /bandwidth in the front process"""
+        from bot.utils.job_journal import job_journal
+        while True:
+            try:
+                self._peer_weight = job_journal.share_bandwidth(
+                    process_id, self._weight(), ttl=BANDWIDTH_SYNC_SECONDS * 3
+                )
+                limits = job_journal.bandwidth_limits()
+                if limits and limits != (self.ingress_bps, self.upload_reserve_bps):
+                    self.configure(*limits)
+                self._wakeup.set()
+            except Exception as e:
+                LOGGER.warning(f"🚦 Bandwidth share sync failed: {e}")
+            await asyncio.sleep(BANDWIDTH_SYNC_SECONDS)
+
+    def stats(self):
+        active = list(self._flows.values())
+        total_weight = sum(flow.weight for flow in active) or 1
+        rate = self.rate()
+        return {
+            'ingress_bps': self.ingress_bps,
+            'upload_reserve_bps': self.upload_reserve_bps,
+            'effective_bps': rate,
+            'share': round(self.share(), 3),
+            'peer_weight': self._peer_weight,
+            'uploads_active': self._uploads,
+            'queued_requests': len(self._queue),
+            **self._stats,
+            'flows': [
+                {
+                    'label': flow.label,
+                    'weight': flow.weight,
+                    'allocated_bps': round(rate * flow.weight / total_weight) if rate else None,
+                    'achieved_bps': round(flow.achieved()),
+                    'bytes': flow.bytes,
+                }
+                for flow in active
+            ],
+        }
+
+
+# Global bandwidth shaper
+bandwidth_shaper = BandwidthShaper(
+    ingress_bps=int(BANDWIDTH_INGRESS_MBPS * MBPS),
+    upload_reserve_bps=int(BANDWIDTH_UPLOAD_RESERVE_MBPS * MBPS),
+)
@@ -0,0 +1,101 @@
+"""
+Job Cancellation - the Cancel button and /cancel for running jobs
+A running job is registered under its status message. Cancelling it
+cancels the job's task, so every `async with` on the way out unwinds at
+its current await point: the HTTP stream or upload is aborted, download
+slots, memory and bandwidth are released and the disk reservation is
+dropped. The caller then deletes the partial files.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config import LOGGER, OWNER_ID
+
+CANCEL_DATA = 'cancel_job'
+
+
+def cancel_markup():
+    return InlineKeyboardMarkup([[InlineKeyboardButton("✖️ Cancel", callback_data=CANCEL_DATA)]])
+
+
+class CancellableStatus:
+    """A status message whose edits keep the Cancel button unless told otherwise"""
+
+    def __init__(self, status_msg):
+        self._status = status_msg
+        self.chat_id = status_msg.chat_id
+        self.message_id = status_msg.message_id
+
+    async def edit_text(self, text, **kwargs):
+        kwargs.setdefault('reply_markup', cancel_markup())
+        return await self._status.edit_text(text, **kwargs)
+
+    async def delete(self):
+        return await self._status.delete()
+
+
+class CancelHandle:
+    def __init__(self, task, user_id):
+        self.task = task
+        self.user_id = user_id
+        self.requested = False
+
+
+class CancelRegistry:
+    def __init__(self):
+        self._jobs = {}  # (chat_id, status message id) -> CancelHandle
+        self._stats = {'cancelled': 0}
+
+    @asynccontextmanager
+    async def track(self, status_msg, user_id):
+        """Run the block as a cancellable job; yields the status message to
+        edit (with the Cancel button) and the handle. A user cancel is
+        swallowed here - check `handle.requested` after the block."""
+        key = (status_msg.chat_id, status_msg.message_id)
+        outer = self._jobs.get(key)
+        if outer is not None and outer.task is asyncio.current_task():
+            yield status_msg, outer  # Nested (a folder inside a single job): the outer block handles it
+            return
+        if not isinstance(status_msg, CancellableStatus):
+            status_msg = CancellableStatus(status_msg)
+        handle = CancelHandle(asyncio.current_task(), user_id)
+        self._jobs[key] = handle
+        try:
+            yield status_msg, handle
+        except asyncio.CancelledError:
+            if not handle.requested:
+                raise  # Shutdown or a lost lease, not the user
+            asyncio.current_task().uncancel()
+        finally:
+            if self._jobs.get(key) is handle:
+                del self._jobs[key]
+
+    def _cancel(self, key, handle):
+        if handle.requested:
+            return False
+        handle.requested = True
+        handle.task.cancel()
+        self._stats['cancelled'] += 1
+        LOGGER.info(f"🛑 Job on status message {key[1]} cancelled by its user")
+        return True
+
+    def cancel(self, chat_id, message_id, user_id):
+        """Cancel the job on a status message; only its user or the owner may"""
+        key = (chat_id, message_id)
+        handle = self._jobs.get(key)
+        if handle is None or user_id not in (handle.user_id, OWNER_ID):
+            return False
+        return self._cancel(key, handle)
+
+    def cancel_user(self, user_id):
+        """Cancel every running job of `user_id`; returns how many"""
+        mine = [(key, handle) for key, handle in self._jobs.items() if handle.user_id == user_id]
+        return sum(self._cancel(key, handle) for key, handle in mine)
+
+    def stats(self):
+        return {'running': len(self._jobs), **self._stats}
+
+
+# Global cancel registry
+cancel_registry = CancelRegistry()
@@ -0,0 +1,186 @@
+"""
+CPU Executor - keeps CPU-bound and blocking work off the event loop
+A small process pool for pure-Python CPU work (image processing, ...)
+and a thread pool for blocking syscalls and GIL-releasing work (hashing,
+fallocate, rmtree). Both admit tasks by priority and report queue wait
+and run time per task kind.
+"""
+
+import os
+import asyncio
+import heapq
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import count
+from multiprocessing import get_context
+from config import LOGGER, CPU_PROCESSES, CPU_THREADS
+
+# Priorities: lower runs first
+HIGH = 0      # A user is waiting on it right now (e.g. just before an upload)
+NORMAL = 5
+LOW = 9       # Housekeeping (sweeps, cleanup)
+
+PROCESS = 'process'
+THREAD = 'thread'
+
+
+def _default_processes():
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    # Every worker process costs ~20MB of RSS on a 512MB box
+    return max(1, min(cores, 2))
+
+
+class _Lane:
+    """Priority admission in front of one pool: at most `slots` tasks are in
+    the pool, so a queued task can still be cancelled or overtaken"""
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.running = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = count()
+
+    @property
+    def queued(self):
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    async def acquire(self, priority):
+        if self.running < self.slots and not self.queued:
+            self.running += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        try:
+            await waiter  # The slot is handed over by release()
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # Granted and cancelled at the same time: pass it on
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+
+class _KindStats:
+    __slots__ = ('tasks', 'errors', 'cancelled', 'wait_total', 'wait_max', 'run_total', 'run_max')
+
+    def __init__(self):
+        self.tasks = self.errors = self.cancelled = 0
+        self.wait_total = self.wait_max = self.run_total = self.run_max = 0.0
+
+    def as_dict(self):
+        done = max(self.tasks, 1)
+        return {
+            'tasks': self.tasks,
+            'errors': self.errors,
+            'cancelled': self.cancelled,
+            'avg_wait_ms': round(self.wait_total / done * 1000, 2),
+            'max_wait_ms': round(self.wait_max * 1000, 2),
+            'avg_run_ms': round(self.run_total / done * 1000, 2),
+            'max_run_ms': round(self.run_max * 1000, 2),
+        }
+
+
+class CpuExecutor:
+    def __init__(self, processes, threads):
+        self.sizes = {PROCESS: processes, THREAD: threads}
+        self._pools = {}
+        self._lanes = {PROCESS: _Lane(processes), THREAD: _Lane(threads)}
+        self._stats = {}
+
+    def _pool(self, lane):
+        # Built on first use: most deployments never start a worker process
+        if lane not in self._pools:
+            if lane == PROCESS:
+                # spawn: forking a process that runs an event loop and sockets is unsafe
+                self._pools[lane] = ProcessPoolExecutor(self.sizes[PROCESS], mp_context=get_context('spawn'))
+            else:
+                self._pools[lane] = ThreadPoolExecutor(self.sizes[THREAD], thread_name_prefix='cpu')
+            LOGGER.info(f"⚙️ Started {lane} pool with {self.sizes[lane]} workers")
+        return self._pools[lane]
+
+    async def run(self, kind, func, *args, priority=NORMAL, lane=PROCESS):
+        """Run `func(*args)` in the given lane and return its result.
+
+        `kind` names the stage for the metrics. Cancelling while queued drops
+        the task; cancelling while it runs stops waiting for it (a process or
+        thread can't be interrupted), and the slot frees when it finishes.
+        """
+        stats = self._stats.setdefault(kind, _KindStats())
+        slots = self._lanes[lane]
+        queued_at = time.monotonic()
+        try:
+            await slots.acquire(priority)
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            raise
+
+        started = time.monotonic()
+        wait = started - queued_at
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._pool(lane).submit(func, *args)
+        except BaseException:
+            slots.release()
+            raise
+
+        def done(_):
+            # Keep the slot until the pool is really done with the task
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:
+                pass  # Loop already closed (shutdown)
+
+        future.add_done_callback(done)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            future.cancel()
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            stats.tasks += 1
+            stats.run_total += elapsed
+            stats.run_max = max(stats.run_max, elapsed)
+
+    async def run_blocking(self, kind, func, *args, priority=NORMAL):
+        """Thread lane: blocking syscalls and GIL-releasing work (hashlib, I/O)"""
+        return await self.run(kind, func, *args, priority=priority, lane=THREAD)
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pools.clear()
+
+    def stats(self):
+        return {
+            'pools': {
+                lane: {
+                    'workers': self.sizes[lane],
+                    'started': lane in self._pools,
+                    'running': self._lanes[lane].running,
+                    'queued': self._lanes[lane].queued,
+                }
+                for lane in (PROCESS, THREAD)
+            },
+            'kinds': {kind: stats.as_dict() for kind, stats in self._stats.items()},
+        }
+
+
+# Global CPU executor instance
+cpu_executor = CpuExecutor(CPU_PROCESSES or _default_processes(), CPU_THREADS)
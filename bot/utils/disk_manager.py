@@ -0,0 +1,174 @@
+"""
+Disk Manager for DOWNLOAD_DIR
+Space admission, preallocation, guaranteed cleanup and orphan sweeping
+"""
+
+import os
+import shutil
+import asyncio
+import secrets
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from config import (
+    LOGGER, DOWNLOAD_DIR, DISK_FREE_MARGIN_MB, STALE_FILE_HOURS,
+    DISK_SWEEP_INTERVAL_MINUTES
+)
+from bot.utils.cpu_executor import cpu_executor, HIGH, LOW
+
+JOB_DIR_PREFIX = "job_"
+
+
+class InsufficientDiskSpace(Exception):
+    """Raised when a job cannot be admitted without filling the disk"""
+
+
+class DiskManager:
+    def __init__(self, root, free_margin_bytes, stale_seconds):
+        self.root = Path(root)
+        self.free_margin = free_margin_bytes
+        self.stale_seconds = stale_seconds
+        self._reservations = {}  # job dir -> reserved bytes
+        self._protected = set()  # top-level names the sweeper must never touch
+
+    @property
+    def reserved_bytes(self):
+        """Bytes promised to running jobs but not yet allocated on disk"""
+        return sum(self._reservations.values())
+
+    def ensure_root(self):
+        os.makedirs(self.root, exist_ok=True)
+
+    def protect(self, name):
+        """Exclude a top-level entry of DOWNLOAD_DIR from sweeping"""
+        self._protected.add(name)
+
+    def free_bytes(self):
+        """Free bytes on the download volume, not counting outstanding reservations"""
+        self.ensure_root()
+        return shutil.disk_usage(self.root).free - self.reserved_bytes
+
+    def can_admit(self, size):
+        return self.free_bytes() - int(size) >= self.free_margin
+
+    def _reserve(self, size, job_dir=None):
+        size = max(int(size), 0)
+        available = self.free_bytes() - self.free_margin
+        if size > available:
+            raise InsufficientDiskSpace(
+                f"Need {size} bytes, only {max(available, 0)} bytes available"
+            )
+        if job_dir is None:
+            job_dir = self.root / f"{JOB_DIR_PREFIX}{secrets.token_hex(6)}"
+            job_dir.mkdir(parents=True, exist_ok=False)
+        else:
+            job_dir.mkdir(parents=True, exist_ok=True)
+        self._reservations[job_dir] = size
+        return job_dir
+
+    def _release(self, job_dir):
+        self._reservations.pop(job_dir, None)
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    @staticmethod
+    def preallocate(file_path, size):
+        """Allocate the file's blocks up front to avoid fragmentation.
+
+        Falls back silently on filesystems without fallocate support.
+        """
+        if size <= 0 or not hasattr(os, 'posix_fallocate'):
+            return False
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.posix_fallocate(fd, 0, int(size))
+            return True
+        except OSError as e:
+            LOGGER.debug(f"fallocate unsupported for {file_path}: {e}")
+            return False
+        finally:
+            os.close(fd)
+
+    @asynccontextmanager
+    async def job_file(self, filename, size, job_dir=None):
+        """Reserve space for one download and yield its target path.
+
+        The job gets its own directory, which is removed on every exit path
+        (success, failure, cancellation) so partial files never accumulate.
+        A caller-owned `job_dir` (journaled jobs) survives cancellation so a
+        restart can resume from the partial file in it.
+        Raises InsufficientDiskSpace before anything is written.
+        """
+        persistent = job_dir is not None
+        existing = 0
+        if persistent and (job_dir / filename).exists():
+            existing = (job_dir / filename).stat().st_size  # Already on disk from before a restart
+        job_dir = self._reserve(size - existing, job_dir=job_dir)
+        file_path = job_dir / filename
+        LOGGER.info(f"💾 Reserved {int(size)} bytes for {filename} ({self.free_bytes()} bytes left)")
+        keep = False
+        try:
+            if await cpu_executor.run_blocking('fallocate', self.preallocate, file_path, size, priority=HIGH):
+                # The blocks are now really taken, so they already show up in disk_usage
+                self._reservations[job_dir] = 0
+            yield file_path
+        except asyncio.CancelledError:
+            keep = persistent  # Shutdown, not failure: leave the partial file for the resume
+            raise
+        finally:
+            if keep:
+                self._reservations.pop(job_dir, None)
+            else:
+                await cpu_executor.run_blocking('rmtree', self._release, job_dir)
+
+    def sweep(self, max_age=None):
+        """Remove unreserved entries in DOWNLOAD_DIR older than `max_age` seconds"""
+        if max_age is None:
+            max_age = self.stale_seconds
+        if not self.root.exists():
+            return 0
+
+        cutoff = time.time() - max_age
+        removed = 0
+        for entry in self.root.iterdir():
+            if entry in self._reservations or entry.name in self._protected:
+                continue
+            try:
+                if entry.stat().st_mtime > cutoff:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entry.unlink(missing_ok=True)
+                removed += 1
+            except OSError as e:
+                LOGGER.warning(f"Sweep failed for {entry}: {e}")
+
+        if removed:
+            LOGGER.info(f"🧹 Swept {removed} stale entries from {self.root}")
+        return removed
+
+    async def sweep_task(self, interval=None):
+        """Periodically sweep orphans left behind by crashed or killed jobs"""
+        interval = interval or DISK_SWEEP_INTERVAL_MINUTES * 60
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await cpu_executor.run_blocking('sweep', self.sweep, priority=LOW)
+            except Exception as e:
+                LOGGER.error(f"Disk sweep error: {e}")
+
+    def stats(self):
+        return {
+            'free_bytes': self.free_bytes(),
+            'reserved_bytes': self.reserved_bytes,
+            'active_jobs': len(self._reservations),
+            'free_margin_bytes': self.free_margin,
+        }
+
+
+# Global disk manager instance
+disk_manager = DiskManager(
+    DOWNLOAD_DIR,
+    free_margin_bytes=DISK_FREE_MARGIN_MB * 1024 * 1024,
+    stale_seconds=STALE_FILE_HOURS * 3600,
+)
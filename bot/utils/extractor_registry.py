@@ -0,0 +1,350 @@
+"""
+Extractor Registry - pluggable share-link extractor backends
+Health scoring, circuit breaking and hedged requests across backends
+
+Every backend returns the same parsed file-info dict (see make_file_info):
+    {'filename', 'size', 'download_url', 'type', 'backend', ...extras}
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from pathlib import Path
+from config import (
+    LOGGER, EXTRACTOR_BACKENDS, EXTRACTOR_TIMEOUT, EXTRACTOR_HEDGE_DEFAULT,
+    EXTRACTOR_BREAKER_FAILURES, EXTRACTOR_BREAKER_COOLDOWN, EXTRACTOR_FIXTURES
+)
+from bot.utils.http_client import http_client
+from bot.utils.log_utils import truncate_payload
+from bot.utils.terabox_extractor import speed_string_to_bytes
+from bot.utils.url_classifier import classify_url
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ShareLinkError(Exception):
+    """The share itself is bad (expired, removed, empty) - no backend can help"""
+
+
+class BackendBusy(Exception):
+    """The backend's circuit only lets its one trial call through right now"""
+
+
+def make_file_info(filename, size, download_url, backend, **extra):
+    """Build the parsed result every backend returns"""
+    return {
+        'filename': filename,
+        'size': size,
+        'download_url': download_url,
+        'type': 'file',
+        'backend': backend,
+        **extra,
+    }
+
+
+class BackendHealth:
+    """Latency/success tracking plus a consecutive-failure circuit breaker"""
+
+    def __init__(self, failure_threshold, cooldown):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latencies = deque(maxlen=50)
+        self.success_rate = 1.0  # EWMA
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.calls = 0
+        self.failures = 0
+
+    def available(self):
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN  # Let one trial call through
+        if self.state == HALF_OPEN:
+            return not self.trial_running
+        return self.state != OPEN
+
+    def begin(self):
+        """Claim a call; False while the backend is open or its trial is running"""
+        if not self.available():
+            return False
+        if self.state == HALF_OPEN:
+            self.trial_running = True
+        return True
+
+    def p90(self, default):
+        if len(self.latencies) < 5:
+            return default
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.9) - 1]
+
+    def record_success(self, latency):
+        self.calls += 1
+        self.latencies.append(latency)
+        self.success_rate = self.success_rate * 0.8 + 0.2
+        self.consecutive_failures = 0
+        self.state = CLOSED
+
+    def record_failure(self):
+        self.calls += 1
+        self.failures += 1
+        self.success_rate *= 0.8
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def score(self, default_latency):
+        """Higher is better: success rate discounted by typical latency"""
+        return self.success_rate / (1.0 + self.p90(default_latency))
+
+    def stats(self, default_latency):
+        return {
+            'state': self.state,
+            'success_rate': round(self.success_rate, 3),
+            'p90_seconds': round(self.p90(default_latency), 3),
+            'calls': self.calls,
+            'failures': self.failures,
+        }
+
+
+class ExtractorBackend:
+    """Base class: subclasses implement `async extract(url) -> file info dict`"""
+    name = 'base'
+
+    async def extract(self, url):
+        raise NotImplementedError
+
+
+def parse_wdzone_response(req, backend='wdzone'):
+    """Parse the wdzone-terabox-api JSON (emoji and plain key variants)"""
+    if "✅ Status" in req and req["✅ Status"] == "Success":
+        extracted_info = req.get("📜 Extracted Info", [])
+    elif "Status" in req and req["Status"] == "Success":
+        extracted_info = req.get("Extracted Info", [])
+    elif "❌ Status" in req:
+        raise ShareLinkError(f"API Error: {req.get('📜 Message', 'Unknown error')}")
+    elif "Status" in req and req["Status"] == "Error":
+        raise ShareLinkError(f"API Error: {req.get('Message', 'Unknown error')}")
+    else:
+        raise Exception("Invalid API response format")
+
+    if not extracted_info:
+        raise ShareLinkError("No files found")
+
+    # The first file's details at the top; every file (each with its own
+    # direct link) under 'entries' for shares with more than one
+    files = [_wdzone_file(data, backend) for data in extracted_info]
+    return {**files[0], 'share_entries': len(files), 'entries': files}
+
+
+def _wdzone_file(data, backend):
+    filename = data.get("📂 Title") or data.get("Title", "Unknown")
+    size_str = data.get("📏 Size") or data.get("Size", "0 B")
+    download_url = data.get("🔽 Direct Download Link") or data.get("Direct Download Link", "")
+    return make_file_info(filename, speed_string_to_bytes(size_str.replace(" ", "")), download_url, backend)
+
+
+class WdzoneBackend(ExtractorBackend):
+    """Third-party wdzone-terabox-api (Vercel)"""
+    name = 'wdzone'
+    api_url = "https://wdzone-terabox-api.vercel.app/api"
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:122.0) Gecko/20100101 Firefox/122.0'
+    }
+
+    async def extract(self, url):
+        async with http_client.session().get(
+            self.api_url, params={'url': url}, headers=self.headers,
+            timeout=http_client.timeout(total=EXTRACTOR_TIMEOUT)
+        ) as response:
+            if response.status != 200:
+                raise Exception(f"API request failed with status: {response.status}")
+            req = await response.json(content_type=None)
+        if LOGGER.isEnabledFor(logging.DEBUG):  # Truncating a large payload isn't free
+            LOGGER.debug("wdzone response: %s", truncate_payload(req))
+        return parse_wdzone_response(req, self.name)
+
+
+class LocalFixtureBackend(ExtractorBackend):
+    """Offline stand-in that replays recorded wdzone responses keyed by share id.
+
+    `responses` maps surl -> recorded API JSON; `delay` simulates latency and
+    `fail` forces transport errors, so failover and hedging can be exercised
+    without network access.
+    """
+    name = 'local'
+
+    def __init__(self, responses=None, delay=0.0, fail=False, name=None):
+        self.responses = responses if responses is not None else self._load(EXTRACTOR_FIXTURES)
+        self.delay = delay
+        self.fail = fail
+        if name:
+            self.name = name
+
+    @staticmethod
+    def _load(path):
+        path = Path(path) if path else FIXTURES_DIR / "wdzone_responses.json"
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    async def extract(self, url):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(f"{self.name} backend unavailable")
+        link = classify_url(url)
+        req = self.responses.get(link.surl if link else url)
+        if req is None:
+            raise ShareLinkError("No files found")
+        return parse_wdzone_response(req, self.name)
+
+
+class ExtractorRegistry:
+    def __init__(self, hedge_default=EXTRACTOR_HEDGE_DEFAULT, timeout=EXTRACTOR_TIMEOUT):
+        self.hedge_default = hedge_default
+        self.timeout = timeout
+        self.backends = {}  # name -> backend (None until first use), in preference order
+        self.health = {}
+        self._factories = {}
+        self.hedged_calls = 0
+
+    def register(self, backend):
+        self.backends[backend.name] = backend
+        self.health[backend.name] = BackendHealth(EXTRACTOR_BREAKER_FAILURES, EXTRACTOR_BREAKER_COOLDOWN)
+        LOGGER.info(f"🔌 Extractor backend registered: {backend.name}")
+
+    def register_factory(self, name, factory):
+        """Register a backend that is only built on its first call"""
+        self.backends[name] = None
+        self._factories[name] = factory
+        self.health[name] = BackendHealth(EXTRACTOR_BREAKER_FAILURES, EXTRACTOR_BREAKER_COOLDOWN)
+        LOGGER.info(f"🔌 Extractor backend registered: {name}")
+
+    def backend(self, name):
+        if self.backends[name] is None:
+            self.backends[name] = self._factories.pop(name)()
+        return self.backends[name]
+
+    def candidates(self):
+        """Available backends, best score first (registration order breaks ties)"""
+        order = list(self.backends)
+        available = [name for name in order if self.health[name].available()]
+        return sorted(
+            available,
+            key=lambda name: (-self.health[name].score(self.hedge_default), order.index(name))
+        )
+
+    async def _call(self, name, url):
+        health = self.health[name]
+        # Claimed when the call starts: another extraction may have taken the trial since
+        if not health.begin():
+            raise BackendBusy(f"{name} is open or already running its trial call")
+        trial = health.trial_running
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self.backend(name).extract(url), self.timeout)
+        except ShareLinkError:
+            # The backend answered correctly; the link itself is bad
+            health.record_success(time.monotonic() - started)
+            raise
+        except asyncio.CancelledError:
+            # Lost a hedge race: the elapsed time is still a (lower bound) latency sample
+            health.latencies.append(time.monotonic() - started)
+            raise
+        except Exception as e:
+            health.record_failure()
+            LOGGER.warning(f"Extractor {name} failed ({health.state}): {e}")
+            raise
+        finally:
+            if trial:
+                health.trial_running = False
+        health.record_success(time.monotonic() - started)
+        return result
+
+    async def extract(self, url):
+        """Extract with failover; a second backend is hedged in once the
+        first has been slower than its own p90 latency."""
+        queue = self.candidates()
+        if not queue:
+            raise Exception("All extractor backends are unavailable, try again shortly")
+
+        pending = {}  # task -> backend name
+        last_error = None
+
+        def launch():
+            name = queue.pop(0)
+            pending[asyncio.create_task(self._call(name, url))] = name
+            return name
+
+        primary = launch()
+        hedge_after = self.health[primary].p90(self.hedge_default)
+        try:
+            while pending:
+                timeout = hedge_after if queue and len(pending) == 1 else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Primary is slow: hedge with the next backend
+                    self.hedged_calls += 1
+                    LOGGER.info(f"🔀 {primary} slower than {hedge_after:.1f}s - hedging with {launch()}")
+                    hedge_after = None
+                    continue
+
+                for task in done:
+                    pending.pop(task)
+                    try:
+                        return task.result()
+                    except ShareLinkError:
+                        raise
+                    except Exception as e:
+                        last_error = e
+                if not pending and queue:
+                    launch()  # Failover to the next healthy backend
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise Exception(f"All extractor backends failed: {last_error}")
+
+    def stats(self):
+        return {
+            'backends': {
+                name: self.health[name].stats(self.hedge_default) for name in self.backends
+            },
+            'hedged_calls': self.hedged_calls,
+        }
+
+
+def _native_backend():
+    # Imported lazily: the resolver module builds on this one
+    from bot.utils.terabox_resolver import NativeBackend
+    return NativeBackend()
+
+
+BACKEND_FACTORIES = {
+    'native': _native_backend,
+    'wdzone': WdzoneBackend,
+    'local': LocalFixtureBackend,
+}
+
+
+def build_registry(names=EXTRACTOR_BACKENDS):
+    registry = ExtractorRegistry()
+    for name in names:
+        factory = BACKEND_FACTORIES.get(name)
+        if factory is None:
+            LOGGER.warning(f"Unknown extractor backend '{name}' ignored")
+            continue
+        registry.register_factory(name, factory)
+    return registry
+
+
+# Global extractor registry (backends chosen by EXTRACTOR_BACKENDS)
+extractor_registry = build_registry()
@@ -0,0 +1,169 @@
+"""
+File Cache - content-addressed downloads kept under DOWNLOAD_DIR
+Failed uploads and repeat requests are served from local disk; a byte
+budget with LRU/LFU eviction bounds it, and in-flight jobs pin entries.
+The index, budget and pins are in-process, so the cache is off in split
+mode, where the front process and the workers share DOWNLOAD_DIR
+"""
+
+import os
+import hashlib
+import re
+import time
+from contextlib import contextmanager
+from collections import Counter
+from pathlib import Path
+from config import LOGGER, DOWNLOAD_DIR, FILE_CACHE_MB, FILE_CACHE_POLICY, BOT_MODE
+
+CACHE_DIRNAME = "cache"
+
+_MD5_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class CacheEntry:
+    __slots__ = ('key', 'path', 'size', 'hits', 'last_used')
+
+    def __init__(self, key, path, size, last_used):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.hits = 0
+        self.last_used = last_used
+
+
+def fingerprint(file_info):
+    """Cache key for a file: its content MD5 when the share exposes one,
+    otherwise a digest of where it came from plus its name and size"""
+    md5 = (file_info.get('md5') or '').lower()
+    if _MD5_RE.match(md5):
+        return f"md5-{md5}"
+    identity = f"{file_info.get('source', file_info['download_url'])}|{file_info['filename']}|{file_info['size']}"
+    return f"src-{hashlib.sha1(identity.encode()).hexdigest()}"
+
+
+class FileCache:
+    def __init__(self, root, budget_bytes, policy='lru'):
+        self.root = Path(root)
+        self.budget = budget_bytes
+        self.policy = policy
+        self._entries = {}  # key -> CacheEntry
+        self._pins = Counter()  # key -> jobs currently using it
+        self._stats = {'hits': 0, 'misses': 0, 'admitted': 0, 'evicted': 0, 'evicted_bytes': 0}
+
+    @property
+    def enabled(self):
+        return self.budget > 0
+
+    @property
+    def used_bytes(self):
+        return sum(entry.size for entry in self._entries.values())
+
+    def load(self):
+        """Rebuild the index from what survived a restart (recency from mtime)"""
+        if not self.enabled:
+            return 0
+        os.makedirs(self.root, exist_ok=True)
+        for path in self.root.iterdir():
+            if not path.is_file() or path.name.startswith('.'):
+                continue
+            stat = path.stat()
+            self._entries[path.name] = CacheEntry(path.name, path, stat.st_size, stat.st_mtime)
+        self.evict(0)
+        LOGGER.info(f"🗃️ File cache: {len(self._entries)} entries, {self.used_bytes} bytes")
+        return len(self._entries)
+
+    @contextmanager
+    def pin(self, key, lookup=True):
+        """Protect `key` from eviction for the duration; yields the cached
+        path on a hit, None on a miss (always None with lookup=False)"""
+        self._pins[key] += 1
+        try:
+            yield self.lookup(key) if lookup else None
+        finally:
+            self._pins[key] -= 1
+            if not self._pins[key]:
+                del self._pins[key]
+
+    def lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None or not entry.path.exists():
+            self._entries.pop(key, None)
+            self._stats['misses'] += 1
+            return None
+        entry.hits += 1
+        entry.last_used = time.time()
+        self._stats['hits'] += 1
+        return entry.path
+
+    def admit(self, key, source_path):
+        """Move a finished download into the cache; returns the cached path,
+        or None when it does not fit the budget (the source is left alone)"""
+        size = source_path.stat().st_size
+        if not self.enabled or size > self.budget:
+            return None
+        if key in self._entries:
+            return self._entries[key].path
+        self.evict(size)
+        if self.used_bytes + size > self.budget:
+            return None  # Everything left is pinned
+        os.makedirs(self.root, exist_ok=True)
+        path = self.root / key
+        os.replace(source_path, path)  # Same volume: a rename, not a copy
+        self._entries[key] = CacheEntry(key, path, size, time.time())
+        self._stats['admitted'] += 1
+        return path
+
+    def _victim_order(self):
+        candidates = [entry for entry in self._entries.values() if entry.key not in self._pins]
+        if self.policy == 'lfu':
+            return sorted(candidates, key=lambda entry: (entry.hits, entry.last_used))
+        return sorted(candidates, key=lambda entry: entry.last_used)
+
+    def _drop(self, entry):
+        self._entries.pop(entry.key, None)
+        try:
+            entry.path.unlink(missing_ok=True)
+        except OSError as e:
+            LOGGER.warning(f"Cache eviction failed for {entry.path}: {e}")
+        self._stats['evicted'] += 1
+        self._stats['evicted_bytes'] += entry.size
+
+    def evict(self, incoming_bytes):
+        """Evict unpinned entries until `incoming_bytes` more fit the budget"""
+        freed = 0
+        for entry in self._victim_order():
+            if self.used_bytes + incoming_bytes <= self.budget:
+                break
+            self._drop(entry)
+            freed += entry.size
+        return freed
+
+    def make_room(self, fits):
+        """Evict unpinned entries until `fits()` is true (e.g. disk admission)"""
+        freed = 0
+        for entry in self._victim_order():
+            if fits():
+                break
+            self._drop(entry)
+            freed += entry.size
+        if freed:
+            LOGGER.info(f"🗃️ Evicted {freed} cached bytes to make room on disk")
+        return freed
+
+    def stats(self):
+        return {
+            **self._stats,
+            'entries': len(self._entries),
+            'used_bytes': self.used_bytes,
+            'budget_bytes': self.budget,
+            'pinned': len(self._pins),
+            'policy': self.policy,
+        }
+
+
+# Global file cache instance
+file_cache = FileCache(
+    Path(DOWNLOAD_DIR) / CACHE_DIRNAME,
+    budget_bytes=FILE_CACHE_MB * 1024 * 1024 if BOT_MODE == 'all' else 0,
+    policy=FILE_CACHE_POLICY,
+)
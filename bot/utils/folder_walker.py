@@ -0,0 +1,97 @@
+"""
+Folder Walker - recursive traversal of Terabox folder shares
+Directories are listed concurrently (bounded) and paginated; files are
+yielded as soon as they are discovered so downloads can start immediately
+"""
+
+import asyncio
+from config import (
+    LOGGER, FOLDER_LIST_CONCURRENCY, FOLDER_MAX_FILES, FOLDER_MAX_DIRS,
+    FOLDER_EXTENSIONS, FOLDER_MIN_SIZE_MB, FOLDER_MAX_SIZE_MB
+)
+
+
+class FolderFilter:
+    """Which discovered files are worth delivering, and how many at most"""
+
+    def __init__(self, extensions=FOLDER_EXTENSIONS, min_size=FOLDER_MIN_SIZE_MB * 1024 * 1024,
+                 max_size=FOLDER_MAX_SIZE_MB * 1024 * 1024, max_files=FOLDER_MAX_FILES):
+        self.extensions = tuple(ext.lower() if ext.startswith('.') else f".{ext.lower()}" for ext in extensions)
+        self.min_size = min_size
+        self.max_size = max_size  # 0 = no upper bound
+        self.max_files = max_files
+
+    def accepts(self, entry):
+        if self.extensions and not entry['filename'].lower().endswith(self.extensions):
+            return False
+        if entry['size'] < self.min_size:
+            return False
+        if self.max_size and entry['size'] > self.max_size:
+            return False
+        return True
+
+
+async def walk_share(resolver, share, folder_filter=None, concurrency=FOLDER_LIST_CONCURRENCY,
+                     max_dirs=FOLDER_MAX_DIRS):
+    """Yield every accepted file entry of `share`, recursing into folders.
+
+    Up to `concurrency` directories are listed at once; each directory is
+    paginated until exhausted. Stops early once `max_files` files were
+    yielded or `max_dirs` directories were listed.
+    """
+    folder_filter = folder_filter or FolderFilter()
+    directories = asyncio.Queue()
+    found = asyncio.Queue()
+    directories.put_nowait(None)  # None = share root
+    listed = 0
+    errors = []
+
+    async def lister():
+        nonlocal listed
+        while True:
+            path = await directories.get()
+            try:
+                if listed >= max_dirs:
+                    continue
+                listed += 1
+                page = 1
+                while True:
+                    entries, has_more = await resolver.list_dir(share, path, page=page)
+                    for entry in entries:
+                        if entry['is_dir']:
+                            directories.put_nowait(entry['path'])
+                        elif folder_filter.accepts(entry):
+                            await found.put(entry)
+                    if not has_more:
+                        break
+                    page += 1
+            except Exception as e:
+                LOGGER.warning(f"📂 Listing {path or '/'} failed: {e}")
+                errors.append(e)
+            finally:
+                directories.task_done()
+
+    workers = [asyncio.create_task(lister()) for _ in range(concurrency)]
+
+    async def finish():
+        await directories.join()
+        await found.put(None)
+
+    finisher = asyncio.create_task(finish())
+    yielded = 0
+    try:
+        while yielded < folder_filter.max_files:
+            entry = await found.get()
+            if entry is None:
+                break
+            yielded += 1
+            yield entry
+    finally:
+        finisher.cancel()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(finisher, *workers, return_exceptions=True)
+
+    LOGGER.info(f"📂 Folder walk done: {yielded} files from {listed} directories")
+    if not yielded and errors:
+        raise errors[0]
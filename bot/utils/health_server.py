@@ -1,5 +1,9 @@
 """
 Simple HTTP Health Server for Koyeb
+Only /health, with no view of the bot's state. The module has no __main__
+entry point, so start.sh's `python3 bot/utils/health_server.py` just imports
+it and exits; port 8000 (/health and /metrics) is served by the health
+server the bot starts itself (bot/__main__.py).
 """
 import http.server
 import socketserver
@@ -0,0 +1,88 @@
+"""
+HTTP Client - one application-scoped aiohttp pool
+Downloader, extractor backends and shortlink calls share keep-alive
+connections and the DNS cache instead of handshaking on every request
+"""
+
+import asyncio
+import time
+from config import (
+    LOGGER, HTTP_POOL_LIMIT, HTTP_POOL_PER_HOST, HTTP_DNS_CACHE_SECONDS,
+    HTTP_KEEPALIVE_SECONDS, HTTP_WARMUP_HOSTS
+)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+
+class HttpClient:
+    """Lazily built shared ClientSession; callers pass per-request timeouts/headers"""
+    
+    def __init__(self, limit=HTTP_POOL_LIMIT, limit_per_host=HTTP_POOL_PER_HOST,
+                 dns_cache=HTTP_DNS_CACHE_SECONDS, keepalive=HTTP_KEEPALIVE_SECONDS):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache = dns_cache
+        self.keepalive = keepalive
+        self._session = None
+        self.sessions_created = 0
+        self.warmed_hosts = {}  # host -> warm-up latency in seconds (None = failed)
+    
+    def session(self):
+        """The shared session (must be called from the running event loop)"""
+        if self._session is None or self._session.closed:
+            import aiohttp  # Loaded on first use to keep cold start fast
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache,
+                keepalive_timeout=self.keepalive,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, connect=30, sock_read=60),
+                headers={'User-Agent': USER_AGENT}
+            )
+            self.sessions_created += 1
+        return self._session
+    
+    @staticmethod
+    def timeout(total=None, connect=30, sock_read=None):
+        import aiohttp
+        return aiohttp.ClientTimeout(total=total, connect=connect, sock_read=sock_read)
+    
+    async def _warm(self, host):
+        started = time.monotonic()
+        try:
+            # A released HEAD response leaves its connection in the keep-alive pool
+            async with self.session().head(f"https://{host}/", timeout=self.timeout(total=10)):
+                pass
+            self.warmed_hosts[host] = round(time.monotonic() - started, 3)
+        except Exception as e:
+            self.warmed_hosts[host] = None
+            LOGGER.debug(f"Warm-up of {host} failed: {e}")
+    
+    async def warm_up(self, hosts=HTTP_WARMUP_HOSTS):
+        """Resolve and connect to the hosts the first job will need"""
+        await asyncio.gather(*(self._warm(host) for host in hosts))
+        ready = sum(latency is not None for latency in self.warmed_hosts.values())
+        LOGGER.info(f"🔥 HTTP pool warmed: {ready}/{len(hosts)} hosts")
+    
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+            LOGGER.info("🔌 HTTP pool closed")
+        self._session = None
+    
+    def stats(self):
+        return {
+            'open': self._session is not None and not self._session.closed,
+            'limit': self.limit,
+            'limit_per_host': self.limit_per_host,
+            'sessions_created': self.sessions_created,
+            'warmed_hosts': dict(self.warmed_hosts),
+        }
+
+
+# Global HTTP client instance
+http_client = HttpClient()
@@ -0,0 +1,153 @@
+"""
+Image Stage - photo vs document by real dimensions, not extension
+Oversized images are downscaled/recompressed and documents get a
+thumbnail, all in the CPU executor's process lane. Transformed outputs
+live in the file cache under the source's content key, so repeat
+requests skip the work.
+"""
+
+import os
+from collections import OrderedDict
+from config import LOGGER, IMAGE_MAX_SIDE, IMAGE_RECOMPRESS_MB, IMAGE_JPEG_QUALITY, IMAGE_MAX_PIXELS
+from bot.utils.cpu_executor import cpu_executor, HIGH
+from bot.utils.file_cache import file_cache
+
+# Telegram sendPhoto limits
+PHOTO_MAX_BYTES = 10 * 1024 * 1024
+PHOTO_MAX_DIMENSION_SUM = 10000
+PHOTO_MAX_RATIO = 20
+
+# Telegram document thumbnail limits
+THUMB_MAX_SIDE = 320
+THUMB_MAX_BYTES = 200 * 1024
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
+PHOTO = 'photo'
+DOCUMENT = 'document'
+
+_decisions = OrderedDict()  # cache key -> decision, bounded
+_DECISIONS_MAX = 256
+
+
+# --- Runs in the process pool (module-level so it can be pickled) ---
+
+def inspect_image(path):
+    """(width, height, format, animated) from the header, or None if unreadable"""
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            return img.width, img.height, img.format, getattr(img, 'is_animated', False)
+    except Exception:
+        return None
+
+
+def _to_rgb(img):
+    from PIL import Image
+    if img.mode in ('RGBA', 'LA', 'P'):
+        # Flatten transparency onto white (JPEG has no alpha)
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def render_jpeg(source, target, max_side, quality, max_bytes=None):
+    """Downscale to fit `max_side` and write a JPEG; quality is stepped down
+    until it fits `max_bytes`. Returns the written size, or None"""
+    from PIL import Image
+    with Image.open(source) as img:
+        img.draft('RGB', (max_side, max_side))  # JPEG: decode at reduced scale
+        img = _to_rgb(img)
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        while True:
+            img.save(target, 'JPEG', quality=quality, optimize=True, progressive=True)
+            size = os.path.getsize(target)
+            if not max_bytes or size <= max_bytes or quality <= 40:
+                return size if not max_bytes or size <= max_bytes else None
+            quality -= 10
+
+
+# --- Event-loop side ---
+
+def _fits_photo(width, height, size):
+    ratio = max(width, height) / max(min(width, height), 1)
+    return size <= PHOTO_MAX_BYTES and width + height <= PHOTO_MAX_DIMENSION_SUM and ratio <= PHOTO_MAX_RATIO
+
+
+async def _derived(cache_key, suffix, source, max_side, quality, max_bytes):
+    """Render (or reuse) a transformed copy kept in the file cache"""
+    key = f"{cache_key}-{suffix}"
+    cached = file_cache.lookup(key)
+    if cached:
+        return cached, False
+    os.makedirs(file_cache.root, exist_ok=True)
+    scratch = file_cache.root / f".tmp-{key}-{os.getpid()}"  # Workers share the directory
+    size = await cpu_executor.run(
+        f"image_{suffix}", render_jpeg, str(source), str(scratch), max_side, quality, max_bytes, priority=HIGH
+    )
+    if size is None:
+        scratch.unlink(missing_ok=True)
+        return None, False
+    admitted = file_cache.admit(key, scratch)
+    # Not admitted (cache off or full): the caller owns the scratch file
+    return (admitted, False) if admitted else (scratch, True)
+
+
+def _decide(info, size):
+    """Photo or document, whether to re-render it, whether it gets a thumbnail"""
+    if info is None:
+        return {'kind': DOCUMENT, 'render': False, 'thumbnail': False}
+    width, height, image_format, animated = info
+    if width * height > IMAGE_MAX_PIXELS:
+        # Decoding a canvas this large would blow the memory budget
+        return {'kind': DOCUMENT, 'render': False, 'thumbnail': False}
+    ratio = max(width, height) / max(min(width, height), 1)
+    if animated or ratio > PHOTO_MAX_RATIO:
+        # sendPhoto would drop the animation / reject the aspect ratio
+        return {'kind': DOCUMENT, 'render': False, 'thumbnail': True}
+    as_is = (
+        _fits_photo(width, height, size)
+        and size <= IMAGE_RECOMPRESS_MB * 1024 * 1024
+        and image_format in ('JPEG', 'PNG', 'WEBP')
+    )
+    return {'kind': PHOTO, 'render': not as_is, 'thumbnail': False}
+
+
+async def prepare_image(file_path, cache_key):
+    """Decide how to send an image and produce what that needs.
+
+    Returns {'kind': PHOTO|DOCUMENT, 'path', 'thumbnail', 'scratch'}; the
+    caller deletes the `scratch` paths once the upload is done.
+    """
+    decision = _decisions.get(cache_key)
+    if decision is None:
+        info = await cpu_executor.run('image_inspect', inspect_image, str(file_path), priority=HIGH)
+        decision = _decide(info, file_path.stat().st_size)
+        LOGGER.info(f"🖼️ {file_path.name}: {info[:3] if info else 'unreadable'} -> {decision['kind']}")
+        _decisions[cache_key] = decision
+        while len(_decisions) > _DECISIONS_MAX:
+            _decisions.popitem(last=False)
+    else:
+        _decisions.move_to_end(cache_key)
+
+    result = {'kind': decision['kind'], 'path': file_path, 'thumbnail': None, 'scratch': []}
+    thumbnail = decision['thumbnail']
+    if decision['render']:
+        path, scratch = await _derived(
+            cache_key, 'photo', file_path, IMAGE_MAX_SIDE, IMAGE_JPEG_QUALITY, PHOTO_MAX_BYTES
+        )
+        if path is None:
+            result['kind'] = DOCUMENT  # Couldn't get under the photo limit
+            thumbnail = True
+        else:
+            result['path'] = path
+            if scratch:
+                result['scratch'].append(path)
+    if thumbnail:
+        path, scratch = await _derived(cache_key, 'thumb', file_path, THUMB_MAX_SIDE, 85, THUMB_MAX_BYTES)
+        result['thumbnail'] = path
+        if scratch and path:
+            result['scratch'].append(path)
+    return result
@@ -0,0 +1,293 @@
+"""
+Job Journal - crash-safe record of every accepted job (SQLite)
+Tracks each job's state, the byte offset of its partial download and
+whether it reached the upload, so a restarted container can resume it.
+In split mode it is also the work queue: workers claim jobs under a
+renewable lease, and jobs whose lease ran out are claimed again. Workers
+also publish their download weight here so they share one bandwidth cap,
+and every process keeps the users' quota buckets here.
+"""
+
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from config import DOWNLOAD_DIR, JOURNAL_RETENTION_DAYS, JOB_AGING_SECONDS
+
+JOURNAL_DIRNAME = "journal"
+
+# Job states, in order
+QUEUED = 'queued'
+DOWNLOADING = 'downloading'
+UPLOADING = 'uploading'
+DONE = 'done'
+FAILED = 'failed'
+
+FINISHED = (DONE, FAILED)
+
+CANCELLED = 'Cancelled by user'  # Error of a failed job the user stopped
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'file',
+    state TEXT NOT NULL,
+    filename TEXT,
+    size INTEGER,
+    md5 TEXT,
+    download_url TEXT,
+    byte_offset INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    status_message_id INTEGER,
+    worker_id TEXT,
+    lease_until REAL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    batch_message_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_message ON jobs (chat_id, message_id);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE TABLE IF NOT EXISTS bandwidth_shares (
+    process_id TEXT PRIMARY KEY,
+    weight REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bandwidth_limits (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    ingress_bps INTEGER NOT NULL,
+    upload_reserve_bps INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quota (
+    user_id INTEGER PRIMARY KEY,
+    downloads REAL NOT NULL,
+    bytes REAL NOT NULL,
+    stamp INTEGER NOT NULL
+);
+"""
+
+# Columns added after the first schema, for journals created by older versions
+_ADDED_COLUMNS = {
+    'status_message_id': 'INTEGER',
+    'worker_id': 'TEXT',
+    'lease_until': 'REAL',
+    'priority': 'INTEGER NOT NULL DEFAULT 0',
+    'batch_message_id': 'INTEGER',
+}
+
+
+class JobJournal:
+    """Small synchronous SQLite store; every call is a single short statement"""
+
+    def __init__(self, root, retention_seconds):
+        self.root = Path(root)
+        self.path = self.root / "jobs.sqlite3"
+        self.retention = retention_seconds
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            os.makedirs(self.root, exist_ok=True)
+            # timeout: front end and workers may write concurrently
+            self._db = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")  # Survives process crashes, not power loss
+            self._db.executescript(_SCHEMA)
+            existing = {row['name'] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for name, kind in _ADDED_COLUMNS.items():
+                if name not in existing:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        return self._db
+
+    @contextmanager
+    def transaction(self):
+        """Statements in the block see and write the database as one step,
+        with every other process kept out"""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def seen(self, chat_id, message_id):
+        """True if this message was already accepted (Telegram redelivers after a crash)"""
+        row = self.db.execute(
+            "SELECT 1 FROM jobs WHERE chat_id = ? AND message_id = ? LIMIT 1", (chat_id, message_id)
+        ).fetchone()
+        return row is not None
+
+    def create(self, user_id, chat_id, message_id, url, priority=0):
+        now = time.time()
+        cursor = self.db.execute(
+            "INSERT INTO jobs (user_id, chat_id, message_id, url, state, created_at, updated_at, priority) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (user_id, chat_id, message_id, url, QUEUED, now, now, priority)
+        )
+        return cursor.lastrowid
+
+    def update(self, job_id, **fields):
+        if job_id is None or not fields:
+            return
+        fields['updated_at'] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self.db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def checkpoint(self, job_id, byte_offset):
+        """Bytes [0, byte_offset) of the partial file are written"""
+        self.update(job_id, byte_offset=byte_offset)
+
+    def finish(self, job_id, state, error=None):
+        if job_id is None:
+            return
+        self.update(job_id, state=state, error=error)
+        shutil.rmtree(self.partial_dir(job_id), ignore_errors=True)
+
+    def cancel(self, job_id):
+        """Fail an unfinished job as cancelled and drop its partial file; a
+        worker running it loses its lease at the next heartbeat. True if the
+        job hadn't finished yet."""
+        cursor = self.db.execute(
+            "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE id = ? AND state NOT IN (?, ?)",
+            (FAILED, CANCELLED, time.time(), job_id, *FINISHED)
+        )
+        shutil.rmtree(self.partial_dir(job_id), ignore_errors=True)
+        return cursor.rowcount == 1
+    
+    def claim(self, worker_id, lease_seconds):
+        """Atomically take the unleased job (queued, or abandoned by a dead
+        worker) with the highest priority plus age - one class per
+        JOB_AGING_SECONDS waited - and lease it to `worker_id`; None when
+        there is none"""
+        now = time.time()
+        with self.transaction():
+            row = self.db.execute(
+                "SELECT id FROM jobs WHERE state NOT IN (?, ?) "
+                "AND (lease_until IS NULL OR lease_until < ?) "
+                "ORDER BY priority + (? - created_at) / ? DESC, id LIMIT 1",
+                (*FINISHED, now, now, JOB_AGING_SECONDS)
+            ).fetchone()
+            if row is not None:
+                self.db.execute(
+                    "UPDATE jobs SET worker_id = ?, lease_until = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE id = ?",
+                    (worker_id, now + lease_seconds, now, row['id'])
+                )
+        return self.get(row['id']) if row is not None else None
+
+    def renew(self, job_id, worker_id, lease_seconds):
+        """Heartbeat: extend the lease; False if the job was lost to another worker"""
+        cursor = self.db.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker_id = ? AND state NOT IN (?, ?)",
+            (time.time() + lease_seconds, job_id, worker_id, *FINISHED)
+        )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self):
+        rows = self.db.execute(
+            "SELECT * FROM jobs WHERE state NOT IN (?, ?) ORDER BY id", FINISHED
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def unfinished_ids(self, user_id, chat_id=None, status_message_id=None):
+        """Unfinished jobs of `user_id`, optionally only those on a status
+        message (a job's own, or the batch message that queued it)"""
+        query = "SELECT id FROM jobs WHERE user_id = ? AND state NOT IN (?, ?)"
+        params = [user_id, *FINISHED]
+        if status_message_id is not None:
+            query += " AND chat_id = ? AND ? IN (status_message_id, batch_message_id)"
+            params += [chat_id, status_message_id]
+        return [row['id'] for row in self.db.execute(query, params).fetchall()]
+    
+    def share_bandwidth(self, process_id, weight, ttl):
+        """Publish this process's total download weight; returns the weight
+        of every other process that published within `ttl` seconds"""
+        now = time.time()
+        self.db.execute(
+            "INSERT INTO bandwidth_shares (process_id, weight, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (process_id) DO UPDATE SET weight = excluded.weight, updated_at = excluded.updated_at",
+            (process_id, weight, now)
+        )
+        self.db.execute("DELETE FROM bandwidth_shares WHERE updated_at < ?", (now - ttl,))
+        return self.db.execute(
+            "SELECT COALESCE(SUM(weight), 0) FROM bandwidth_shares WHERE process_id != ?", (process_id,)
+        ).fetchone()[0]
+    
+    def set_bandwidth_limits(self, ingress_bps, upload_reserve_bps):
+        self.db.execute(
+            "INSERT OR REPLACE INTO bandwidth_limits (id, ingress_bps, upload_reserve_bps) VALUES (1, ?, ?)",
+            (ingress_bps, upload_reserve_bps)
+        )
+    
+    def bandwidth_limits(self):
+        """(ingress_bps, upload_reserve_bps) last set with /bandwidth, or None"""
+        row = self.db.execute("SELECT ingress_bps, upload_reserve_bps FROM bandwidth_limits").fetchone()
+        return tuple(row) if row else None
+    
+    def quota_buckets(self, user_id):
+        """(download tokens, byte tokens, stamp) of a user, None if their buckets are full"""
+        row = self.db.execute("SELECT downloads, bytes, stamp FROM quota WHERE user_id = ?", (user_id,)).fetchone()
+        return tuple(row) if row else None
+    
+    def store_quota_buckets(self, user_id, downloads, nbytes, stamp):
+        self.db.execute(
+            "INSERT OR REPLACE INTO quota (user_id, downloads, bytes, stamp) VALUES (?, ?, ?, ?)",
+            (user_id, downloads, nbytes, stamp)
+        )
+    
+    def clear_quota_buckets(self, user_id=None, before=None):
+        """Mark a user's buckets full, or every user's last taken from before `before`"""
+        if user_id is not None:
+            cursor = self.db.execute("DELETE FROM quota WHERE user_id = ?", (user_id,))
+        else:
+            cursor = self.db.execute("DELETE FROM quota WHERE stamp < ?", (before,))
+        return cursor.rowcount
+    
+    def partial_dir(self, job_id):
+        """Where a journaled job keeps its partial download across restarts"""
+        return self.root / f"job_{job_id}"
+
+    def cleanup(self):
+        """Drop partial dirs of finished jobs and rows past the retention window"""
+        live = {f"job_{job['id']}" for job in self.unfinished()}
+        for entry in self.root.glob("job_*"):
+            if entry.name not in live:
+                shutil.rmtree(entry, ignore_errors=True)
+        cutoff = time.time() - self.retention
+        self.db.execute(
+            "DELETE FROM jobs WHERE state IN (?, ?) AND updated_at < ?", (*FINISHED, cutoff)
+        )
+
+    def stats(self):
+        rows = self.db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        stats = {state: count for state, count in rows}
+        stats['leased'] = self.db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state NOT IN (?, ?) AND lease_until >= ?", (*FINISHED, time.time())
+        ).fetchone()[0]
+        return stats
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+# Global job journal instance (DOWNLOAD_DIR/journal, excluded from sweeping)
+job_journal = JobJournal(
+    Path(DOWNLOAD_DIR) / JOURNAL_DIRNAME,
+    retention_seconds=JOURNAL_RETENTION_DAYS * 86400,
+)
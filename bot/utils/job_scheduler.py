@@ -0,0 +1,139 @@
+"""
+Job Scheduler - priority lanes for downloads (admin, verified, free)
+A fixed number of download slots per process. Waiting jobs start in order
+of class rank plus age (a job gains one rank every JOB_AGING_SECONDS it
+waits), so verified users go first without free users ever starving.
+Reserved slots can only be used by their class or a higher one. Each
+class's queue wait is recorded for the metrics endpoint.
+"""
+
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from config import (
+    LOGGER, OWNER_ID, JOB_SLOTS, JOB_RESERVED_VERIFIED, JOB_RESERVED_ADMIN, JOB_AGING_SECONDS
+)
+from bot.utils.metrics import LatencyStats
+
+# Priority classes, lowest rank first
+FREE = 'free'
+VERIFIED = 'verified'
+ADMIN = 'admin'
+
+RANK = {FREE: 0, VERIFIED: 1, ADMIN: 2}
+CLASS_OF_RANK = {rank: job_class for job_class, rank in RANK.items()}
+
+# Share of the bandwidth shaper each class gets relative to a free job
+BANDWIDTH_WEIGHT = {FREE: 1.0, VERIFIED: 2.0, ADMIN: 4.0}
+
+
+def priority_class(user_id):
+    """Decided once, where the job is accepted: the journal row keeps it as
+    `priority`, since a worker's user state doesn't know who is verified"""
+    if OWNER_ID and user_id == OWNER_ID:
+        return ADMIN
+    from bot.utils.token_verification import check_verification
+    return VERIFIED if check_verification(user_id) else FREE
+
+
+class _Waiter:
+    __slots__ = ('job_class', 'label', 'enqueued', 'seq', 'future')
+
+    def __init__(self, job_class, label, seq):
+        self.job_class = job_class
+        self.label = label
+        self.enqueued = time.monotonic()
+        self.seq = seq
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class JobScheduler:
+    def __init__(self, slots, reserved, aging_seconds):
+        self.slots = max(slots, 1)
+        self.reserved = reserved  # class -> slots no lower class may use
+        self.aging = aging_seconds
+        self._running = {job_class: 0 for job_class in RANK}
+        self._waiters = []
+        self._seq = itertools.count()
+        self.queue_wait = LatencyStats()  # Per class
+        self._stats = {'started': 0, 'aged_past': 0}
+
+    def _limit(self, job_class):
+        """Slots jobs of this class and lower may occupy together"""
+        higher = sum(self.reserved.get(other, 0) for other in RANK if RANK[other] > RANK[job_class])
+        return max(self.slots - higher, 1)
+
+    def _can_start(self, job_class):
+        if sum(self._running.values()) >= self.slots:
+            return False
+        at_or_below = sum(count for other, count in self._running.items() if RANK[other] <= RANK[job_class])
+        return at_or_below < self._limit(job_class)
+
+    def _score(self, waiter, now):
+        return RANK[waiter.job_class] + (now - waiter.enqueued) / self.aging
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._waiters:
+            eligible = [waiter for waiter in self._waiters if self._can_start(waiter.job_class)]
+            if not eligible:
+                return
+            chosen = max(eligible, key=lambda waiter: (self._score(waiter, now), -waiter.seq))
+            if any(RANK[waiter.job_class] > RANK[chosen.job_class] for waiter in eligible):
+                self._stats['aged_past'] += 1  # Age won over a higher class
+            self._waiters.remove(chosen)
+            self._start(chosen.job_class)
+            self.queue_wait.record(chosen.job_class, now - chosen.enqueued)
+            chosen.future.set_result(None)
+
+    def _start(self, job_class):
+        self._running[job_class] += 1
+        self._stats['started'] += 1
+
+    @asynccontextmanager
+    async def slot(self, job_class, label=''):
+        """Hold a download slot for the block, waiting in the class's lane"""
+        waiter = _Waiter(job_class, label, next(self._seq))
+        self._waiters.append(waiter)
+        self._dispatch()
+        if not waiter.future.done():
+            LOGGER.info(f"🚥 {label} waiting for a {job_class} slot ({len(self._waiters)} queued)")
+        try:
+            await waiter.future
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif not waiter.future.cancelled():
+                self._release(job_class)  # Granted just as it was cancelled
+            raise
+        try:
+            yield
+        finally:
+            self._release(job_class)
+
+    def _release(self, job_class):
+        self._running[job_class] -= 1
+        self._dispatch()
+
+    def stats(self):
+        waiting = {job_class: 0 for job_class in RANK}
+        for waiter in self._waiters:
+            waiting[waiter.job_class] += 1
+        return {
+            'slots': self.slots,
+            'reserved': dict(self.reserved),
+            'aging_seconds': self.aging,
+            'running': dict(self._running),
+            'waiting': waiting,
+            'queue_wait': self.queue_wait.stats(),
+            **self._stats,
+        }
+
+
+# Global job scheduler
+job_scheduler = JobScheduler(
+    JOB_SLOTS,
+    reserved={VERIFIED: JOB_RESERVED_VERIFIED, ADMIN: JOB_RESERVED_ADMIN},
+    aging_seconds=JOB_AGING_SECONDS,
+)
@@ -0,0 +1,169 @@
+"""
+Log Forwarder - copies delivered files to the log channel off the critical path
+A job only enqueues the sent message; a background task re-sends the
+files to LOG_CHANNEL by file_id (no re-upload), several per media group,
+with the user info as each file's caption, and retries with backoff
+when Telegram rate-limits or the network fails.
+"""
+
+import asyncio
+import html
+from collections import deque
+from datetime import datetime
+from config import (
+    LOGGER, LOG_CHANNEL, AUTO_FORWARD, LOG_FORWARD_BATCH, LOG_FORWARD_WINDOW,
+    LOG_FORWARD_QUEUE, LOG_FORWARD_RETRIES
+)
+
+VISUAL = ('photo', 'video')  # May share a media group; documents only group with documents
+
+
+def media_of(sent):
+    """(kind, file_id) of the file in a sent message, or None"""
+    if sent is None:
+        return None
+    if getattr(sent, 'video', None):
+        return 'video', sent.video.file_id
+    if getattr(sent, 'photo', None):
+        return 'photo', sent.photo[-1].file_id
+    if getattr(sent, 'document', None):
+        return 'document', sent.document.file_id
+    return None
+
+
+def _caption(user, kind, filename):
+    from bot.utils.quota import quota_engine
+
+    username = getattr(user, 'username', None)
+    return (
+        f"📁 <b>{html.escape(filename)}</b>\n"
+        f"👤 <b>User:</b> {html.escape(getattr(user, 'full_name', None) or 'Unknown')}"
+        f" (<code>{user.id}</code>)\n"
+        f"📱 <b>Username:</b> {'@' + html.escape(username) if username else 'None'}\n"
+        f"🎯 <b>Type:</b> {kind.title()} · 📊 <b>Downloads:</b> {quota_engine.usage(user.id)['downloads_used']}\n"
+        f"🕒 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    )
+
+
+class LogForwarder:
+    def __init__(self, channel_id, enabled, batch_size, window, max_queue, retries):
+        self.channel_id = channel_id
+        self.enabled = enabled and channel_id != 0
+        self.batch_size = max(1, min(batch_size, 10))
+        self.window = window
+        self.retries = retries
+        self.bot = None
+        self._pending = deque(maxlen=max_queue)
+        self._wake = asyncio.Event()
+        self._task = None
+        self._stats = {'queued': 0, 'sent': 0, 'calls': 0, 'retries': 0, 'failed': 0, 'dropped': 0}
+
+    def start(self, bot):
+        """Start the background sender (called once the event loop runs)"""
+        if not self.enabled or self._task:
+            return
+        self.bot = bot
+        self._task = asyncio.create_task(self._run())
+        LOGGER.info(f"📨 Log channel forwarding to {self.channel_id}")
+
+    def enqueue(self, sent, user, filename):
+        """Queue a copy of the file in `sent`; never waits and never raises"""
+        if not self._task:
+            return False
+        media = media_of(sent)
+        if media is None:
+            return False
+        kind, file_id = media
+        if len(self._pending) == self._pending.maxlen:
+            self._stats['dropped'] += 1  # deque drops the oldest copy
+        self._pending.append({'kind': kind, 'file_id': file_id, 'caption': _caption(user, kind, filename)})
+        self._stats['queued'] += 1
+        self._wake.set()
+        return True
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            # Let a batch build up; this also paces posts to the channel
+            await asyncio.sleep(self.window)
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            if not self._pending:
+                self._wake.clear()
+            try:
+                await self._send_batch(batch)
+            except Exception as e:
+                self._stats['failed'] += len(batch)
+                LOGGER.error(f"Log channel batch failed: {e}")
+
+    async def _send_batch(self, batch):
+        visual = [item for item in batch if item['kind'] in VISUAL]
+        documents = [item for item in batch if item['kind'] not in VISUAL]
+        for group in (visual, documents):
+            if len(group) == 1:
+                await self._send_one(group[0])
+            elif group:
+                if await self._call('send_media_group', media=[self._input_media(item) for item in group]):
+                    self._stats['sent'] += len(group)
+                else:
+                    for item in group:  # One bad file_id rejects the whole group
+                        await self._send_one(item)
+
+    async def _send_one(self, item):
+        sent = await self._call(
+            f"send_{item['kind']}", **{item['kind']: item['file_id']},
+            caption=item['caption'], parse_mode='HTML'
+        )
+        self._stats['sent' if sent else 'failed'] += 1
+
+    @staticmethod
+    def _input_media(item):
+        from telegram import InputMediaDocument, InputMediaPhoto, InputMediaVideo
+        media_type = {'photo': InputMediaPhoto, 'video': InputMediaVideo}.get(item['kind'], InputMediaDocument)
+        return media_type(item['file_id'], caption=item['caption'], parse_mode='HTML')
+
+    async def _call(self, method, **kwargs):
+        """Bot API call with retries; None when it was rejected or never got through"""
+        from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+        for attempt in range(1, self.retries + 1):
+            self._stats['calls'] += 1
+            try:
+                return await getattr(self.bot, method)(self.channel_id, **kwargs)
+            except RetryAfter as e:
+                delay = e.retry_after
+            except (BadRequest, Forbidden) as e:
+                LOGGER.error(f"Log channel rejected {method}: {e}")
+                return None
+            except NetworkError as e:
+                delay = min(2 ** attempt, 60)
+                LOGGER.warning(f"Log channel {method} failed ({e}), retry in {delay}s")
+            if attempt < self.retries:
+                self._stats['retries'] += 1
+                await asyncio.sleep(delay)
+        return None
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending:
+            LOGGER.warning(f"📨 {len(self._pending)} log channel copies dropped at shutdown")
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'running': self._task is not None,
+            'pending': len(self._pending),
+            **self._stats,
+        }
+
+
+# Global log forwarder instance
+log_forwarder = LogForwarder(
+    LOG_CHANNEL, AUTO_FORWARD,
+    batch_size=LOG_FORWARD_BATCH,
+    window=LOG_FORWARD_WINDOW,
+    max_queue=LOG_FORWARD_QUEUE,
+    retries=LOG_FORWARD_RETRIES,
+)
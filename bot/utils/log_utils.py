@@ -0,0 +1,13 @@
+"""
+Logging helpers for hot paths - keep request-path log records small
+"""
+
+from config import LOG_PAYLOAD_LIMIT
+
+
+def truncate_payload(payload, limit=LOG_PAYLOAD_LIMIT):
+    """Render `payload` for a log line, cut to `limit` characters"""
+    text = payload if isinstance(payload, str) else repr(payload)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... (+{len(text) - limit} chars)"
@@ -0,0 +1,204 @@
+"""
+Memory Governor - RSS-aware backpressure for the 512MB tier
+Samples RSS (the bot plus its CPU executor children, which share the
+container's limit), tracks per-job memory estimates and decides whether
+new jobs may start, how large I/O buffers may be and when to stay disk-backed
+"""
+
+import os
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from itertools import count
+from config import (
+    LOGGER, MEMORY_CEILING_MB, MEMORY_SOFT_RATIO, MEMORY_HARD_RATIO,
+    MEMORY_SAMPLE_SECONDS
+)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+NORMAL = 'normal'
+SOFT = 'soft'
+HARD = 'hard'
+
+
+def children_rss_bytes():
+    """Resident set size of this process's live children (the CPU executor
+    pool); 0 where /proc isn't available"""
+    import multiprocessing
+    total = 0
+    for child in multiprocessing.active_children():
+        try:
+            with open(f'/proc/{child.pid}/statm') as f:
+                total += int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass  # Exited meanwhile, or not Linux
+    return total
+
+
+def read_rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # Not Linux: peak RSS is the best portable approximation
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+class MemoryTicket:
+    """Handle for one admitted job's memory estimate"""
+
+    def __init__(self, governor, job_id):
+        self._governor = governor
+        self.job_id = job_id
+
+    async def grow(self, estimate):
+        """Raise this job's estimate (e.g. before upload), waiting for headroom"""
+        await self._governor._resize(self.job_id, estimate)
+
+
+class MemoryGovernor:
+    def __init__(self, ceiling_bytes, soft_ratio, hard_ratio):
+        self.ceiling = ceiling_bytes
+        self.soft_limit = int(ceiling_bytes * soft_ratio)
+        self.hard_limit = int(ceiling_bytes * hard_ratio)
+        self.rss = read_rss_bytes()
+        self.children_rss = 0
+        self.peak_rss = self.rss
+        self._jobs = {}  # job id -> estimated bytes still to be allocated
+        self._growing = set()  # job ids blocked in grow()
+        self._ids = count(1)
+        self._cond = None
+        self._decisions = {'admitted': 0, 'paused': 0, 'shrunk_buffers': 0, 'forced_disk': 0}
+        self._recent = deque(maxlen=20)
+
+    @property
+    def _condition(self):
+        # Created lazily so the governor can be built before an event loop exists
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    @property
+    def committed_bytes(self):
+        return sum(self._jobs.values())
+
+    @property
+    def projected_rss(self):
+        return self.rss + self.committed_bytes
+
+    @property
+    def pressure(self):
+        projected = self.projected_rss
+        if projected >= self.hard_limit:
+            return HARD
+        if projected >= self.soft_limit:
+            return SOFT
+        return NORMAL
+
+    def _record(self, decision, detail):
+        self._decisions[decision] += 1
+        self._recent.append({'time': int(time.time()), 'decision': decision, 'detail': detail})
+
+    def sample(self):
+        self.children_rss = children_rss_bytes()
+        self.rss = read_rss_bytes() + self.children_rss
+        self.peak_rss = max(self.peak_rss, self.rss)
+        return self.rss
+
+    def _fits(self, estimate, exclude=None):
+        committed = sum(v for k, v in self._jobs.items() if k != exclude)
+        if not committed:
+            # Nothing else to wait for - a lone job is always let through
+            return True
+        if exclude is not None and self._growing >= set(self._jobs) and exclude == min(self._growing):
+            # Every job is blocked growing; let the oldest through instead of deadlocking
+            return True
+        return self.rss + committed + estimate < self.hard_limit
+
+    async def _wait_for(self, estimate, label, exclude=None):
+        async with self._condition:
+            if not self._fits(estimate, exclude):
+                self._record('paused', f"{label}: {estimate} bytes at {self.pressure} pressure")
+                LOGGER.warning(f"🧠 Memory pressure ({self.projected_rss // 1048576} MB projected) - pausing {label}")
+                await self._condition.wait_for(lambda: self._fits(estimate, exclude))
+
+    @asynccontextmanager
+    async def admission(self, estimate, label="job"):
+        """Admit one job once its estimate fits under the hard limit"""
+        await self._wait_for(estimate, label)
+        job_id = next(self._ids)
+        self._jobs[job_id] = estimate
+        self._record('admitted', f"{label}: {estimate} bytes")
+        try:
+            yield MemoryTicket(self, job_id)
+        finally:
+            self._jobs.pop(job_id, None)
+            await self._notify()
+
+    async def _resize(self, job_id, estimate):
+        if estimate > self._jobs.get(job_id, 0):
+            self._growing.add(job_id)
+            try:
+                await self._notify()
+                await self._wait_for(estimate, f"job {job_id} growth", exclude=job_id)
+            finally:
+                self._growing.discard(job_id)
+        self._jobs[job_id] = estimate
+        await self._notify()
+
+    async def _notify(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    def chunk_size(self, preferred):
+        """I/O buffer size to use right now - halved at soft, quartered at hard pressure"""
+        pressure = self.pressure
+        if pressure == NORMAL:
+            return preferred
+        shrunk = max(1024, preferred // (2 if pressure == SOFT else 4))
+        self._record('shrunk_buffers', f"{preferred} -> {shrunk} at {pressure}")
+        return shrunk
+
+    def force_disk_backed(self, size):
+        """True when a payload of `size` bytes must not be held in memory"""
+        if self.rss + self.committed_bytes + size < self.soft_limit:
+            return False
+        self._record('forced_disk', f"{size} bytes at {self.pressure} pressure")
+        return True
+
+    async def sample_task(self, interval=MEMORY_SAMPLE_SECONDS):
+        """Keep the RSS sample fresh and wake paused jobs when memory frees up"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.sample()
+                await self._notify()
+            except Exception as e:
+                LOGGER.error(f"Memory sampling error: {e}")
+
+    def stats(self):
+        mb = 1024 * 1024
+        return {
+            'rss_mb': round(self.rss / mb, 1),
+            'children_rss_mb': round(self.children_rss / mb, 1),
+            'peak_rss_mb': round(self.peak_rss / mb, 1),
+            'committed_mb': round(self.committed_bytes / mb, 1),
+            'ceiling_mb': round(self.ceiling / mb, 1),
+            'pressure': self.pressure,
+            'active_jobs': len(self._jobs),
+            'decisions': dict(self._decisions),
+            'recent_decisions': list(self._recent),
+        }
+
+
+# Global memory governor instance
+memory_governor = MemoryGovernor(
+    MEMORY_CEILING_MB * 1024 * 1024,
+    soft_ratio=MEMORY_SOFT_RATIO,
+    hard_ratio=MEMORY_HARD_RATIO,
+)
@@ -0,0 +1,60 @@
+"""
+Metrics Registry - collects runtime stats for the /metrics health endpoint
+Subsystems register a zero-argument callable returning a JSON-safe dict
+"""
+
+import time
+from collections import deque
+from config import LOGGER
+
+_sources = {}
+
+
+class LatencyStats:
+    """Rolling windows of durations per named milestone, as percentiles"""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._series = {}  # name -> deque of seconds
+        self._counts = {}
+
+    def record(self, name, seconds):
+        self._series.setdefault(name, deque(maxlen=self.window)).append(seconds)
+        self._counts[name] = self._counts.get(name, 0) + 1
+
+    def stats(self):
+        report = {}
+        for name, samples in self._series.items():
+            ordered = sorted(samples)
+            report[name] = {
+                'count': self._counts[name],
+                'p50_seconds': round(ordered[len(ordered) // 2], 3),
+                'p90_seconds': round(ordered[max(int(len(ordered) * 0.9) - 1, 0)], 3),
+                'max_seconds': round(ordered[-1], 3),
+            }
+        return report
+
+
+# User-facing latency (e.g. time to the first useful status message)
+request_latency = LatencyStats()
+
+
+def register_metrics_source(name, func):
+    """Expose `func()` under `name` in the /metrics response"""
+    _sources[name] = func
+
+
+def unregister_metrics_source(name):
+    _sources.pop(name, None)
+
+
+def collect_metrics():
+    """Snapshot every registered source; a failing source never breaks the endpoint"""
+    snapshot = {"timestamp": int(time.time())}
+    for name, func in list(_sources.items()):
+        try:
+            snapshot[name] = func()
+        except Exception as e:
+            LOGGER.warning(f"Metrics source {name} failed: {e}")
+            snapshot[name] = {"error": str(e)}
+    return snapshot
@@ -0,0 +1,128 @@
+"""
+Pre-flight Probe - exact size, range support and real content type up front
+One ranged GET for the first few KiB of the file answers all of it: the
+Content-Range total is the exact size, a 206 means the server can resume,
+and the magic number says what the file really is, whatever its name.
+"""
+
+import os
+from config import LOGGER, PREFLIGHT_TIMEOUT
+from bot.utils.http_client import http_client
+from bot.utils.integrity import parse_content_range
+from bot.utils.image_stage import IMAGE_EXTENSIONS, PHOTO, DOCUMENT
+
+SNIFF_BYTES = 4096
+
+VIDEO = 'video'
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.webm', '.m4v', '.3gp', '.flv', '.mpg')
+
+# (offset, magic, extension, kind) - checked in order
+SIGNATURES = (
+    (0, b'\xff\xd8\xff', '.jpg', PHOTO),
+    (0, b'\x89PNG\r\n\x1a\n', '.png', PHOTO),
+    (0, b'GIF87a', '.gif', PHOTO),
+    (0, b'GIF89a', '.gif', PHOTO),
+    (0, b'BM', '.bmp', PHOTO),
+    (0, b'FLV\x01', '.flv', VIDEO),
+    (0, b'\x30\x26\xb2\x75\x8e\x66\xcf\x11', '.wmv', VIDEO),
+    (0, b'\x00\x00\x01\xba', '.mpg', VIDEO),
+    (0, b'%PDF-', '.pdf', DOCUMENT),
+    (0, b'PK\x03\x04', '.zip', DOCUMENT),
+    (0, b'Rar!\x1a\x07', '.rar', DOCUMENT),
+    (0, b"7z\xbc\xaf\x27\x1c", '.7z', DOCUMENT),
+    (0, b'\x1f\x8b', '.gz', DOCUMENT),
+    (0, b'ID3', '.mp3', DOCUMENT),
+    (0, b'fLaC', '.flac', DOCUMENT),
+    (0, b'OggS', '.ogg', DOCUMENT),
+    (0, b'MZ', '.exe', DOCUMENT),
+)
+
+# ISO base media brands (bytes 8-12 after 'ftyp') that aren't plain MP4 video
+FTYP_BRANDS = {
+    b'qt  ': ('.mov', VIDEO),
+    b'3gp4': ('.3gp', VIDEO),
+    b'3gp5': ('.3gp', VIDEO),
+    b'3g2a': ('.3gp', VIDEO),
+    b'M4A ': ('.m4a', DOCUMENT),
+    b'heic': ('.heic', DOCUMENT),  # sendPhoto doesn't take HEIC
+    b'mif1': ('.heic', DOCUMENT),
+    b'avif': ('.avif', DOCUMENT),
+}
+
+preflight_stats = {
+    'probes': 0,
+    'failed': 0,
+    'no_ranges': 0,
+    'size_corrected': 0,
+    'renamed': 0,
+    'rejected': 0,
+}
+
+
+def sniff(head):
+    """(extension, kind) from the file's first bytes, or None if unknown"""
+    if len(head) >= 12 and head[4:8] == b'ftyp':
+        return FTYP_BRANDS.get(head[8:12], ('.mp4', VIDEO))
+    if head.startswith(b'\x1a\x45\xdf\xa3'):  # EBML: Matroska or WebM
+        return ('.webm', VIDEO) if b'webm' in head[:64] else ('.mkv', VIDEO)
+    if head.startswith(b'RIFF') and len(head) >= 12:
+        return {b'AVI ': ('.avi', VIDEO), b'WEBP': ('.webp', PHOTO), b'WAVE': ('.wav', DOCUMENT)}.get(head[8:12])
+    for offset, magic, extension, kind in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return extension, kind
+    return None
+
+
+def kind_of_name(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in VIDEO_EXTENSIONS:
+        return VIDEO
+    if extension in IMAGE_EXTENSIONS:
+        return PHOTO
+    return DOCUMENT
+
+
+def _kind_of_mime(content_type):
+    major = content_type.split('/', 1)[0]
+    return {'video': VIDEO, 'image': PHOTO}.get(major)
+
+
+async def probe(url, headers):
+    """Ask the server about `url` without downloading it.
+
+    Returns {'size', 'ranges', 'content_type', 'extension', 'kind'} (size and
+    extension may be None), or None when the probe itself failed.
+    """
+    preflight_stats['probes'] += 1
+    try:
+        async with http_client.session().get(
+            url, headers={**headers, 'Range': f"bytes=0-{SNIFF_BYTES - 1}"},
+            timeout=http_client.timeout(total=PREFLIGHT_TIMEOUT), allow_redirects=True
+        ) as response:
+            if response.status not in (200, 206):
+                raise ValueError(f"HTTP {response.status}")
+            content_range = parse_content_range(response.headers.get('content-range'))
+            ranges = response.status == 206 and content_range is not None
+            if ranges:
+                size = content_range[1]
+            else:
+                size = int(response.headers.get('content-length', 0)) or None
+            content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+            head = await response.content.read(SNIFF_BYTES)
+            if not ranges:
+                response.close()  # Server sent the whole file: don't drain it
+    except Exception as e:
+        preflight_stats['failed'] += 1
+        LOGGER.warning(f"🛰️ Pre-flight probe failed: {e}")
+        return None
+
+    if not ranges:
+        preflight_stats['no_ranges'] += 1
+    sniffed = sniff(head)
+    return {
+        'size': size,
+        'ranges': ranges,
+        'content_type': content_type,
+        'extension': sniffed[0] if sniffed else None,
+        'kind': sniffed[1] if sniffed else _kind_of_mime(content_type),
+    }
@@ -0,0 +1,210 @@
+"""
+Quota Engine - per-user token buckets for downloads and bytes
+Each user's buckets are three fixed-width columns of the user state table
+(download tokens, byte tokens, last update), refilled lazily when read, so
+a check is O(1) and no timer runs per user. Buckets that have refilled
+completely are marked full again during compaction. In split mode the
+front process takes download tokens and the workers take byte tokens and
+refund, so the buckets live in the job journal's SQLite database instead,
+where every process reads and updates them in one transaction.
+"""
+
+import time
+from contextlib import contextmanager, nullcontext
+from typing import NamedTuple
+from config import OWNER_ID, FREE_DOWNLOAD_LIMIT, QUOTA_WINDOW_HOURS, QUOTA_BYTES_MB, BOT_MODE
+from bot.utils.user_state import user_state
+from bot.utils.job_journal import job_journal
+
+DOWNLOADS = 'downloads'
+BYTES = 'bytes'
+
+
+class QuotaDecision(NamedTuple):
+    allowed: bool
+    reason: str = None         # DOWNLOADS or BYTES when refused
+    retry_after: float = 0.0   # Seconds until enough has refilled
+
+
+class TableBuckets:
+    """Buckets in the user state table's columns (one process)"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def load(self, user_id):
+        """(download tokens, byte tokens, stamp), or None when never used"""
+        row = self.table.row(user_id)
+        if row is None:
+            return None
+        columns = self.table.columns
+        return columns['quota_downloads'][row], columns['quota_bytes'][row], columns['quota_stamp'][row]
+
+    def store(self, user_id, downloads, nbytes, stamp):
+        self.table.set(user_id, quota_downloads=downloads, quota_bytes=nbytes, quota_stamp=stamp)
+
+    def clear(self, user_id):
+        if user_id in self.table:
+            self.table.set(user_id, quota_stamp=0)  # Full buckets
+
+    def transaction(self):
+        return nullcontext()
+
+    def compact(self, engine, now):
+        """Mark buckets that have refilled completely as full"""
+        columns = self.table.columns
+        compacted = 0
+        for row, stamp in enumerate(columns['quota_stamp']):
+            if not stamp:
+                continue
+            state = columns['quota_downloads'][row], columns['quota_bytes'][row], stamp
+            downloads, nbytes = engine._refilled(state, now)
+            if downloads >= engine.download_limit and nbytes >= engine.byte_limit:
+                columns['quota_stamp'][row] = 0
+                compacted += 1
+        return compacted
+
+
+class JournalBuckets:
+    """Buckets in the job journal's database, shared by the front process and the workers"""
+
+    def __init__(self, journal):
+        self.journal = journal
+
+    def load(self, user_id):
+        return self.journal.quota_buckets(user_id)
+
+    def store(self, user_id, downloads, nbytes, stamp):
+        self.journal.store_quota_buckets(user_id, downloads, nbytes, stamp)
+
+    def clear(self, user_id):
+        self.journal.clear_quota_buckets(user_id)
+
+    def transaction(self):
+        return self.journal.transaction()
+
+    def compact(self, engine, now):
+        # A whole window after the last take every bucket has refilled
+        return self.journal.clear_quota_buckets(before=now - engine.window)
+
+
+class QuotaEngine:
+    def __init__(self, download_limit, byte_limit, window_seconds, table, exempt=(), buckets=None):
+        self.download_limit = download_limit
+        self.byte_limit = byte_limit  # 0 = no byte quota
+        self.window = window_seconds
+        self.buckets = buckets or TableBuckets(table)
+        self.exempt = set(exempt)
+        self._stats = {'taken': 0, 'refused': 0, 'refunded': 0, 'compacted': 0}
+        table.add_compactor(self.compact)
+
+    def _refilled(self, state, now):
+        if state is None or not state[2]:
+            return float(self.download_limit), float(self.byte_limit)
+        downloads, nbytes, stamp = state
+        refill = max(now - stamp, 0) / self.window
+        return (
+            min(self.download_limit, downloads + refill * self.download_limit),
+            min(self.byte_limit, nbytes + refill * self.byte_limit),
+        )
+
+    def _load(self, user_id, now):
+        """Current (download tokens, byte tokens) after the lazy refill"""
+        return self._refilled(self.buckets.load(user_id), now)
+
+    def _store(self, user_id, downloads, nbytes, now):
+        if downloads >= self.download_limit and nbytes >= self.byte_limit:
+            self.buckets.clear(user_id)
+        else:
+            self.buckets.store(user_id, downloads, nbytes, int(now))
+
+    def _wait(self, missing, limit):
+        return missing / limit * self.window if limit else float('inf')
+
+    def take(self, user_id, downloads=0, nbytes=0, verified=False):
+        """Take tokens if every bucket has enough; all or nothing.
+
+        Verified users skip the download bucket (their downloads are still
+        counted); the byte bucket applies to everyone but exempt users.
+        """
+        if user_id in self.exempt:
+            return QuotaDecision(True)
+        now = time.time()
+        with self.buckets.transaction():
+            have_downloads, have_bytes = self._load(user_id, now)
+            if downloads and not verified and have_downloads < downloads:
+                self._stats['refused'] += 1
+                return QuotaDecision(False, DOWNLOADS, self._wait(downloads - have_downloads, self.download_limit))
+            if nbytes and self.byte_limit and have_bytes < nbytes:
+                self._stats['refused'] += 1
+                return QuotaDecision(False, BYTES, self._wait(nbytes - have_bytes, self.byte_limit))
+            self._store(
+                user_id,
+                max(have_downloads - downloads, 0),
+                max(have_bytes - nbytes, 0) if self.byte_limit else 0,
+                now
+            )
+        self._stats['taken'] += 1
+        return QuotaDecision(True)
+
+    def refund(self, user_id, downloads=0, nbytes=0):
+        """Give back tokens for work that didn't deliver anything"""
+        if user_id in self.exempt:
+            return
+        now = time.time()
+        with self.buckets.transaction():
+            state = self.buckets.load(user_id)
+            if state is None or not state[2]:
+                return  # Buckets already full
+            have_downloads, have_bytes = self._refilled(state, now)
+            self._store(
+                user_id,
+                min(have_downloads + downloads, self.download_limit),
+                min(have_bytes + nbytes, self.byte_limit),
+                now
+            )
+        self._stats['refunded'] += 1
+
+    @contextmanager
+    def refund_on_error(self, user_id, downloads=0, nbytes=0):
+        """Refund what was taken if the block fails or is cancelled"""
+        try:
+            yield
+        except BaseException:
+            self.refund(user_id, downloads, nbytes)
+            raise
+
+    def usage(self, user_id):
+        """What the user has used of each bucket right now"""
+        have_downloads, have_bytes = self._load(user_id, time.time())
+        return {
+            'downloads_used': round(self.download_limit - have_downloads),
+            'downloads_limit': self.download_limit,
+            'bytes_used': round(self.byte_limit - have_bytes),
+            'bytes_limit': self.byte_limit,
+        }
+
+    def compact(self, now):
+        """Mark buckets that have refilled completely as full"""
+        compacted = self.buckets.compact(self, now)
+        self._stats['compacted'] += compacted
+        return compacted
+
+    def stats(self):
+        return {
+            'download_limit': self.download_limit,
+            'byte_limit': self.byte_limit,
+            'window_seconds': self.window,
+            **self._stats,
+        }
+
+
+# Global quota engine instance
+quota_engine = QuotaEngine(
+    FREE_DOWNLOAD_LIMIT,
+    QUOTA_BYTES_MB * 1024 * 1024,
+    window_seconds=QUOTA_WINDOW_HOURS * 3600,
+    table=user_state,
+    exempt=[OWNER_ID] if OWNER_ID else [],
+    buckets=JournalBuckets(job_journal) if BOT_MODE != 'all' else None,
+)
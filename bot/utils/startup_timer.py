@@ -0,0 +1,25 @@
+"""
+Startup Timer - cold start milestones measured from process start
+"""
+
+import time
+from bot import bot_start_time
+from config import LOGGER
+
+
+class StartupTimer:
+    def __init__(self, started_at):
+        self.started_at = started_at
+        self.milestones = {}  # name -> seconds since start
+
+    def mark(self, name):
+        if name not in self.milestones:
+            self.milestones[name] = round(time.time() - self.started_at, 3)
+            LOGGER.info(f"⏱️ Startup milestone '{name}' after {self.milestones[name]}s")
+
+    def stats(self):
+        return {'started_at': int(self.started_at), **self.milestones}
+
+
+# Global startup timer, anchored at the moment the bot package was imported
+startup_timer = StartupTimer(bot_start_time)
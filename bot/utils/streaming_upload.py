@@ -0,0 +1,124 @@
+"""
+Streaming Upload - Bot API multipart uploads straight from disk
+python-telegram-bot's InputFile reads the whole file into memory before
+sending it. This path posts to the Bot API over the shared aiohttp pool
+and reads the file part in fixed-size chunks as the socket drains, so an
+upload holds about one chunk in memory whatever the file size.
+"""
+
+import json
+import os
+import time
+from config import LOGGER, UPLOAD_CHUNK_KB, UPLOAD_READ_TIMEOUT
+from bot.utils.cpu_executor import cpu_executor
+from bot.utils.http_client import http_client
+
+upload_stats = {
+    'uploads': 0,
+    'failed': 0,
+    'bytes': 0,
+    'seconds': 0.0,
+    'chunk_bytes': UPLOAD_CHUNK_KB * 1024,
+}
+
+
+def _read_chunk(fd, size, offset):
+    return os.pread(fd, size, offset)
+
+
+def _file_payload(path, filename, chunk_size):
+    """A multipart part whose body is read from `path` one chunk at a time"""
+    from aiohttp.payload import Payload
+
+    class FilePayload(Payload):
+        def __init__(self):
+            super().__init__(path, content_type='application/octet-stream', filename=filename)
+            self._size = os.path.getsize(path)  # Known length: no chunked transfer encoding
+
+        async def write(self, writer):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                offset = 0
+                while offset < self._size:
+                    # pread in the thread lane: a slow disk never blocks the event loop
+                    chunk = await cpu_executor.run_blocking('upload_read', _read_chunk, fd, chunk_size, offset)
+                    if not chunk:
+                        break
+                    offset += len(chunk)
+                    # StreamWriter.write drains once its buffer passes 64 KiB,
+                    # so chunks are only read as fast as the socket takes them
+                    await writer.write(chunk)
+            finally:
+                os.close(fd)
+
+        def decode(self, encoding='utf-8', errors='strict'):
+            raise TypeError("A streamed file part can't be decoded")
+
+    return FilePayload()
+
+
+def _form_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def _raise_for_result(data, status):
+    from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+    description = data.get('description') or f"HTTP {status}"
+    parameters = data.get('parameters') or {}
+    if parameters.get('retry_after'):
+        raise RetryAfter(parameters['retry_after'])
+    if status == 403:
+        raise Forbidden(description)
+    if status == 400:
+        raise BadRequest(description)
+    raise TelegramError(description)
+
+
+async def send_file(bot, method, field, path, filename, thumbnail=None, **params):
+    """Call a Bot API send method (sendVideo, sendDocument, sendPhoto) with
+    the file at `path` streamed as the `field` part. Returns the sent Message.
+
+    `params` are the method's other parameters (chat_id, caption, ...);
+    None values are left out. Errors raise the usual telegram.error types.
+    """
+    import aiohttp
+    from telegram import Message
+
+    chunk_size = UPLOAD_CHUNK_KB * 1024
+    with aiohttp.MultipartWriter('form-data') as form:
+        for name, value in params.items():
+            if value is not None:
+                form.append(_form_value(value)).set_content_disposition('form-data', name=name)
+        part = form.append_payload(_file_payload(path, filename, chunk_size))
+        part.set_content_disposition('form-data', name=field, filename=filename)
+        if thumbnail:
+            part = form.append_payload(_file_payload(thumbnail, os.path.basename(thumbnail), chunk_size))
+            part.set_content_disposition('form-data', name='thumbnail', filename=os.path.basename(thumbnail))
+
+    size = os.path.getsize(path)
+    started = time.monotonic()
+    try:
+        # No total timeout: a large upload on a slow link is still progress;
+        # the read timeout covers Telegram taking too long to answer
+        async with http_client.session().post(
+            f"{bot.base_url}/{method}", data=form,
+            timeout=http_client.timeout(sock_read=UPLOAD_READ_TIMEOUT)
+        ) as response:
+            data = await response.json(content_type=None)
+            if not data.get('ok'):
+                _raise_for_result(data, response.status)
+    except BaseException:
+        upload_stats['failed'] += 1
+        raise
+
+    elapsed = time.monotonic() - started
+    upload_stats['uploads'] += 1
+    upload_stats['bytes'] += size
+    upload_stats['seconds'] += elapsed
+    LOGGER.info(f"📤 Streamed {filename} ({size} bytes) via {method} in {elapsed:.1f}s")
+    return Message.de_json(data['result'], bot)
@@ -3,9 +3,10 @@ Terabox URL processor - FIXED FOR ACTUAL API RESPONSE
 Uses: https://wdzone-terabox-api.vercel.app/api
 """
 
-import requests
+import logging
 from urllib.parse import quote
 from config import LOGGER
+from bot.utils.log_utils import truncate_payload
 
 def speed_string_to_bytes(size_str):
     """Convert size string to bytes (exactly like anasty17)"""
@@ -30,7 +31,6 @@ def extract_terabox_info(url):
     Extract file info using wdzone-terabox-api - FIXED FOR ACTUAL RESPONSE
     """
     try:
-        print(f"🔍 Processing URL: {url}")
         LOGGER.info(f"Processing URL: {url}")
         
         # If it's already a direct file URL, return it
@@ -44,18 +44,18 @@ def extract_terabox_info(url):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:122.0) Gecko/20100101 Firefox/122.0'
         }
         
-        print(f"🌐 API URL: {apiurl}")
-        LOGGER.info(f"Making API request to: {apiurl}")
+        LOGGER.debug(f"Making API request to: {apiurl}")
         
         # Make API request
+        import requests  # Loaded on first use to keep cold start fast
         response = requests.get(apiurl, headers=headers, timeout=30)
         
         if response.status_code != 200:
             raise Exception(f"API request failed with status: {response.status_code}")
         
         req = response.json()
-        print(f"📄 API Response: {req}")
-        LOGGER.info(f"API response: {req}")
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug("API response: %s", truncate_payload(req))
         
         # Check for successful response (FIXED FOR ACTUAL API)
         if "✅ Status" in req and req["✅ Status"] == "Success":
@@ -93,13 +93,11 @@ def extract_terabox_info(url):
             'type': 'file'
         }
         
-        print(f"✅ File info extracted: {result}")
-        LOGGER.info(f"File extracted: {result}")
+        LOGGER.info(f"File extracted: {filename} ({size_str})")
         
         return result
         
     except Exception as e:
-        print(f"❌ Terabox extraction error: {e}")
         LOGGER.error(f"Terabox extraction error: {e}")
         raise Exception(f"Failed to process Terabox link: {str(e)}")
 
@@ -0,0 +1,218 @@
+"""
+Native Terabox Share Resolver - talks to Terabox directly
+Share page -> jsToken -> share/list (folders included) -> dlink redirect,
+skipping the third-party extractor hop. Selectable as the 'native' backend.
+"""
+
+import re
+import json
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+from config import LOGGER, TERABOX_COOKIE, TERABOX_HOST
+from bot.utils.extractor_registry import ExtractorBackend, ShareLinkError, make_file_info
+from bot.utils.http_client import http_client
+from bot.utils.log_utils import truncate_payload
+from bot.utils.url_classifier import classify_url
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "terabox"
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+# jsToken is embedded in the share page as fn("TOKEN"), URL-encoded
+_JS_TOKEN_RE = re.compile(r'fn%28%22(?P<token>[A-Za-z0-9]+)%22%29')
+_LOGID_RE = re.compile(r'dp-logid=(?P<logid>\d+)')
+
+# share/list errnos that mean the share itself is unusable
+SHARE_ERRNOS = {
+    -9: "File not found or removed",
+    105: "Share link has expired",
+    -70: "Share link is password protected",
+    2131: "Share link was cancelled by its owner",
+}
+
+LIST_PAGE_SIZE = 100
+
+
+class FolderShareError(ShareLinkError):
+    """The share is a folder (or several files) - walk it instead of taking one file"""
+
+
+class TeraboxShare:
+    """Tokens obtained from one share page, reused for every list call"""
+
+    def __init__(self, surl, js_token, logid):
+        self.surl = surl
+        self.js_token = js_token
+        self.logid = logid
+
+
+class AiohttpTransport:
+    """Live transport on the shared keep-alive pool (see bot.utils.http_client)"""
+
+    def __init__(self, cookie=TERABOX_COOKIE):
+        self.headers = {'User-Agent': USER_AGENT, 'Cookie': cookie}
+        self.request_timeout = http_client.timeout(total=30, connect=10)
+
+    def _request(self, method, url, **kwargs):
+        return http_client.session().request(
+            method, url, headers=self.headers, timeout=self.request_timeout, **kwargs
+        )
+
+    async def get_text(self, url, params=None):
+        async with self._request('GET', url, params=params) as response:
+            return str(response.url), await response.text()
+
+    async def get_json(self, url, params=None):
+        async with self._request('GET', url, params=params) as response:
+            return await response.json(content_type=None)
+
+    async def get_redirect(self, url):
+        async with self._request('HEAD', url, allow_redirects=False) as response:
+            return response.headers.get('Location', url)
+
+    async def close(self):
+        pass  # The shared pool is closed once, on application shutdown
+
+
+class FixtureTransport:
+    """Offline transport replaying recorded Terabox responses from FIXTURES_DIR.
+
+    share_page.html is served for every share page; share/list responses are
+    looked up as share_list_<dir>.json (root for the share root, otherwise
+    the directory path with '/' replaced by '_').
+    """
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR):
+        self.fixtures_dir = Path(fixtures_dir)
+
+    async def get_text(self, url, params=None):
+        surl = (params or {}).get('surl') or parse_qs(urlsplit(url).query).get('surl', [''])[0]
+        html = (self.fixtures_dir / "share_page.html").read_text(encoding='utf-8')
+        return f"https://{TERABOX_HOST}/sharing/link?surl={surl}&dp-logid=1000000000", html
+
+    async def get_json(self, url, params=None):
+        directory = (params or {}).get('dir')
+        name = 'root' if not directory else directory.strip('/').replace('/', '_')
+        page = int((params or {}).get('page', 1))
+        suffix = '' if page == 1 else f"_page{page}"
+        path = self.fixtures_dir / f"share_list_{name}{suffix}.json"
+        if not path.exists():
+            return {'errno': 0, 'list': []}
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    async def get_redirect(self, url):
+        redirects = json.loads((self.fixtures_dir / "dlink_redirects.json").read_text(encoding='utf-8'))
+        return redirects.get(url, url)
+
+    async def close(self):
+        pass
+
+
+def normalize_entry(item):
+    """One share/list item in the shape the rest of the bot uses"""
+    return {
+        'filename': item.get('server_filename', 'Unknown'),
+        'size': int(item.get('size', 0) or 0),
+        'path': item.get('path', ''),
+        'is_dir': str(item.get('isdir', 0)) == '1',
+        'fs_id': item.get('fs_id'),
+        'md5': item.get('md5', ''),
+        'dlink': item.get('dlink', ''),
+        'category': int(item.get('category', 0) or 0),
+    }
+
+
+class TeraboxResolver:
+    def __init__(self, transport=None, host=TERABOX_HOST):
+        self.transport = transport or AiohttpTransport()
+        self.host = host
+
+    async def open_share(self, surl):
+        """Fetch the share page once and pull out the tokens list calls need"""
+        final_url, html = await self.transport.get_text(
+            f"https://{self.host}/sharing/link", params={'surl': surl}
+        )
+        token = _JS_TOKEN_RE.search(html)
+        if not token:
+            raise Exception("jsToken not found on share page (cookie missing or expired?)")
+
+        # Terabox may redirect to a canonical surl; trust the final URL
+        final_surl = parse_qs(urlsplit(final_url).query).get('surl', [surl])[0]
+        logid = _LOGID_RE.search(final_url)
+        return TeraboxShare(final_surl, token.group('token'), logid.group('logid') if logid else '')
+
+    async def list_dir(self, share, path=None, page=1, num=LIST_PAGE_SIZE):
+        """List one page of a directory; returns (entries, has_more)"""
+        params = {
+            'app_id': '250528', 'web': '1', 'channel': 'dubox', 'clienttype': '0',
+            'jsToken': share.js_token, 'dp-logid': share.logid,
+            'page': str(page), 'num': str(num), 'by': 'name', 'order': 'asc',
+            'shorturl': share.surl,
+        }
+        if path:
+            params['dir'] = path
+        else:
+            params['root'] = '1'
+
+        data = await self.transport.get_json(f"https://{self.host}/share/list", params=params)
+        errno = data.get('errno', -1)
+        if errno in SHARE_ERRNOS:
+            raise ShareLinkError(SHARE_ERRNOS[errno])
+        if errno != 0:
+            raise Exception(f"share/list failed: errno {errno} {truncate_payload(data, 120)}")
+
+        items = data.get('list', [])
+        return [normalize_entry(item) for item in items], len(items) >= num
+
+    async def resolve_dlink(self, dlink):
+        """Follow the dlink's redirect to the CDN URL the downloader can fetch without cookies"""
+        return await self.transport.get_redirect(dlink)
+
+    async def resolve(self, url):
+        """Resolve a share URL to the file info of its first file"""
+        link = classify_url(url)
+        if not link:
+            raise ShareLinkError("Not a Terabox share link")
+
+        share = await self.open_share(link.surl)
+        entries, _ = await self.list_dir(share)
+        files = [entry for entry in entries if not entry['is_dir']]
+        if not files:
+            if entries:
+                raise FolderShareError("Share contains only folders")
+            raise ShareLinkError("No files found")
+
+        first = files[0]
+        download_url = await self.resolve_dlink(first['dlink'])
+        LOGGER.debug(f"Native resolver: {link.surl} -> {first['filename']} ({len(entries)} entries)")
+        return make_file_info(
+            first['filename'], first['size'], download_url, NativeBackend.name,
+            md5=first['md5'], fs_id=first['fs_id'], share_entries=len(entries),
+        )
+
+    async def close(self):
+        await self.transport.close()
+
+
+class NativeBackend(ExtractorBackend):
+    """First-party resolver as an extractor backend"""
+    name = 'native'
+
+    def __init__(self, transport=None):
+        self.resolver = TeraboxResolver(transport)
+
+    async def extract(self, url):
+        return await self.resolver.resolve(url)
+
+
+_resolver = None
+
+def get_native_resolver():
+    """The resolver behind the registered 'native' backend, or a standalone one"""
+    global _resolver
+    from bot.utils.extractor_registry import extractor_registry
+    if 'native' in extractor_registry.backends:
+        return extractor_registry.backend('native').resolver
+    if _resolver is None:
+        _resolver = TeraboxResolver()
+    return _resolver
@@ -6,22 +6,21 @@ Based on TechVJ Tutorial with flexible time settings
 import string
 import secrets
 import time
-import requests
 import asyncio
 from datetime import datetime, timedelta
+from bot.utils.http_client import http_client
+from bot.utils.user_state import user_state
 from config import (
     SHORTLINK_API, SHORTLINK_URL, VERIFY_TUTORIAL, BOT_USERNAME, LOGGER,
     VERIFICATION_VALIDITY_SECONDS, VALIDITY_TIME_TEXT,
     AUTO_CLEANUP_INTERVAL_HOURS, TOKEN_CLEANUP_ENABLED
 )
 
-# In-memory storage (replace with your database if needed)
+# In-memory storage (replace with your database if needed);
+# per-user state lives in the compact user state table
 verification_tokens = {}
-verified_users = set()
-user_download_counts = {}
-user_verification_times = {}  # Track when users were verified
 
-def generate_verification_link(user_id):
+async def generate_verification_link(user_id):
     """Generate VJ-style verification link with configurable validity"""
     try:
         # Generate random token (10 characters)
@@ -39,7 +38,7 @@ def generate_verification_link(user_id):
         verify_url = f"https://telegram.me/{BOT_USERNAME}?start=verify_{token}"
         
         # Create short link using your API
-        short_link = create_short_link(verify_url)
+        short_link = await create_short_link(verify_url)
         
         LOGGER.info(f"Generated verification link for user {user_id} (valid for {VALIDITY_TIME_TEXT})")
         return short_link
@@ -48,26 +47,27 @@ def generate_verification_link(user_id):
         LOGGER.error(f"Error generating verification link: {e}")
         return None
 
-def create_verification_link(user_id):
+async def create_verification_link(user_id):
     """Alternative function name for compatibility"""
-    return generate_verification_link(user_id)
+    return await generate_verification_link(user_id)
 
-def create_short_link(url):
+async def create_short_link(url):
     """Create shortlink using your configured API"""
     try:
         if not SHORTLINK_API or not SHORTLINK_URL:
             return url
         
         # Different APIs have different formats - adjust as needed
-        api_url = f"{SHORTLINK_URL}/api?api={SHORTLINK_API}&url={url}"
+        api_url = f"{SHORTLINK_URL}/api"
         
-        response = requests.get(api_url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            # Handle different API response formats
-            return data.get('shortenedUrl', data.get('shortlink', data.get('short_link', url)))
-        else:
-            return url
+        async with http_client.session().get(
+            api_url, params={'api': SHORTLINK_API, 'url': url}, timeout=http_client.timeout(total=10)
+        ) as response:
+            if response.status != 200:
+                return url
+            data = await response.json(content_type=None)
+        # Handle different API response formats
+        return data.get('shortenedUrl', data.get('shortlink', data.get('short_link', url)))
             
     except Exception as e:
         LOGGER.error(f"Shortlink API error: {e}")
@@ -88,8 +88,8 @@ def verify_user_token(token):
         
         # Mark user as verified with timestamp
         user_id = token_data['user_id']
-        verified_users.add(user_id)
-        user_verification_times[user_id] = time.time()
+        now = time.time()
+        user_state.set(user_id, verified_until=int(now + VERIFICATION_VALIDITY_SECONDS), last_seen=int(now))
         
         # Remove used token
         del verification_tokens[token]
@@ -102,8 +102,8 @@ def verify_user_token(token):
         return False, None
 
 def check_verification(user_id):
-    """Check if user is verified"""
-    return user_id in verified_users
+    """Check if user is verified (and the verification hasn't run out)"""
+    return user_state.get(user_id, 'verified_until') > time.time()
 
 def is_user_verified(user_id):
     """Alternative function name"""
@@ -111,13 +111,12 @@ def is_user_verified(user_id):
 
 def get_user_verification_time(user_id):
     """Get when user was verified"""
-    if user_id in user_verification_times:
-        return user_verification_times[user_id]
-    return None
+    verified_until = user_state.get(user_id, 'verified_until')
+    return verified_until - VERIFICATION_VALIDITY_SECONDS if verified_until else None
 
 def get_verification_info(user_id):
     """Get detailed verification info for user"""
-    if user_id not in verified_users:
+    if not check_verification(user_id):
         return {
             'verified': False,
             'verification_time': None,
@@ -125,7 +124,7 @@ def get_verification_info(user_id):
             'validity_remaining': None
         }
     
-    verification_time = user_verification_times.get(user_id)
+    verification_time = get_user_verification_time(user_id)
     if verification_time:
         time_since = time.time() - verification_time
         return {
@@ -142,15 +141,6 @@ def get_verification_info(user_id):
         'validity_text': VALIDITY_TIME_TEXT
     }
 
-def get_user_download_count(user_id):
-    """Get user download count"""
-    return user_download_counts.get(user_id, 0)
-
-def increment_user_downloads(user_id):
-    """Increment user download count"""
-    user_download_counts[user_id] = user_download_counts.get(user_id, 0) + 1
-    LOGGER.info(f"User {user_id} download count: {user_download_counts[user_id]}")
-
 def get_token():
     """Callback data for verification button"""
     return "start_verification"
@@ -182,7 +172,8 @@ def cleanup_expired_tokens():
 def get_verification_stats():
     """Get comprehensive verification statistics"""
     active_tokens = get_active_tokens_count()
-    total_verified = len(verified_users)
+    now = time.time()
+    total_verified = sum(1 for until in user_state.columns['verified_until'] if until > now)
     
     return {
         'active_tokens': active_tokens,
@@ -0,0 +1,111 @@
+"""
+Terabox URL Classifier - single precompiled matcher shared by all handlers
+Extracts share links from free text and canonicalizes them to a stable key
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple
+from urllib.parse import urlsplit, parse_qs
+
+# Every host Terabox serves share pages from (mirrors and regional aliases)
+TERABOX_DOMAINS = (
+    'terabox.com', 'terabox.app', 'terabox.fun', 'teraboxapp.com',
+    'teraboxlink.com', 'teraboxurl.com', 'teraboxshare.com', 'terasharelink.com',
+    'terafileshare.com', 'freeterabox.com', '1024tera.com', '1024terabox.com',
+    'nephobox.com', 'mirrobox.com', 'momerybox.com', '4funbox.com', '4funbox.co',
+    'tibibox.com', 'gibibox.com',
+)
+
+CANONICAL_HOST = 'www.terabox.com'
+
+# Longest domains first so 'teraboxapp.com' never matches as 'terabox.app'
+_DOMAIN_ALTERNATION = '|'.join(
+    re.escape(domain) for domain in sorted(TERABOX_DOMAINS, key=len, reverse=True)
+)
+
+_LINK_RE = re.compile(
+    r'(?<![a-z0-9.-])(?:https?://)?(?:[a-z0-9-]+\.)*(?P<domain>' + _DOMAIN_ALTERNATION + r')'
+    r'(?P<rest>/[^\s<>"\'\]\)]*)?',
+    re.IGNORECASE,
+)
+
+# /s/1AbCd, /wap/share/filelist?surl=AbCd, /sharing/link?surl=AbCd
+_SHARE_PATH_RE = re.compile(r'/s/(?P<id>[A-Za-z0-9_-]+)')
+_SURL_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class ShareLink(NamedTuple):
+    """Canonical form of one Terabox share link"""
+    surl: str       # share id as used by the `surl` query key
+    share_id: str   # /s/ path id as sent (surl= links get the leading '1')
+    url: str        # canonical https://www.terabox.com/s/<id as sent>
+    domain: str     # domain the user actually sent
+    original: str   # raw text that matched
+
+    @property
+    def cache_key(self):
+        """Stable key for caching/deduplication, independent of domain alias.
+        Keyed on the id as sent: /s/Abc and /s/1Abc both strip to surl 'Abc'
+        but are not guaranteed to be the same share."""
+        return f"terabox:{self.share_id}"
+
+
+def _ids_from(rest):
+    """Pull (surl, /s/ path id) out of the path/query of a matched link"""
+    if not rest:
+        return None, None
+
+    parts = urlsplit(rest)
+    match = _SHARE_PATH_RE.search(parts.path)
+    if match:
+        share_id = match.group('id')
+        # /s/ ids carry a leading '1' that the surl key drops; the URL keeps the id as sent
+        surl = share_id[1:] if share_id.startswith('1') and len(share_id) > 1 else share_id
+        return surl, share_id
+
+    surl = parse_qs(parts.query).get('surl')
+    if surl and _SURL_RE.match(surl[0]):
+        return surl[0], f"1{surl[0]}"
+    return None, None
+
+
+@lru_cache(maxsize=512)
+def _parse(text):
+    links = []
+    seen = set()
+    for match in _LINK_RE.finditer(text):
+        surl, share_id = _ids_from(match.group('rest'))
+        if not surl or share_id in seen:
+            continue
+        seen.add(share_id)
+        links.append(ShareLink(
+            surl=surl,
+            share_id=share_id,
+            url=f"https://{CANONICAL_HOST}/s/{share_id}",
+            domain=match.group('domain').lower(),
+            original=match.group(0),
+        ))
+    return tuple(links)
+
+
+def extract_share_links(text):
+    """Return every distinct share link in `text`, in order of appearance.
+
+    Results are memoized per text, so the several handlers a message passes
+    through all share one parse.
+    """
+    if not text:
+        return ()
+    return _parse(text)
+
+
+def classify_url(text):
+    """Return the first share link in `text`, or None"""
+    links = extract_share_links(text)
+    return links[0] if links else None
+
+
+def is_terabox_url(text):
+    """Check whether `text` contains at least one Terabox share link"""
+    return bool(extract_share_links(text))
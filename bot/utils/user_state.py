@@ -0,0 +1,209 @@
+"""
+User State Table - compact per-user state for very large user bases
+One row per known user, stored column-wise in fixed-width arrays
+(4 bytes per field) and found through an open-addressing id -> row index
+that is itself two flat arrays, instead of a dict or set of boxed
+ints/floats per field. Released rows are reused.
+"""
+
+import asyncio
+import time
+from array import array
+from config import LOGGER, USER_STATE_COMPACT_MINUTES, USER_STATE_IDLE_DAYS
+
+# Column name -> array typecode
+COLUMNS = {
+    'verified_until': 'I',   # Unix seconds; 0 = never verified
+    'last_seen': 'I',        # Unix seconds of the last request
+    'quota_downloads': 'f',  # Download tokens left
+    'quota_bytes': 'f',      # Byte tokens left
+    'quota_stamp': 'I',      # Last quota refill; 0 = buckets full
+}
+
+
+class _IdIndex:
+    """user id -> row, open addressing over flat arrays (no object per entry)"""
+
+    EMPTY = 0
+    DELETED = -1
+    MAX_LOAD = 0.75  # Linear probing stays short up to here
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self._deleted = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self._mask = capacity - 1
+        self._shift = 64 - capacity.bit_length() + 1
+        self._keys = array('q', bytes(8 * capacity))
+        self._rows = array('I', bytes(4 * capacity))
+
+    def _slot(self, key):
+        # Fibonacci hashing: spreads sequential ids over the whole table
+        return ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+
+    def _find(self, key):
+        """Slot holding `key`, or the first free slot on its probe path"""
+        keys, mask = self._keys, self._mask
+        slot = self._slot(key)
+        free = None
+        while True:
+            current = keys[slot]
+            if current == key:
+                return slot
+            if current == self.EMPTY:
+                return slot if free is None else free
+            if current == self.DELETED and free is None:
+                free = slot
+            slot = (slot + 1) & mask
+
+    def __len__(self):
+        return self._size
+
+    def get(self, key):
+        if key <= 0:
+            return None
+        slot = self._find(key)
+        return self._rows[slot] if self._keys[slot] == key else None
+
+    def put(self, key, row):
+        if key <= 0:
+            raise ValueError(f"User ids are positive, got {key}")
+        slot = self._find(key)
+        if self._keys[slot] != key:
+            if self._keys[slot] == self.DELETED:
+                self._deleted -= 1
+            self._size += 1
+            self._keys[slot] = key
+        self._rows[slot] = row
+        if self._size + self._deleted > (self._mask + 1) * self.MAX_LOAD:
+            self._rebuild()
+
+    def pop(self, key):
+        if key <= 0:
+            return None
+        slot = self._find(key)
+        if self._keys[slot] != key:
+            return None
+        self._keys[slot] = self.DELETED
+        self._size -= 1
+        self._deleted += 1
+        return self._rows[slot]
+
+    def items(self):
+        for key, row in zip(self._keys, self._rows):
+            if key > 0:
+                yield key, row
+
+    def _rebuild(self):
+        entries = list(self.items())
+        capacity = self._mask + 1
+        while self._size > capacity // 2:  # Rebuilt at most half full (tombstones are dropped)
+            capacity *= 2
+        self._allocate(capacity)
+        self._size = self._deleted = 0
+        for key, row in entries:
+            self.put(key, row)
+
+    def nbytes(self):
+        return len(self._keys) * self._keys.itemsize + len(self._rows) * self._rows.itemsize
+
+
+class UserStateTable:
+    def __init__(self, idle_seconds):
+        self.idle_seconds = idle_seconds
+        self._index = _IdIndex()
+        self._free = array('I')
+        self._compactors = []
+        self.columns = {name: array(code) for name, code in COLUMNS.items()}
+        self._stats = {'released': 0}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, user_id):
+        return self._index.get(user_id) is not None
+
+    def row(self, user_id, create=False):
+        """Row index of `user_id`; None if unknown and not `create`"""
+        row = self._index.get(user_id)
+        if row is None and create:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self.columns['last_seen'])
+                for column in self.columns.values():
+                    column.append(0)
+            self._index.put(user_id, row)
+        return row
+
+    def get(self, user_id, name, default=0):
+        row = self._index.get(user_id)
+        return default if row is None else self.columns[name][row]
+
+    def set(self, user_id, **values):
+        row = self.row(user_id, create=True)
+        for name, value in values.items():
+            self.columns[name][row] = value
+
+    def touch(self, user_id, now=None):
+        self.set(user_id, last_seen=int(now or time.time()))
+
+    def release(self, user_id):
+        row = self._index.pop(user_id)
+        if row is None:
+            return
+        for column in self.columns.values():
+            column[row] = 0
+        self._free.append(row)
+        self._stats['released'] += 1
+
+    def add_compactor(self, func):
+        """`func(now)` resets the owner's columns that are back at their defaults"""
+        self._compactors.append(func)
+
+    def _idle(self, row, now):
+        columns = self.columns
+        return (
+            columns['verified_until'][row] <= now
+            and columns['quota_stamp'][row] == 0
+            and columns['last_seen'][row] + self.idle_seconds <= now
+        )
+
+    def compact(self):
+        """Release the rows of users with nothing left worth remembering"""
+        now = time.time()
+        for compactor in self._compactors:
+            compactor(now)
+        idle = [user_id for user_id, row in self._index.items() if self._idle(row, now)]
+        for user_id in idle:
+            self.release(user_id)
+        return len(idle)
+
+    async def compact_task(self, interval=USER_STATE_COMPACT_MINUTES * 60):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = self.compact()
+                if removed:
+                    LOGGER.info(f"🗜️ Released {removed} idle user rows ({len(self._index)} left)")
+            except Exception as e:
+                LOGGER.error(f"User state compaction error: {e}")
+
+    def memory_bytes(self):
+        """Bytes held by the table's arrays (index and columns)"""
+        columns = sum(column.buffer_info()[1] * column.itemsize for column in self.columns.values())
+        return self._index.nbytes() + columns + len(self._free) * self._free.itemsize
+
+    def stats(self):
+        return {
+            'users': len(self._index),
+            'rows': len(self.columns['last_seen']),
+            'free_rows': len(self._free),
+            **self._stats,
+        }
+
+
+# Global user state table
+user_state = UserStateTable(idle_seconds=USER_STATE_IDLE_DAYS * 86400)
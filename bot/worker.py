@@ -0,0 +1,107 @@
+"""
+Download Worker - runs queued jobs in split mode (BOT_MODE=worker)
+The front end only talks to Telegram and enqueues jobs in the journal;
+any number of these processes claim jobs under a lease, download and
+upload them, and keep the lease alive with heartbeats. A job whose
+worker dies is claimed again once its lease runs out.
+
+Run with: python -m bot.worker
+"""
+
+import asyncio
+import os
+import socket
+from config import (
+    CONFIG, ConfigError, LOGGER, WORKER_CONCURRENCY, WORKER_LEASE_SECONDS,
+    WORKER_POLL_SECONDS, setup_logging
+)
+from bot.utils.bandwidth import bandwidth_shaper
+from bot.utils.cpu_executor import cpu_executor
+from bot.utils.disk_manager import disk_manager
+from bot.utils.file_cache import file_cache
+from bot.utils.http_client import http_client
+from bot.utils.job_journal import job_journal
+from bot.utils.log_forwarder import log_forwarder
+from bot.utils.memory_governor import memory_governor
+from bot.utils.user_state import user_state
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+
+async def heartbeat(job_id, job_task):
+    """Renew the lease until the job ends; cancel the job if the lease was lost"""
+    while not job_task.done():
+        await asyncio.sleep(WORKER_LEASE_SECONDS / 3)
+        if not job_journal.renew(job_id, WORKER_ID, WORKER_LEASE_SECONDS) and not job_task.done():
+            LOGGER.warning(f"💔 Lost the lease on job {job_id}, abandoning it")
+            job_task.cancel()
+
+
+async def run_claimed(bot, job):
+    from bot.handlers.processor import run_journaled_job
+
+    LOGGER.info(f"🛠️ {WORKER_ID} took job {job['id']} (attempt {job['attempts']})")
+    job_task = asyncio.create_task(run_journaled_job(bot, job, resumes=job['attempts'] - 1))
+    beat = asyncio.create_task(heartbeat(job['id'], job_task))
+    try:
+        await job_task
+    except asyncio.CancelledError:
+        if not job_task.cancelled():
+            raise  # The worker itself is shutting down
+    finally:
+        beat.cancel()
+
+
+async def slot_loop(bot):
+    """One job at a time; WORKER_CONCURRENCY of these run side by side"""
+    while True:
+        job = job_journal.claim(WORKER_ID, WORKER_LEASE_SECONDS)
+        if job is None:
+            await asyncio.sleep(WORKER_POLL_SECONDS)
+            continue
+        await run_claimed(bot, job)
+
+
+async def run_worker():
+    from telegram import Bot
+
+    disk_manager.protect(file_cache.root.name)
+    disk_manager.protect(job_journal.root.name)
+    file_cache.load()
+    job_journal.cleanup()
+    sampler = asyncio.create_task(memory_governor.sample_task())
+    compactor = asyncio.create_task(user_state.compact_task())
+    shaper_sync = asyncio.create_task(bandwidth_shaper.sync_task(WORKER_ID))
+
+    LOGGER.info(f"🛠️ Worker {WORKER_ID} started with {WORKER_CONCURRENCY} slots")
+    try:
+        async with Bot(CONFIG.BOT_TOKEN) as bot:
+            log_forwarder.start(bot)
+            try:
+                await asyncio.gather(*(slot_loop(bot) for _ in range(WORKER_CONCURRENCY)))
+            finally:
+                await log_forwarder.close()
+    finally:
+        sampler.cancel()
+        compactor.cancel()
+        shaper_sync.cancel()
+        await http_client.close()
+        job_journal.close()
+        cpu_executor.shutdown()
+
+
+def main():
+    setup_logging()
+    try:
+        CONFIG.validate()
+    except ConfigError as e:
+        LOGGER.error(f"❌ {e}")
+        raise SystemExit(1)
+    try:
+        asyncio.run(run_worker())
+    except KeyboardInterrupt:
+        LOGGER.info("👋 Worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
 """
 Terabox Leech Bot Configuration - Enhanced with VJ Verification & Validity Time
 Optimized for minimal memory usage
+
+Importing this module has no side effects: logging is set up by
+setup_logging(), required settings are checked by CONFIG.validate() and the
+download directory is created by the disk manager at startup.
 """
 
-from logging import getLogger, FileHandler, StreamHandler, INFO, basicConfig
-from os import environ, makedirs, path as ospath
+from atexit import register as atexit_register
+from logging import getLogger, Formatter, StreamHandler, basicConfig
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from os import environ, path as ospath
+from queue import SimpleQueue
 from dotenv import load_dotenv
 
 if ospath.exists('config.env'):
@@ -12,36 +19,52 @@ if ospath.exists('config.env'):
 
 LOGGER = getLogger(__name__)
 
-basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[FileHandler("log.txt"), StreamHandler()],
-    level=INFO,
-)
+# Logging settings
+LOG_FILE = environ.get('LOG_FILE', 'log.txt')
+LOG_LEVEL = environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_MAX_MB = int(environ.get('LOG_MAX_MB', '5'))  # Rotate log file at this size
+LOG_BACKUP_COUNT = int(environ.get('LOG_BACKUP_COUNT', '2'))
+LOG_PAYLOAD_LIMIT = int(environ.get('LOG_PAYLOAD_LIMIT', '300'))  # Max chars of API payloads in logs
 
-# Essential Bot Configuration
-BOT_TOKEN = environ.get('BOT_TOKEN', '')
-if not BOT_TOKEN:
-    LOGGER.error("BOT_TOKEN is required!")
-    exit(1)
+_LOG_LISTENER = None
 
-TELEGRAM_API = environ.get('TELEGRAM_API', '')
-if not TELEGRAM_API:
-    LOGGER.error("TELEGRAM_API is required!")
-    exit(1)
-else:
-    TELEGRAM_API = int(TELEGRAM_API)
+def setup_logging():
+    """Non-blocking logging: records go onto a queue, a background thread writes them"""
+    global _LOG_LISTENER
+    if _LOG_LISTENER is not None:
+        return _LOG_LISTENER
+    
+    formatter = Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    file_handler = RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_MB * 1024 * 1024, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    stream_handler = StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    
+    log_queue = SimpleQueue()
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit_register(listener.stop)  # Flush queued records on shutdown
+    
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(Formatter("%(message)s"))  # Real formatting happens on the listener side
+    basicConfig(handlers=[queue_handler], level=LOG_LEVEL, force=True)
+    _LOG_LISTENER = listener
+    return listener
 
+def _int_env(name):
+    """Integer setting that may be missing; validation reports it later"""
+    value = environ.get(name, '').strip()
+    return int(value) if value.lstrip('-').isdigit() else 0
+
+# Essential Bot Configuration (checked by CONFIG.validate(), not at import)
+BOT_TOKEN = environ.get('BOT_TOKEN', '')
+TELEGRAM_API = _int_env('TELEGRAM_API')
 TELEGRAM_HASH = environ.get('TELEGRAM_HASH', '')
-if not TELEGRAM_HASH:
-    LOGGER.error("TELEGRAM_HASH is required!")
-    exit(1)
+OWNER_ID = _int_env('OWNER_ID')
 
-OWNER_ID = environ.get('OWNER_ID', '')
-if not OWNER_ID:
-    LOGGER.error("OWNER_ID is required!")
-    exit(1)
-else:
-    OWNER_ID = int(OWNER_ID)
+REQUIRED_SETTINGS = ('BOT_TOKEN', 'TELEGRAM_API', 'TELEGRAM_HASH', 'OWNER_ID')
 
 # Optional Configuration
 AUTHORIZED_CHATS = environ.get('AUTHORIZED_CHATS', '')
@@ -51,20 +74,120 @@ CMD_SUFFIX = environ.get('CMD_SUFFIX', '')
 AS_DOCUMENT = environ.get('AS_DOCUMENT', 'False').lower() == 'true'
 LEECH_SPLIT_SIZE = int(environ.get('LEECH_SPLIT_SIZE', '2097152000'))  # 2GB
 STATUS_UPDATE_INTERVAL = int(environ.get('STATUS_UPDATE_INTERVAL', '10'))
+MAX_BATCH_LINKS = int(environ.get('MAX_BATCH_LINKS', '20'))  # Links accepted per message / file
+EXTRACT_CONCURRENCY = int(environ.get('EXTRACT_CONCURRENCY', '3'))  # Parallel extractor calls per batch
 
 # Download Directory
 DOWNLOAD_DIR = environ.get('DOWNLOAD_DIR', '/usr/src/app/downloads/')
 if not DOWNLOAD_DIR.endswith("/"):
     DOWNLOAD_DIR = f'{DOWNLOAD_DIR}/'
 
-# Create download directory
-makedirs(DOWNLOAD_DIR, exist_ok=True)
+# Disk admission & cleanup settings
+DISK_FREE_MARGIN_MB = int(environ.get('DISK_FREE_MARGIN_MB', '200'))  # Always keep this much free
+STALE_FILE_HOURS = int(environ.get('STALE_FILE_HOURS', '6'))  # Orphans older than this are swept
+DISK_SWEEP_INTERVAL_MINUTES = int(environ.get('DISK_SWEEP_INTERVAL_MINUTES', '30'))
+
+# Local file cache (DOWNLOAD_DIR/cache) - serves retries and repeat requests
+FILE_CACHE_MB = int(environ.get('FILE_CACHE_MB', '1024'))  # 0 = disabled; always off in split mode
+FILE_CACHE_POLICY = environ.get('FILE_CACHE_POLICY', 'lru').lower()  # lru or lfu
+
+# Job journal (DOWNLOAD_DIR/journal) - in-flight jobs survive restarts
+JOURNAL_RETENTION_DAYS = int(environ.get('JOURNAL_RETENTION_DAYS', '3'))  # Finished jobs kept for dedupe
+JOURNAL_CHECKPOINT_MB = int(environ.get('JOURNAL_CHECKPOINT_MB', '4'))  # Offset saved every N MB
+JOURNAL_MAX_RESUMES = int(environ.get('JOURNAL_MAX_RESUMES', '2'))  # Then the job is failed, not retried
+
+# Telegram updates handled at once - job handlers don't block, so these only hold short handlers
+CONCURRENT_UPDATES = int(environ.get('CONCURRENT_UPDATES', '64'))
+
+# Split mode: 'all' (one process does everything), 'front' (Telegram only,
+# enqueues jobs) or 'worker' (python -m bot.worker, runs queued jobs)
+BOT_MODE = environ.get('BOT_MODE', 'all').lower()
+WORKER_CONCURRENCY = int(environ.get('WORKER_CONCURRENCY', '1'))  # Jobs per worker process
+WORKER_LEASE_SECONDS = int(environ.get('WORKER_LEASE_SECONDS', '60'))  # Requeued if not renewed in time
+WORKER_POLL_SECONDS = float(environ.get('WORKER_POLL_SECONDS', '2'))
+
+# Extractor backends (comma separated, in preference order: native, wdzone, local)
+EXTRACTOR_BACKENDS = [name.strip() for name in environ.get('EXTRACTOR_BACKENDS', 'wdzone').split(',') if name.strip()]
+EXTRACTOR_TIMEOUT = float(environ.get('EXTRACTOR_TIMEOUT', '30'))
+EXTRACTOR_HEDGE_DEFAULT = float(environ.get('EXTRACTOR_HEDGE_DEFAULT', '3'))  # Hedge delay until p90 is known
+EXTRACTOR_BREAKER_FAILURES = int(environ.get('EXTRACTOR_BREAKER_FAILURES', '3'))  # Consecutive failures to open
+EXTRACTOR_BREAKER_COOLDOWN = float(environ.get('EXTRACTOR_BREAKER_COOLDOWN', '60'))  # Seconds before a retry
+EXTRACTOR_FIXTURES = environ.get('EXTRACTOR_FIXTURES', '')  # Recorded responses for the 'local' backend
+
+# Native Terabox resolver ('native' backend) - needs a logged-in ndus cookie
+TERABOX_COOKIE = environ.get('TERABOX_COOKIE', '')  # e.g. "ndus=Y2f...;"
+TERABOX_HOST = environ.get('TERABOX_HOST', 'www.terabox.com')
+
+# Shared HTTP client - one keep-alive pool for downloads, extractors and shortlinks
+HTTP_POOL_LIMIT = int(environ.get('HTTP_POOL_LIMIT', '20'))  # Open connections in total
+HTTP_POOL_PER_HOST = int(environ.get('HTTP_POOL_PER_HOST', '4'))
+HTTP_DNS_CACHE_SECONDS = int(environ.get('HTTP_DNS_CACHE_SECONDS', '300'))
+HTTP_KEEPALIVE_SECONDS = int(environ.get('HTTP_KEEPALIVE_SECONDS', '60'))
+HTTP_WARMUP_HOSTS = [host.strip() for host in environ.get(
+    'HTTP_WARMUP_HOSTS', 'wdzone-terabox-api.vercel.app,www.terabox.com,data.terabox.com'
+).split(',') if host.strip()]  # Pre-connected at startup (DNS + TCP + TLS)
+
+# Log channel - delivered files are copied there by file_id in the background
+LOG_CHANNEL = _int_env('LOG_CHANNEL')  # 0 = off
+AUTO_FORWARD = environ.get('AUTO_FORWARD', 'True').lower() == 'true'
+LOG_FORWARD_BATCH = int(environ.get('LOG_FORWARD_BATCH', '10'))  # Files per media group (Telegram max 10)
+LOG_FORWARD_WINDOW = float(environ.get('LOG_FORWARD_WINDOW', '3'))  # Seconds to collect a batch; paces the channel
+LOG_FORWARD_QUEUE = int(environ.get('LOG_FORWARD_QUEUE', '500'))  # Oldest copies are dropped beyond this
+LOG_FORWARD_RETRIES = int(environ.get('LOG_FORWARD_RETRIES', '5'))
+
+# Uploads - the multipart body is streamed from disk instead of buffered by python-telegram-bot
+UPLOAD_STREAMING = environ.get('UPLOAD_STREAMING', 'True').lower() == 'true'  # False = buffered unless memory is tight
+UPLOAD_CHUNK_KB = int(environ.get('UPLOAD_CHUNK_KB', '256'))
+UPLOAD_READ_TIMEOUT = float(environ.get('UPLOAD_READ_TIMEOUT', '300'))  # Seconds to wait for Telegram's reply
+
+# Pre-flight probe - one ranged GET for exact size, range support and real content type
+PREFLIGHT_PROBE = environ.get('PREFLIGHT_PROBE', 'True').lower() == 'true'
+PREFLIGHT_TIMEOUT = float(environ.get('PREFLIGHT_TIMEOUT', '15'))  # Seconds; a failed probe falls back to the extractor's info
+
+# Job scheduler - download slots with priority lanes (admin > verified > free)
+JOB_SLOTS = int(environ.get('JOB_SLOTS', '3'))  # Downloads running at once per process
+JOB_RESERVED_VERIFIED = int(environ.get('JOB_RESERVED_VERIFIED', '1'))  # Slots free users can't take
+JOB_RESERVED_ADMIN = int(environ.get('JOB_RESERVED_ADMIN', '0'))  # Slots only the owner can take
+JOB_AGING_SECONDS = float(environ.get('JOB_AGING_SECONDS', '120'))  # Waiting this long raises a job one class
+
+# Bandwidth - downloads share the ingress cap by weighted fair queueing; changeable with /bandwidth
+# The cap is for the whole deployment: in split mode the workers divide it among themselves
+BANDWIDTH_INGRESS_MBPS = float(environ.get('BANDWIDTH_INGRESS_MBPS', '0'))  # Megabits/s; 0 = unlimited
+BANDWIDTH_UPLOAD_RESERVE_MBPS = float(environ.get('BANDWIDTH_UPLOAD_RESERVE_MBPS', '0'))  # Taken off the cap while uploading
+BANDWIDTH_SYNC_SECONDS = float(environ.get('BANDWIDTH_SYNC_SECONDS', '1'))  # Split mode: workers re-divide the cap this often
+
+# Download integrity - MD5 is only checked when the share exposes a hex digest
+INTEGRITY_VERIFY_MD5 = environ.get('INTEGRITY_VERIFY_MD5', 'True').lower() == 'true'
+
+# Folder shares - traversal limits so a huge folder can't monopolize the instance
+FOLDER_LIST_CONCURRENCY = int(environ.get('FOLDER_LIST_CONCURRENCY', '3'))
+FOLDER_MAX_FILES = int(environ.get('FOLDER_MAX_FILES', '50'))
+FOLDER_MAX_DIRS = int(environ.get('FOLDER_MAX_DIRS', '100'))
+FOLDER_EXTENSIONS = [ext.strip() for ext in environ.get('FOLDER_EXTENSIONS', '').split(',') if ext.strip()]  # Empty = all
+FOLDER_MIN_SIZE_MB = int(environ.get('FOLDER_MIN_SIZE_MB', '0'))
+FOLDER_MAX_SIZE_MB = int(environ.get('FOLDER_MAX_SIZE_MB', '0'))  # 0 = no limit
 
 # Memory optimization settings
 QUEUE_ALL = 2  # Limit concurrent tasks for memory efficiency
 MAX_CONCURRENT_DOWNLOADS = 1  # One download at a time
 MAX_CONCURRENT_UPLOADS = 1  # One upload at a time
 
+# CPU executor - process pool for CPU work, thread pool for blocking calls
+CPU_PROCESSES = int(environ.get('CPU_PROCESSES', '0'))  # 0 = min(cores, 2)
+CPU_THREADS = int(environ.get('CPU_THREADS', '4'))
+
+# Image stage - photos over Telegram's limits are downscaled/recompressed
+IMAGE_MAX_SIDE = int(environ.get('IMAGE_MAX_SIDE', '2560'))  # Telegram never shows photos larger
+IMAGE_RECOMPRESS_MB = int(environ.get('IMAGE_RECOMPRESS_MB', '2'))  # Larger photos are re-encoded as JPEG
+IMAGE_JPEG_QUALITY = int(environ.get('IMAGE_JPEG_QUALITY', '88'))
+IMAGE_MAX_PIXELS = int(environ.get('IMAGE_MAX_PIXELS', '40000000'))  # Bigger canvases go as plain documents
+
+# Memory governor (Koyeb 512MB tier) - RSS ceiling and pressure thresholds
+MEMORY_CEILING_MB = int(environ.get('MEMORY_CEILING_MB', '450'))
+MEMORY_SOFT_RATIO = float(environ.get('MEMORY_SOFT_RATIO', '0.75'))  # Shrink buffers above this
+MEMORY_HARD_RATIO = float(environ.get('MEMORY_HARD_RATIO', '0.90'))  # Pause admissions above this
+MEMORY_SAMPLE_SECONDS = float(environ.get('MEMORY_SAMPLE_SECONDS', '2'))
+
 # ✅ VJ VERIFICATION SYSTEM SETTINGS (ENHANCED WITH VALIDITY TIME)
 BOT_USERNAME = environ.get('BOT_USERNAME', '').replace('@', '')
 SHORTLINK_API = environ.get('SHORTLINK_API', '')
@@ -73,6 +196,14 @@ VERIFY_TUTORIAL = environ.get('VERIFY_TUTORIAL', 'https://t.me/your_tutorial_cha
 VERIFY = environ.get('VERIFY', 'True').lower() == 'true'
 FREE_DOWNLOAD_LIMIT = int(environ.get('FREE_DOWNLOAD_LIMIT', '3'))
 
+# Quotas - token buckets per user that refill continuously over the window
+QUOTA_WINDOW_HOURS = float(environ.get('QUOTA_WINDOW_HOURS', '24'))  # FREE_DOWNLOAD_LIMIT downloads per window
+QUOTA_BYTES_MB = int(environ.get('QUOTA_BYTES_MB', '0'))  # Per-window data allowance for every user (0 = unlimited)
+
+# User state table - compact per-user rows (verification, quota, last seen)
+USER_STATE_COMPACT_MINUTES = int(environ.get('USER_STATE_COMPACT_MINUTES', '30'))
+USER_STATE_IDLE_DAYS = int(environ.get('USER_STATE_IDLE_DAYS', '30'))  # Rows with nothing else to keep are released
+
 # 🕐 VERIFICATION VALIDITY TIME SETTINGS (NEW)
 VERIFICATION_VALIDITY_HOURS = int(environ.get('VERIFICATION_VALIDITY_HOURS', '24'))  # Default 24 hours
 VERIFICATION_VALIDITY_MINUTES = int(environ.get('VERIFICATION_VALIDITY_MINUTES', '0'))  # Additional minutes
@@ -109,5 +240,37 @@ def get_validity_time_text():
 
 VALIDITY_TIME_TEXT = get_validity_time_text()
 
-LOGGER.info(f"✅ Configuration loaded successfully with VJ Verification!")
-LOGGER.info(f"🕐 Verification validity time: {VALIDITY_TIME_TEXT}")
+class ConfigError(Exception):
+    """Raised when required settings are missing or invalid"""
+
+class Config:
+    """Lazily validated settings object.
+
+    Module-level constants stay importable for `from config import *`;
+    required settings are only checked on first access through CONFIG
+    (or an explicit CONFIG.validate() at startup).
+    """
+    
+    def __init__(self):
+        self._validated = False
+    
+    def validate(self):
+        if self._validated:
+            return self
+        missing = [name for name in REQUIRED_SETTINGS if not globals()[name]]
+        if missing:
+            raise ConfigError(f"Missing required settings: {', '.join(missing)}")
+        self._validated = True
+        LOGGER.info(f"✅ Configuration loaded successfully with VJ Verification!")
+        LOGGER.info(f"🕐 Verification validity time: {VALIDITY_TIME_TEXT}")
+        return self
+    
+    def __getattr__(self, name):
+        if name in REQUIRED_SETTINGS:
+            self.validate()
+        try:
+            return globals()[name]
+        except KeyError:
+            raise AttributeError(f"Unknown setting: {name}") from None
+
+CONFIG = Config()